@@ -0,0 +1,68 @@
+"""
+Benchmark the speed and PSNR of estimating the flows at reduced resolution
+
+"""
+
+# -- python imports --
+import time
+import numpy as np
+import pandas as pd
+
+# -- this package --
+import svnlb
+
+# -- local imports --
+from svnlb.testing.data_loader import load_dataset
+
+
+#
+#  ---------------- Benchmark ----------------
+#
+
+def run_benchmark(vnlb_dataset,flow_scales=(1.,1/2.,1/4.),std=20.,nframes=5):
+
+    print(f"Running Flow Scale Benchmark on {vnlb_dataset}")
+    svnlb.check_omp_num_threads()
+
+    # -- get data --
+    data,paths,fmts = load_dataset(vnlb_dataset,nframes=nframes,vnlb=False)
+    clean = data['clean'].copy()
+
+    # -- add noise --
+    np.random.seed(123)
+    noisy = np.random.normal(clean.copy(),scale=std).astype(np.float32)
+
+    # -- each flow scale --
+    results = {}
+    for flow_scale in flow_scales:
+
+        # -- TV-L1 Optical Flow --
+        start = time.perf_counter()
+        flows = svnlb.compute_flow(noisy,std,flow_scale=flow_scale)
+        flow_time = time.perf_counter() - start
+
+        # -- Video Non-Local Bayes --
+        start = time.perf_counter()
+        result = svnlb.swig.runPyVnlb(noisy,std,{'fflow':flows.fflow,
+                                                 'bflow':flows.bflow})
+        vnlb_time = time.perf_counter() - start
+
+        # -- compute denoising quality --
+        psnrs = svnlb.utils.compute_psnrs(clean,result['denoised'])
+        results[f"1/{int(round(1/flow_scale))}"] = {
+            "flow time [sec]":flow_time,
+            "vnlb time [sec]":vnlb_time,
+            "psnr [dB]":np.mean(psnrs)}
+    results = pd.DataFrame(results).T
+    print(results.to_markdown())
+    return results
+
+if __name__ == "__main__":
+
+    # -- dataset example 1 --
+    vnlb_dataset = "davis_64x64"
+    run_benchmark(vnlb_dataset)
+
+    # -- dataset example 2 --
+    vnlb_dataset = "davis"
+    run_benchmark(vnlb_dataset)
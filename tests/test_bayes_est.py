@@ -18,6 +18,7 @@ from vnlb.utils import groups2patches,patches2groups,patches_at_indices
 
 # -- python impl --
 from vnlb.cpu import runBayesEstimate,idx2coords
+from vnlb.cpu.bayes_est import runBayesEstimateBatch
 
 # -- check if reordered --
 from scipy import optimize
@@ -307,6 +308,40 @@ class TestBayesEstimate(unittest.TestCase):
 
 
 
+    def do_run_bayes_est_batch(self,sigma,in_params,step,nbatch=16,solver="exact"):
+
+        # -- parse parameters --
+        shape = (5,3,32,32)
+        t,c,h,w = shape
+        params = vnlb.swig.setVnlbParams(shape,sigma,params=in_params)
+        params.covSolver = [solver,solver]
+        psX,psT = params.sizePatch[step],params.sizePatchTime[step]
+        nSimP = params.nSimilarPatches[step]
+
+        # -- random groups --
+        gshape = (nbatch,c,psT,psX,psX,nSimP)
+        groupNoisy = (np.random.rand(*gshape)*255.).astype(np.float32)
+        groupBasic = (np.random.rand(*gshape)*255.).astype(np.float32)
+        groupBasic = groupBasic if step == 1 else None
+
+        # -- one group at a time --
+        loop_groups = groupNoisy.copy()
+        for b in range(nbatch):
+            basic_b = None if groupBasic is None else groupBasic[b:b+1].copy()
+            runBayesEstimate(loop_groups[b:b+1],basic_b,0.,nSimP,shape,params,step)
+
+        # -- batched --
+        basic = None if groupBasic is None else groupBasic.copy()
+        results = runBayesEstimateBatch(groupNoisy.copy(),basic,0.,
+                                        nSimP,shape,params,step)
+        batch_groups = results['groupNoisy']
+
+        # -- compare; "eigh" is a different eigensolver than "ssyevx" --
+        if solver == "exact":
+            np.testing.assert_array_equal(batch_groups,loop_groups)
+        else:
+            np.testing.assert_allclose(batch_groups,loop_groups,rtol=1e-3,atol=5e-2)
+
     #
     # -- Call the Tests --
     #
@@ -330,4 +365,14 @@ class TestBayesEstimate(unittest.TestCase):
         tensors,sigma = self.do_load_rand_data(5,3,32,32)
         self.do_run_bayes_est(tensors,sigma,pyargs)
 
+    def test_run_bayes_estimate_batch(self):
+
+        # -- both steps --
+        np.random.seed(234)
+        sigma,pyargs = 20.,{}
+        self.do_run_bayes_est_batch(sigma,pyargs,0)
+        self.do_run_bayes_est_batch(sigma,pyargs,1)
 
+        # -- stacked "eigh" solver --
+        self.do_run_bayes_est_batch(sigma,pyargs,0,solver="eigh")
+        self.do_run_bayes_est_batch(sigma,pyargs,1,solver="eigh")
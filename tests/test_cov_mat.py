@@ -17,7 +17,7 @@ from vnlb.testing.file_io import save_images
 from vnlb.utils import groups2patches,patches2groups,patches_at_indices
 
 # -- python impl --
-from vnlb.cpu import computeCovMat
+from vnlb.cpu import computeCovMat,computeCovMatAccuracy
 from vnlb.utils import idx2coords
 
 # -- check if reordered --
@@ -146,6 +146,30 @@ class TestCovMat(unittest.TestCase):
             if nchecks >= tchecks: break
 
 
+    def do_run_cov_mat_solvers(self,nbatch,pdim,nSimP,rank):
+
+        # -- low-rank groups + noise --
+        basis = np.random.randn(pdim,rank)
+        groups = basis @ np.random.randn(nbatch,rank,nSimP) * 10.
+        groups += np.random.randn(nbatch,pdim,nSimP)
+        groups -= groups.mean(-1,keepdims=True)
+        groups = groups.astype(np.float32)
+
+        # -- thin svd is exact up to rounding --
+        acc = computeCovMatAccuracy(groups,rank,"svd")
+        assert np.all(acc.eigVals_relerr < 1e-3)
+        assert np.all(acc.subspace_err < 1e-2)
+
+        # -- randomized is close on the leading eigen values --
+        acc = computeCovMatAccuracy(groups,rank,"randomized")
+        assert np.all(acc.eigVals_relerr < 1e-1)
+
+        # -- single group interface --
+        exact = computeCovMat(groups[0],rank)
+        approx = computeCovMat(groups[0],rank,solver="svd")
+        np.testing.assert_allclose(approx.covEigVals,exact.covEigVals[:rank],
+                                   rtol=1e-3,atol=1e-3)
+
     #
     # -- Call the Tests --
     #
@@ -169,3 +193,7 @@ class TestCovMat(unittest.TestCase):
         # tensors,sigma = self.do_load_rand_data(5,3,32,32)
         # self.do_run_proc_nlb(tensors,sigma,pyargs)
 
+    def test_cov_mat_solvers(self):
+        np.random.seed(234)
+        self.do_run_cov_mat_solvers(32,98,60,20)
+        self.do_run_cov_mat_solvers(32,98,100,20)
@@ -0,0 +1,117 @@
+import numpy as np
+import unittest
+import vnlb
+import shutil
+import tempfile
+
+
+class TestFlow(unittest.TestCase):
+
+    def do_create_video(self,t,c,h,w):
+        np.random.seed(123)
+        tgrid,hgrid,wgrid = np.meshgrid(np.arange(t),np.arange(h),
+                                        np.arange(w),indexing='ij')
+        video = 128 + 60 * np.sin((wgrid + 1.5*tgrid)/5.) * np.cos(hgrid/6.)
+        video = np.repeat(video[:,None],c,axis=1).astype(np.float32)
+        video += 5.*np.random.randn(t,c,h,w).astype(np.float32)
+        return video
+
+    def test_flow_threads(self):
+
+        # -- create video  --
+        std = 5.
+        noisy = self.do_create_video(5,3,48,64)
+
+        # -- one call per direction --
+        fflow = vnlb.swig.runPyTvL1Flow(noisy,std,{'direction':0})['fflow']
+        bflow = vnlb.swig.runPyTvL1Flow(noisy,std,{'direction':1})['bflow']
+
+        # -- both directions; same for any number of threads --
+        for nproc in [1,2,0]:
+            fflow_p,bflow_p = vnlb.swig.runPyFlow(noisy,std,{'nproc':nproc})
+            np.testing.assert_array_equal(fflow_p,fflow)
+            np.testing.assert_array_equal(bflow_p,bflow)
+
+    def test_flow_cache(self):
+
+        # -- create video  --
+        std = 5.
+        noisy = self.do_create_video(5,3,48,64)
+        cache_dir = tempfile.mkdtemp()
+
+        # -- a hit gives the same flows --
+        try:
+            cache = vnlb.swig.FlowCache(cache_dir)
+            flow_params = {'nproc':0,'cache':cache}
+            fflow,bflow = vnlb.swig.runPyFlow(noisy,std,flow_params)
+            assert len(cache.entries()) == 1
+            fflow_c,bflow_c = vnlb.swig.runPyFlow(noisy,std,flow_params)
+            assert isinstance(fflow_c,np.memmap)
+            np.testing.assert_array_equal(fflow_c,fflow)
+            np.testing.assert_array_equal(bflow_c,bflow)
+
+            # -- new params are a new entry; the oldest is evicted --
+            cache.max_bytes = cache.nbytes()
+            vnlb.swig.runPyFlow(noisy,std,{'tau':0.2,'cache':cache})
+            assert len(cache.entries()) == 1
+            assert cache.get(cache.key(noisy,std,{'tau':0.2})) is not None
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_flow_warm_start(self):
+
+        # -- create video  --
+        std = 5.
+        noisy = self.do_create_video(6,3,48,64)
+
+        # -- cold start --
+        res = vnlb.swig.runPyTvL1Flow(noisy,std,{'direction':2})
+        assert np.all(res['energy'] > 0)
+
+        # -- warm start with fewer scales & warps; the energy holds --
+        warm_params = {'direction':2,'warm_start':True,
+                       'warm_nscales':2,'warm_nwarps':2}
+        res_w = vnlb.swig.runPyTvL1Flow(noisy,std,warm_params)
+        np.testing.assert_array_equal(res_w['fflow'][0],res['fflow'][0])
+        np.testing.assert_array_equal(res_w['bflow'][0],res['bflow'][0])
+        assert np.all(res_w['energy'] < 1.1 * res['energy'])
+
+    def test_flow_scale(self):
+
+        # -- create video  --
+        std = 5.
+        noisy = self.do_create_video(3,3,64,64)
+
+        # -- "flow_scale" picks the finest scale --
+        for flow_scale,fscale in [(1.,0),(1/2.,1),(1/4.,2)]:
+            fflow,bflow = vnlb.swig.runPyFlow(noisy,std,{'flow_scale':flow_scale})
+            fflow_f,bflow_f = vnlb.swig.runPyFlow(noisy,std,{'fscale':fscale})
+            assert fflow.shape == (2,2,64,64)
+            np.testing.assert_array_equal(fflow,fflow_f)
+            np.testing.assert_array_equal(bflow,bflow_f)
+
+        # -- not a power of the zfactor --
+        with self.assertRaises(ValueError):
+            vnlb.swig.runPyFlow(noisy,std,{'flow_scale':1/3.})
+
+    def test_block_match_flow(self):
+
+        # -- a video translating by (3,2) pixels per frame --
+        np.random.seed(123)
+        t,h,w = 4,64,96
+        image = 255.*np.random.rand(h+20,w+20)
+        image = (image + np.roll(image,1,0) + np.roll(image,1,1))/3.
+        noisy = np.stack([image[10-2*ti:10-2*ti+h,10-3*ti:10-3*ti+w]
+                          for ti in range(t)])[:,None].astype(np.float32)
+
+        # -- same layout as the tv-l1 flows --
+        flows = vnlb.compute_flow(noisy,0.,method="bm")
+        assert flows.fflow.shape == (t-1,2,h,w)
+        assert flows.bflow.shape == (t-1,2,h,w)
+
+        # -- recovers the motion away from the borders --
+        inner = np.s_[:,:,16:-16,16:-16]
+        np.testing.assert_allclose(flows.fflow[inner][:,0],3.,atol=0.25)
+        np.testing.assert_allclose(flows.fflow[inner][:,1],2.,atol=0.25)
+        np.testing.assert_allclose(flows.bflow[inner][:,0],-3.,atol=0.25)
+        np.testing.assert_allclose(flows.bflow[inner][:,1],-2.,atol=0.25)
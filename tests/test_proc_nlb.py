@@ -186,6 +186,31 @@ class TestProcNlb(unittest.TestCase):
         else:
             raise ValueError(f"Uknown step [{step}]")
 
+    def do_run_proc_nlb_batch(self,tensors,sigma,in_params,step):
+
+        # -- init --
+        noisy = tensors.noisy[:3,:,:36,:36].copy()
+        flows = {'fflow':tensors.fflow[:3,:,:36,:36].copy(),
+                 'bflow':tensors.bflow[:3,:,:36,:36].copy()}
+
+        # -- parse parameters --
+        params = vnlb.swig.setVnlbParams(noisy.shape,sigma,params=in_params)
+
+        # -- exec with one reference pixel per batch --
+        ref_params = copy.deepcopy(params)
+        ref_params.batchSize = [1,1]
+        ref_results = processNLBayes(noisy,sigma,step,flows,ref_params)
+
+        # -- exec with large batches --
+        batch_params = copy.deepcopy(params)
+        batch_params.batchSize = [256,256]
+        batch_results = processNLBayes(noisy,sigma,step,flows,batch_params)
+
+        # -- compare --
+        assert ref_results['ngroups'] == batch_results['ngroups']
+        np.testing.assert_array_equal(ref_results['denoised'],
+                                      batch_results['denoised'])
+
     #
     # -- Call the Tests --
     #
@@ -224,3 +249,14 @@ class TestProcNlb(unittest.TestCase):
         # tensors,sigma = self.do_load_rand_data(5,3,32,32)
         # self.do_run_proc_nlb(tensors,sigma,pyargs)
 
+    def test_proc_nlb_batch(self):
+
+        # -- init --
+        np.random.seed(123)
+        pyargs = {}
+        tensors,sigma = self.do_load_rand_data(5,3,36,36)
+
+        # -- batched loop matches the per-pixel loop --
+        for aggreBoost in [False,True]:
+            pyargs['aggreBoost'] = [aggreBoost,aggreBoost]
+            self.do_run_proc_nlb_batch(tensors,sigma,pyargs,0)
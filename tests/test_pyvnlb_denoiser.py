@@ -18,7 +18,8 @@ from vnlb.utils import groups2patches,patches2groups,patches_at_indices
 from vnlb.utils import check_omp_num_threads
 
 # -- swig impl --
-from vnlb.cpu import runPythonVnlb
+from vnlb.cpu import runPythonVnlb,subDivideTight
+from vnlb.cpu.tiles import tileBorder
 SAVE_DIR = Path("./output/tests/")
 
 
@@ -65,6 +66,29 @@ class TestSwigVnlbDenoiser(unittest.TestCase):
 
         return data,sigma
 
+    def do_load_rand_video(self,t,c,h,w,sigma=20.):
+
+        # -- smooth video with random frequencies & phases --
+        freqs = np.random.rand(3,c)*0.5 + 0.1
+        yy,xx = np.mgrid[:h,:w]
+        clean = np.zeros((t,c,h,w),dtype=np.float32)
+        for ti in range(t):
+            for ci in range(c):
+                wave_x = np.sin(freqs[0,ci]*(xx+ti) + 6*freqs[2,ci])
+                wave_y = np.cos(freqs[1,ci]*yy)
+                clean[ti,ci] = 128. + 60.*wave_x*wave_y
+
+        # -- create data --
+        data = edict()
+        data.noisy = clean + sigma*np.random.randn(t,c,h,w)
+        data.fflow = np.zeros((t,2,h,w))
+        data.bflow = np.zeros((t,2,h,w))
+        data._clean = clean
+        for key,val in data.items():
+            data[key] = data[key].astype(np.float32)
+
+        return data,sigma
+
     #
     # -- Define C++ & Swig calls --
     #
@@ -140,6 +164,70 @@ class TestSwigVnlbDenoiser(unittest.TestCase):
         results = pd.DataFrame(results)
         # print(results.to_markdown())
 
+    def do_run_tiled_comparison(self,tensors,sigma,pyargs,tile_args):
+
+        # -- parse parameters --
+        noisy,clean = tensors.noisy,tensors._clean
+        params = vnlb.swig.setVnlbParams(noisy.shape,sigma,params=pyargs)
+        tiled_params = copy.deepcopy(params)
+        for key,val in tile_args.items():
+            tiled_params[key] = val
+
+        # -- the tiles must be strictly smaller than the video --
+        border,border_t = tileBorder(params)
+        nParts = max(tile_args.get('nParts',[1,1])[0],1)
+        nPartsTime = max(tile_args.get('nPartsTime',[1,1])[0],1)
+        tiles = subDivideTight(noisy.shape,border,nParts,border_t,nPartsTime)
+        t,c,h,w = noisy.shape
+        for tile in tiles:
+            tile_t = tile.ending_t - tile.origin_t
+            tile_h = tile.ending_h - tile.origin_h
+            tile_w = tile.ending_w - tile.origin_w
+            if nParts > 1: assert tile_h < h and tile_w < w
+            if nPartsTime > 1: assert tile_t < t
+
+        # -- exec both --
+        py_results = self.do_run_python(tensors,sigma,params)
+        tiled_results = self.do_run_python(tensors,sigma,tiled_params)
+
+        # -- no tile is empty --
+        assert np.all(tiled_results.tile_groups > 0)
+
+        # -- the paste trick depends on the scan order, so compare quality --
+        for field in ["basic","denoised"]:
+            psnr = np.mean(vnlb.utils.compute_psnrs(clean,py_results[field]))
+            tiled_psnr = np.mean(vnlb.utils.compute_psnrs(clean,tiled_results[field]))
+            msg = f"[{field}] tiled psnr [{tiled_psnr}] vs. untiled [{psnr}]"
+            assert np.abs(psnr - tiled_psnr) < 0.25,msg
+
+        return tiled_results
+
+    def test_python_denoiser_tiled(self):
+
+        # -- small patches & windows; tiles are ~3/4 of the video --
+        np.random.seed(123)
+        pyargs = {'sizePatch':[3,3],'sizeSearchWindow':[7,7],
+                  'nSimilarPatches':[30,30],'rank':[9,9],
+                  'overwrite_cpp':[True,True]}
+
+        # -- tiled in space --
+        tensors,sigma = self.do_load_rand_video(3,3,48,48)
+        tile_args = {'nThreads':[2,2],'nParts':[4,4]}
+        self.do_run_tiled_comparison(tensors,sigma,pyargs,tile_args)
+
+        # -- tiled in time; a short temporal search so tiles overlap partly --
+        pyargs['sizeSearchTimeFwd'] = [1,1]
+        pyargs['sizeSearchTimeBwd'] = [1,1]
+        tensors,sigma = self.do_load_rand_video(12,3,24,24)
+        tile_args = {'nThreads':[2,2],'nPartsTime':[3,3]}
+        self.do_run_tiled_comparison(tensors,sigma,pyargs,tile_args)
+
+        # -- 6 parts of 2 frames leave 2 parts empty on 8 frames; drop them --
+        tensors,sigma = self.do_load_rand_video(8,3,24,24)
+        tile_args = {'nThreads':[2,2],'nPartsTime':[6,6]}
+        results = self.do_run_tiled_comparison(tensors,sigma,pyargs,tile_args)
+        assert results.nPartsTime == 4
+
     def test_python_denoiser(self):
 
         # -- init save path --
@@ -157,3 +245,12 @@ class TestSwigVnlbDenoiser(unittest.TestCase):
         tensors,sigma = self.do_load_data(vnlb_dataset)
         self.do_run_comparison(tensors,sigma,pyargs)
 
+        # -- tiled; same tiles as c++ --
+        pyargs = {'nThreads':[2,2],'nParts':[4,4]}
+        tensors,sigma = self.do_load_data(vnlb_dataset)
+        self.do_run_comparison(tensors,sigma,pyargs)
+
+        # -- tiled in space and time --
+        pyargs = {'nThreads':[2,2],'nParts':[2,2],'nPartsTime':[2,2]}
+        tensors,sigma = self.do_load_data(vnlb_dataset)
+        self.do_run_comparison(tensors,sigma,pyargs)
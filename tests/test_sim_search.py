@@ -17,7 +17,8 @@ from vnlb.testing.file_io import save_images
 from vnlb.utils import groups2patches,patches2groups,patches_at_indices
 
 # -- python impl --
-from vnlb.cpu import runSimSearch,idx2coords
+from vnlb.cpu import runSimSearch,simSearchVideo,idx2coords,getColorXform
+from vnlb.cpu.sim_search import exec_sim_search_integral,exec_sim_search_batch
 
 # -- check if reordered --
 from scipy import optimize
@@ -228,6 +229,141 @@ class TestSimSearch(unittest.TestCase):
             nchecks += 1
             if nchecks >= tchecks: break
 
+    def do_run_sim_search_video(self,tensors,sigma,in_params):
+
+        # -- unpack shapes --
+        noisy = tensors.noisy
+        t,c,h,w = noisy.shape
+        step = 0
+
+        # -- parse parameters --
+        params = vnlb.swig.setVnlbParams(noisy.shape,sigma,params=in_params)
+        tensors = {'fflow':tensors['fflow'],'bflow':tensors['bflow']}
+        ps,ps_t = params.sizePatch[step],params.sizePatchTime[step]
+
+        # -- whole video --
+        video_data = simSearchVideo(noisy,sigma,copy.deepcopy(tensors),params,step)
+        video_vals = video_data.values
+        video_inds = video_data.indices
+
+        # -- invalid pixels --
+        assert np.all(video_inds[:,t-ps_t+1:] == -1)
+        assert np.all(video_inds[:,:,h-ps+1:] == -1)
+        assert np.all(video_inds[:,:,:,w-ps+1:] == -1)
+
+        # -- compare with the per-pixel search --
+        checks = np.random.permutation((t-ps_t+1)*(h-ps+1)*(w-ps+1))[:50]
+        for check in checks:
+            ti = check // ((h-ps+1)*(w-ps+1))
+            hi = (check // (w-ps+1)) % (h-ps+1)
+            wi = check % (w-ps+1)
+            pidx = ti*w*h*c + hi*w + wi
+            py_data = runSimSearch(noisy,sigma,pidx,copy.deepcopy(tensors),params,step)
+            np.testing.assert_array_equal(py_data.values,video_vals[:,ti,hi,wi])
+            np.testing.assert_array_equal(np.sort(py_data.indices),
+                                          np.sort(video_inds[:,ti,hi,wi]))
+
+    def do_run_sim_search_integral(self,tensors,sigma,in_params):
+
+        # -- unpack shapes --
+        noisy = tensors.noisy
+        step = 0
+
+        # -- parse parameters --
+        params = vnlb.swig.setVnlbParams(noisy.shape,sigma,params=in_params)
+        tensors = {'fflow':tensors['fflow'],'bflow':tensors['bflow']}
+
+        # -- exec both modes --
+        brute = simSearchVideo(noisy,sigma,copy.deepcopy(tensors),
+                               params,step,mode="brute")
+        integ = simSearchVideo(noisy,sigma,copy.deepcopy(tensors),
+                               params,step,mode="integral")
+
+        # -- same distances and candidate sets (up to rounding) --
+        np.testing.assert_allclose(integ.values,brute.values,rtol=1e-5,atol=1e-7)
+        same_set = np.all(np.sort(integ.indices,0) == np.sort(brute.indices,0),0)
+        assert np.mean(same_set) > 0.99
+
+    def do_run_sim_search_integral_refs(self,tensors,sigma,in_params,step):
+
+        # -- unpack shapes --
+        noisy = tensors.noisy
+        t,c,h,w = noisy.shape
+        fflow,bflow = tensors.fflow,tensors.bflow
+
+        # -- parse parameters --
+        params = vnlb.swig.setVnlbParams(noisy.shape,sigma,params=in_params)
+        ps,ps_t = params.sizePatch[step],params.sizePatchTime[step]
+        npatches = params.nSimilarPatches[step]
+        nW = params.sizeSearchWindow[step]
+        nfwd = params.sizeSearchTimeFwd[step]
+        nbwd = params.sizeSearchTimeBwd[step]
+        step1 = params.isFirstStep[step]
+        chnls = 1 if step1 else c
+        tau = params.tau[step]
+
+        # -- a random subset of the valid pixels are references --
+        refs = np.random.rand(t,h,w) < 0.3
+        refs[t-ps_t+1:],refs[:,h-ps+1:],refs[:,:,w-ps+1:] = False,False,False
+        coords = np.stack(np.where(refs),-1)
+        pidxs = coords[:,0]*c*h*w + coords[:,1]*w + coords[:,2]
+
+        # -- exec both --
+        vals,inds,offsets = exec_sim_search_integral(noisy,fflow,bflow,refs,ps,ps_t,
+                                                     npatches,nW,nfwd,nbwd,chnls,tau)
+        bvals,binds,bnSimPs = exec_sim_search_batch(pidxs,noisy,fflow,bflow,sigma,
+                                                    ps,ps_t,npatches,nW,nfwd,nbwd,
+                                                    False,step1,tau)
+
+        # -- one group per reference; "tau" sets the same group sizes --
+        nSimPs = np.diff(offsets)
+        assert len(nSimPs) == len(pidxs)
+        assert np.mean(nSimPs == bnSimPs) > 0.99
+        same_set = [np.array_equal(np.sort(inds[offsets[r]:offsets[r+1]]),
+                                   np.sort(binds[r,:bnSimPs[r]]))
+                    for r in range(len(pidxs))]
+        assert np.mean(same_set) > 0.99
+        return nSimPs
+
+    def do_run_sim_search_cached(self,tensors,sigma,in_params):
+
+        # -- unpack shapes --
+        noisy = tensors.noisy
+        t,c,h,w = noisy.shape
+        step = 0
+
+        # -- parse parameters --
+        params = vnlb.swig.setVnlbParams(noisy.shape,sigma,params=in_params)
+        ps,ps_t = params.sizePatch[step],params.sizePatchTime[step]
+        flows = {'fflow':tensors['fflow'],'bflow':tensors['bflow']}
+
+        # -- same result with the "yuv" images computed once --
+        yuv = getColorXform(noisy,np.zeros_like(noisy))
+        checks = np.random.permutation((t-ps_t+1)*(h-ps+1)*(w-ps+1))[:10]
+        for check in checks:
+            ti = check // ((h-ps+1)*(w-ps+1))
+            hi = (check // (w-ps+1)) % (h-ps+1)
+            wi = check % (w-ps+1)
+            pidx = ti*w*h*c + hi*w + wi
+            fresh = dict(flows)
+            py_fresh = runSimSearch(noisy,sigma,pidx,fresh,params,step)
+            py_cached = runSimSearch(noisy,sigma,pidx,dict(flows),params,step,yuv=yuv)
+            np.testing.assert_array_equal(py_cached.values,py_fresh.values)
+            np.testing.assert_array_equal(py_cached.indices,py_fresh.indices)
+            np.testing.assert_array_equal(py_cached.groupNoisy,py_fresh.groupNoisy)
+
+        # -- nothing is stored in the caller's tensors --
+        assert not('yuv' in fresh)
+
+        # -- an in-place update is seen by the next search --
+        noisy = noisy.copy()
+        py_before = runSimSearch(noisy,sigma,pidx,fresh,params,step)
+        noisy[...] = noisy[:,:,::-1].copy()
+        py_after = runSimSearch(noisy,sigma,pidx,fresh,params,step)
+        py_gt = runSimSearch(noisy.copy(),sigma,pidx,dict(flows),params,step)
+        np.testing.assert_array_equal(py_after.groupNoisy,py_gt.groupNoisy)
+        assert not(np.array_equal(py_after.groupNoisy,py_before.groupNoisy))
+
     #
     # -- [Exec] Patches2Groups and Groups2Patches --
     #
@@ -357,3 +493,47 @@ class TestSimSearch(unittest.TestCase):
         tensors,sigma = self.do_load_rand_data(5,3,32,32)
         self.do_run_sim_search(tensors,sigma,pyargs)
 
+    def test_sim_search_video(self):
+
+        # -- random data --
+        np.random.seed(123)
+        pyargs = {}
+        tensors,sigma = self.do_load_rand_data(5,3,32,32)
+        self.do_run_sim_search_video(tensors,sigma,pyargs)
+
+        # -- modified patch size --
+        pyargs = {'ps_x':3,'ps_t':2}
+        self.do_run_sim_search_video(tensors,sigma,pyargs)
+
+    def test_sim_search_integral(self):
+
+        # -- random data --
+        np.random.seed(123)
+        pyargs = {}
+        tensors,sigma = self.do_load_rand_data(5,3,32,32)
+        self.do_run_sim_search_integral(tensors,sigma,pyargs)
+
+        # -- modified patch size --
+        pyargs = {'ps_x':3,'ps_t':2}
+        self.do_run_sim_search_integral(tensors,sigma,pyargs)
+
+    def test_sim_search_integral_refs(self):
+
+        # -- random data; low contrast on the left so "tau" adds patches --
+        np.random.seed(123)
+        pyargs = {'ps_x':3,'ps_t':2}
+        tensors,sigma = self.do_load_rand_data(5,3,32,32)
+        tensors.noisy[...,:16] = 100. + tensors.noisy[...,:16]/100.
+
+        # -- both steps --
+        for step in [0,1]:
+            nSimPs = self.do_run_sim_search_integral_refs(tensors,sigma,pyargs,step)
+        assert nSimPs.max() > nSimPs.min()
+
+    def test_sim_search_cached(self):
+
+        # -- random data --
+        np.random.seed(123)
+        pyargs = {}
+        tensors,sigma = self.do_load_rand_data(5,3,32,32)
+        self.do_run_sim_search_cached(tensors,sigma,pyargs)
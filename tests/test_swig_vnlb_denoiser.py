@@ -56,3 +56,59 @@ class TestVnlbDenoiser(unittest.TestCase):
         vnlb_dataset = "davis_64x64"
         self.do_run_comparison(vnlb_dataset)
 
+    def test_stream(self):
+
+        # -- create a moving video, longer than the ring buffer --
+        np.random.seed(123)
+        nframes = 20
+        texture = 255.*np.random.rand(3,8,8+nframes).astype(np.float32)
+        texture = texture.repeat(4,axis=1).repeat(4,axis=2)
+        clean = np.stack([texture[:,:,ti:ti+32] for ti in range(nframes)])
+        std = 20.
+        noisy = clean + std*np.random.randn(*clean.shape).astype(np.float32)
+        pyargs = {'sizeSearchTimeFwd':[2,2],'sizeSearchTimeBwd':[2,2],
+                  'overwrite_cpp':[True,True]}
+
+        # -- push frames one at a time; flush the end --
+        stream = vnlb.swig.VnlbStream(std,pyargs)
+        denoised = [stream.push(frame) for frame in noisy]
+        assert stream.nframes < nframes
+        assert sum([len(deno) for deno in denoised]) == len(noisy) - stream.latency
+        denoised = np.concatenate(denoised + [stream.flush()])
+        assert denoised.shape == noisy.shape
+        assert len(stream.frames) == stream.nframes
+
+        # -- frames with their full context match the denoiser on the whole clip --
+        fflow,bflow = vnlb.swig.runPyFlow(noisy,std)
+        flows = {'fflow':fflow,'bflow':bflow}
+        results = vnlb.swig.runPyVnlb(noisy,std,flows,pyargs)
+        psnr = lambda deno,ref: 10*np.log10(255.**2/np.mean((deno-ref)**2))
+        inner = range(stream.past,nframes-stream.future)
+        delta = np.array([psnr(denoised[ti],clean[ti]) -
+                          psnr(results['denoised'][ti],clean[ti]) for ti in inner])
+        assert np.all(np.abs(delta) < 0.35)
+        assert np.abs(np.mean(delta)) < 0.15
+
+    def test_chunked(self):
+
+        # -- create video  --
+        np.random.seed(123)
+        clean = 255.*np.random.rand(1,3,32,32).astype(np.float32)
+        clean = np.repeat(clean,12,axis=0)
+        std = 20.
+        noisy = clean + std*np.random.randn(*clean.shape).astype(np.float32)
+        pyargs = {'sizeSearchTimeFwd':[2,2],'sizeSearchTimeBwd':[2,2],
+                  'overwrite_cpp':[True,True]}
+        fflow,bflow = vnlb.swig.runPyFlow(noisy,std)
+        flows = {'fflow':fflow,'bflow':bflow}
+
+        # -- the overlap must cover the search frames --
+        with pytest.raises(ValueError):
+            vnlb.swig.runPyVnlbChunked(noisy,std,6,2,flows,pyargs)
+
+        # -- within the documented tolerance of a full run --
+        results = vnlb.swig.runPyVnlb(noisy,std,flows,pyargs)
+        chunked = vnlb.swig.runPyVnlbChunked(noisy,std,6,4,flows,pyargs)
+        assert len(chunked['windows']) == 4
+        psnr = lambda deno: 10*np.log10(255.**2/np.mean((deno-clean)**2))
+        assert psnr(results['denoised']) - psnr(chunked['denoised']) < 0.25
@@ -0,0 +1,102 @@
+
+# -- python --
+import numpy as np
+import unittest
+import vnlb
+from vnlb.cpu.topk import numba_topk
+from vnlb.cpu.sim_search import exec_sim_search_batch,exec_cpp_sim_search
+
+#
+# -- Primary Testing Class --
+#
+
+class TestTopK(unittest.TestCase):
+
+    #
+    # -- Load Data --
+    #
+
+    def do_load_rand_vals(self,nvals):
+        vals = np.random.randint(0,20,size=nvals).astype(np.float32)
+        vals[np.random.rand(nvals) < 0.1] = np.inf
+        return vals
+
+    def do_load_tied_video(self,t,c,h,w):
+        # -- piecewise constant; most patch distances are tied --
+        noisy = np.random.randint(0,3,size=(t,c,h//4,w//4))*50.
+        noisy = noisy.repeat(4,axis=2).repeat(4,axis=3).astype(np.float32)
+        fflow = np.zeros((t,2,h,w),dtype=np.float32)
+        bflow = np.zeros((t,2,h,w),dtype=np.float32)
+        return noisy,fflow,bflow
+
+    #
+    # -- Call the Tests --
+    #
+
+    def test_topk(self):
+
+        np.random.seed(123)
+        for _ in range(100):
+
+            # -- same as a stable argsort --
+            vals = self.do_load_rand_vals(500)
+            k = np.random.randint(1,100)
+            order = vnlb.cpu.topk(vals,k)
+            gt_order = np.argsort(vals,kind='stable')[:k]
+            np.testing.assert_array_equal(order,gt_order)
+
+    def test_topk_tau(self):
+
+        np.random.seed(123)
+        for _ in range(100):
+
+            # -- keep all values <= max(tau,kth) --
+            vals = self.do_load_rand_vals(500)
+            k = np.random.randint(1,100)
+            tau = np.random.rand()*25
+            order = vnlb.cpu.topk(vals,k,tau)
+            kth = np.sort(vals)[k-1]
+            gt_order = np.flatnonzero(vals <= max(tau,kth))
+            np.testing.assert_array_equal(np.sort(order),gt_order)
+
+            # -- sorted output --
+            assert np.all(np.diff(vals[order]) >= 0)
+
+    def test_numba_topk(self):
+
+        np.random.seed(123)
+        for _ in range(100):
+
+            # -- same order as "topk", with and without "tau" --
+            vals = self.do_load_rand_vals(500)
+            k = np.random.randint(1,100)
+            tau = np.float32(np.random.rand()*25)
+            hvals = np.zeros(k,dtype=np.float32)
+            hinds = np.zeros(k,dtype=np.int64)
+            order = np.zeros(500,dtype=np.int64)
+            for use_tau in [False,True]:
+                nsel = numba_topk(vals,k,use_tau,tau,hvals,hinds,order)
+                gt_order = vnlb.cpu.topk(vals,k,tau if use_tau else None)
+                np.testing.assert_array_equal(order[:nsel],gt_order)
+
+    def test_batch_search_ties(self):
+
+        np.random.seed(123)
+        t,c,h,w = 6,3,32,32
+        ps,ps_t,nW = 5,2,9
+        noisy,fflow,bflow = self.do_load_tied_video(t,c,h,w)
+        pidxs = np.array([ti*c*h*w + hi*w + wi for ti in range(t-ps_t+1)
+                          for hi in range(0,h-ps+1,5)
+                          for wi in range(0,w-ps+1,5)])
+
+        # -- the batched engine picks the same tied patches as "topk" --
+        for nfwd,nbwd in [(2,2),(1,1)]:
+            for tau in [None,400.]:
+                args = (noisy,fflow,bflow,20.,ps,ps_t,30,nW,nfwd,nbwd,False,True)
+                vals,inds,nSimPs = exec_sim_search_batch(pidxs,*args,tau=tau)
+                for bi,pidx in enumerate(pidxs):
+                    gt_vals,gt_inds,_,_ = exec_cpp_sim_search(pidx,*args,tau=tau)
+                    assert nSimPs[bi] == len(gt_inds)
+                    np.testing.assert_array_equal(inds[bi,:nSimPs[bi]],gt_inds)
+                    np.testing.assert_array_equal(vals[bi,:nSimPs[bi]],gt_vals)
+                    assert np.all(inds[bi,nSimPs[bi]:] == -1)
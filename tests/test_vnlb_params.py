@@ -49,3 +49,105 @@ class TestSetVnlbParams(unittest.TestCase):
     def test_vnlb_params(self):
         self.do_vnlb_param_pair(3,3,32,32)
         # self.do_vnlb_param_pair(10,3,256,256)
+
+    def test_vnlb_threads(self):
+
+        # -- create video  --
+        np.random.seed(123)
+        noisy = 255.*np.random.rand(3,3,32,32).astype(np.float32)
+        std = 30.
+        fflow,bflow = vnlb.swig.runPyFlow(noisy,std)
+        flows = {'fflow':fflow,'bflow':bflow}
+
+        # -- same output for every schedule; threads are reported --
+        denoised = None
+        for schedule in ["static","dynamic","guided","balanced"]:
+            pyargs = {'nThreads':[2,2],'nParts':[4,4],'ompSchedule':schedule}
+            results = vnlb.swig.runPyVnlb(noisy,std,flows,pyargs)
+            assert results['nthreads_omp'] == 2
+            if denoised is None: denoised = results['denoised']
+            np.testing.assert_array_equal(results['denoised'],denoised)
+
+            # -- per-tile stats; the mask bounds the processed groups --
+            assert results['ntiles'] == 4
+            assert results['tile_times'].shape == (2,4)
+            assert np.all(results['tile_times'] >= 0)
+            assert np.all(results['tile_groups'] <= results['tile_predicted'])
+            assert np.all(results['tile_groups'].sum(1) > 0)
+
+    def test_vnlb_session(self):
+
+        # -- create videos  --
+        np.random.seed(123)
+        std = 30.
+        shape = (3,3,32,32)
+        session = vnlb.swig.VnlbSession(shape,std,{'nThreads':[2,2]})
+
+        # -- repeated calls match "runPyVnlb" --
+        for i in range(3):
+            noisy = 255.*np.random.rand(*shape).astype(np.float32)
+            fflow,bflow = vnlb.swig.runPyFlow(noisy,std)
+            flows = {'fflow':fflow,'bflow':bflow}
+            results = vnlb.swig.runPyVnlb(noisy,std,flows,{'nThreads':[2,2]})
+            session_res = session.denoise(noisy,flows)
+            np.testing.assert_array_equal(session_res['denoised'],results['denoised'])
+            np.testing.assert_array_equal(session_res['basic'],results['basic'])
+
+    def test_lazy_tensors(self):
+
+        # -- only the outputs are allocated without inputs --
+        noisy = 255.*np.random.rand(3,3,32,32).astype(np.float32)
+        parse_tensors = vnlb.swig.vnlb.parser.parse_tensors
+        tensors,swig_tensors = parse_tensors(noisy,{})
+        for key in ['fflow','bflow','oracle','clean']:
+            assert tensors[key] is None
+        assert not(swig_tensors.use_flow)
+
+        # -- no flows; same as zero flows --
+        std = 30.
+        zflow = np.zeros((3,2,32,32),dtype=np.float32)
+        zflows = {'fflow':zflow,'bflow':zflow}
+        results = vnlb.swig.runPyVnlb(noisy,std,{},{'nThreads':[1,1]})
+        zresults = vnlb.swig.runPyVnlb(noisy,std,zflows,{'nThreads':[1,1]})
+        np.testing.assert_array_equal(results['denoised'],zresults['denoised'])
+
+    def test_vnlb_many(self):
+
+        # -- create videos  --
+        np.random.seed(123)
+        std = 30.
+        bursts = [255.*np.random.rand(3,3,32,32).astype(np.float32) for i in range(4)]
+
+        # -- threads give the same outputs as one call at a time --
+        pyargs = {'nThreads':[1,1]}
+        results = vnlb.swig.runPyVnlbMany(bursts,std,None,pyargs,2,True)
+        for burst,res in zip(bursts,results):
+            fflow,bflow = vnlb.swig.runPyFlow(burst,std)
+            flows = {'fflow':fflow,'bflow':bflow}
+            res_gt = vnlb.swig.runPyVnlb(burst,std,flows,dict(pyargs))
+            np.testing.assert_array_equal(res['denoised'],res_gt['denoised'])
+
+    def test_vnlb_batch(self):
+
+        # -- create videos of different lengths --
+        np.random.seed(123)
+        std = 30.
+        bursts = [255.*np.random.rand(t,3,32,32).astype(np.float32) for t in [3,4,3]]
+        flows = []
+        for burst in bursts:
+            fflow,bflow = vnlb.swig.runPyFlow(burst,std)
+            flows.append({'fflow':fflow,'bflow':bflow})
+
+        # -- processes give the same outputs as one call at a time --
+        pyargs = {'nThreads':[1,1]}
+        results = vnlb.swig.runPyVnlbBatch(bursts,std,flows,2,pyargs)
+        for burst,flows_b,res in zip(bursts,flows,results):
+            res_gt = vnlb.swig.runPyVnlb(burst,std,dict(flows_b),dict(pyargs))
+            np.testing.assert_array_equal(res['denoised'],res_gt['denoised'])
+            np.testing.assert_array_equal(res['basic'],res_gt['basic'])
+
+        # -- the flows are given for all videos or none --
+        with self.assertRaises(ValueError):
+            vnlb.swig.runPyVnlbBatch(bursts,std,[flows[0],None,flows[2]],2,pyargs)
+        with self.assertRaises(ValueError):
+            vnlb.swig.runPyVnlbBatch(bursts,std,flows[:2],2,pyargs)
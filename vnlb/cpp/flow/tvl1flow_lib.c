@@ -65,14 +65,15 @@ float energy_optic_flow(
 	// Compute the temporal difference (also called innovation ?)
 #pragma omp parallel for
 	for (int i = 0; i < size; i++)
-		diff[i] = abs(I1w[i] - I0[i]);
+		diff[i] = fabs(I1w[i] - I0[i]);
 	
 	forward_gradient(u1, u1x, u1y, nx ,ny);
 	forward_gradient(u2, u2x, u2y, nx ,ny);
 	
 #pragma omp parallel for reduction(+:energy)
 	for(int i = 0; i < size; ++i)
-		energy += abs(u1x[i]) + abs(u1y[i]) + lambda*diff[i];
+		energy += fabs(u1x[i]) + fabs(u1y[i]) + fabs(u2x[i]) + fabs(u2y[i])
+			+ lambda*diff[i];
 	energy /= size;
 
 	free(I1w);
@@ -104,13 +105,47 @@ void Dual_TVL1_optic_flow(
 		const float epsilon, // tolerance for numerical convergence
 		const bool  verbose  // enable/disable the verbose mode
 		)
+{
+	const int size = nx * ny;
+	float *I1x = (float*)xmalloc(size*sizeof(float));
+	float *I1y = (float*)xmalloc(size*sizeof(float));
+
+	centered_gradient(I1, I1x, I1y, nx, ny);
+	Dual_TVL1_optic_flow_grad(I0, I1, I1x, I1y, u1, u2, nx, ny,
+			tau, lambda, theta, warps, epsilon, verbose);
+
+	free(I1x);
+	free(I1y);
+}
+
+
+/**
+ *
+ * Function to compute the optical flow in one scale
+ * given the gradient of the target image
+ *
+ **/
+void Dual_TVL1_optic_flow_grad(
+		float *I0,           // source image
+		float *I1,           // target image
+		float *I1x,          // x derivative of the target image
+		float *I1y,          // y derivative of the target image
+		float *u1,           // x component of the optical flow
+		float *u2,           // y component of the optical flow
+		const int   nx,      // image width
+		const int   ny,      // image height
+		const float tau,     // time step
+		const float lambda,  // weight parameter for the data term
+		const float theta,   // weight parameter for (u - v)²
+		const int   warps,   // number of warpings per scale
+		const float epsilon, // tolerance for numerical convergence
+		const bool  verbose  // enable/disable the verbose mode
+		)
 {
 	const int   size = nx * ny;
 	const float l_t = lambda * theta;
 
 	size_t sf = sizeof(float);
-	float *I1x    = (float*)malloc(size*sf);
-	float *I1y    = (float*)xmalloc(size*sf);
 	float *I1w    = (float*)xmalloc(size*sf);
 	float *I1wx   = (float*)xmalloc(size*sf);
 	float *I1wy   = (float*)xmalloc(size*sf);
@@ -131,8 +166,6 @@ void Dual_TVL1_optic_flow(
 	float *u2y    = (float*)xmalloc(size*sf);
 	bool interrupt = false;
 
-	centered_gradient(I1, I1x, I1y, nx, ny);
-
 	// initialization of p
 	for (int i = 0; i < size; i++)
 	{
@@ -284,8 +317,6 @@ void Dual_TVL1_optic_flow(
 	}
 
 	// delete allocated memory
-	free(I1x);
-	free(I1y);
 	free(I1w);
 	free(I1wx);
 	free(I1wy);
@@ -396,51 +427,199 @@ void Dual_TVL1_optic_flow_multiscale(
 		const bool  verbose  // enable/disable the verbose mode
 )
 {
-	int size = nxx * nyy;
+	Dual_TVL1_optic_flow_multiscale_init(I0, I1, u1, u2, nxx, nyy,
+			tau, lambda, theta, nscales, fscale, zfactor,
+			warps, epsilon, verbose, false);
+}
 
-	// allocate memory for the pyramid structure
-	float **I0s = (float**)xmalloc(nscales * sizeof(float*));
-	float **I1s = (float**)xmalloc(nscales * sizeof(float*));
-	float **u1s = (float**)xmalloc(nscales * sizeof(float*));
-	float **u2s = (float**)xmalloc(nscales * sizeof(float*));
-	int    *nx  = (int*)xmalloc(nscales * sizeof(int));
-	int    *ny  = (int*)xmalloc(nscales * sizeof(int));
 
-	I0s[0] = (float*)xmalloc(size*sizeof(float));
-	I1s[0] = (float*)xmalloc(size*sizeof(float));
+/**
+ *
+ * Function to compute the optical flow using multiple scales,
+ * starting from the flow in (u1,u2) if "warm_start" is set
+ * (e.g. the flow of the previous pair of frames)
+ *
+ **/
+void Dual_TVL1_optic_flow_multiscale_init(
+		float *I0,           // source image
+		float *I1,           // target image
+		float *u1,           // x component of the optical flow
+		float *u2,           // y component of the optical flow
+		const int   nxx,     // image width
+		const int   nyy,     // image height
+		const float tau,     // time step
+		const float lambda,  // weight parameter for the data term
+		const float theta,   // weight parameter for (u - v)²
+		const int   nscales, // number of scales
+		const int   fscale , // finer scale (drop the scales finer than this one)
+		const float zfactor, // factor for building the image piramid
+		const int   warps,   // number of warpings per scale
+		const float epsilon, // tolerance for numerical convergence
+		const bool  verbose, // enable/disable the verbose mode
+		const bool  warm_start // start from the input flow
+)
+{
+	// pyramids of both images
+	tvl1_pyramid *P0 = tvl1_pyramid_create(I0, nxx, nyy, nscales, zfactor);
+	tvl1_pyramid *P1 = tvl1_pyramid_create(I1, nxx, nyy, nscales, zfactor);
 
-	u1s[0] = u1;
-	u2s[0] = u2;
-	nx [0] = nxx;
-	ny [0] = nyy;
+	Dual_TVL1_optic_flow_pyramid(P0, P1, u1, u2, tau, lambda, theta,
+			nscales, fscale, zfactor, warps, epsilon, verbose, warm_start);
 
-	// normalize the images between 0 and 255
-	image_normalization(I0, I1, I0s[0], I1s[0], size);
+	tvl1_pyramid_free(P0);
+	tvl1_pyramid_free(P1);
+}
 
-	// pre-smooth the original images
-	gaussian(I0s[0], nx[0], ny[0], PRESMOOTHING_SIGMA);
-	gaussian(I1s[0], nx[0], ny[0], PRESMOOTHING_SIGMA);
+
+/**
+ *
+ * Function to create the pyramid of an image; each scale is pre-smoothed
+ * and stores its centered gradient. The pyramid is not normalized, so
+ * the same pyramid serves every pair the image takes part in.
+ *
+ **/
+tvl1_pyramid *tvl1_pyramid_create(
+		const float *I,      // input image
+		const int   nxx,     // image width
+		const int   nyy,     // image height
+		const int   nscales, // number of scales
+		const float zfactor  // factor for building the image piramid
+)
+{
+	const int size = nxx * nyy;
+	tvl1_pyramid *P = (tvl1_pyramid*)xmalloc(sizeof(tvl1_pyramid));
+	P->nscales = nscales;
+	P->I  = (float**)xmalloc(nscales * sizeof(float*));
+	P->Ix = (float**)xmalloc(nscales * sizeof(float*));
+	P->Iy = (float**)xmalloc(nscales * sizeof(float*));
+	P->nx = (int*)xmalloc(nscales * sizeof(int));
+	P->ny = (int*)xmalloc(nscales * sizeof(int));
+	P->nx[0] = nxx;
+	P->ny[0] = nyy;
+
+	// range of the image for the normalization
+	getminmax(&P->min, &P->max, I, size);
+
+	// pre-smooth the original image
+	P->I[0] = (float*)xmalloc(size*sizeof(float));
+	for (int i = 0; i < size; i++)
+		P->I[0][i] = I[i];
+	gaussian(P->I[0], nxx, nyy, PRESMOOTHING_SIGMA);
 
 	// create the scales
 	for (int s = 1; s < nscales; s++)
 	{
-		zoom_size(nx[s-1], ny[s-1], &nx[s], &ny[s], zfactor);
-		const int sizes = nx[s] * ny[s];
+		zoom_size(P->nx[s-1], P->ny[s-1], &P->nx[s], &P->ny[s], zfactor);
+		P->I[s] = (float*)xmalloc(P->nx[s]*P->ny[s]*sizeof(float));
+		zoom_out(P->I[s-1], P->I[s], P->nx[s-1], P->ny[s-1], zfactor);
+	}
 
-		// allocate memory
-		I0s[s] = (float*)xmalloc(sizes*sizeof(float));
-		I1s[s] = (float*)xmalloc(sizes*sizeof(float));
-		u1s[s] = (float*)xmalloc(sizes*sizeof(float));
-		u2s[s] = (float*)xmalloc(sizes*sizeof(float));
+	// gradient of each scale
+	for (int s = 0; s < nscales; s++)
+	{
+		const int sizes = P->nx[s] * P->ny[s];
+		P->Ix[s] = (float*)xmalloc(sizes*sizeof(float));
+		P->Iy[s] = (float*)xmalloc(sizes*sizeof(float));
+		centered_gradient(P->I[s], P->Ix[s], P->Iy[s], P->nx[s], P->ny[s]);
+	}
+
+	return P;
+}
 
-		// zoom in the images to create the pyramidal structure
-		zoom_out(I0s[s-1], I0s[s], nx[s-1], ny[s-1], zfactor);
-		zoom_out(I1s[s-1], I1s[s], nx[s-1], ny[s-1], zfactor);
+
+/**
+ *
+ * Function to free the pyramid of an image
+ *
+ **/
+void tvl1_pyramid_free(tvl1_pyramid *P)
+{
+	if (!P) return;
+	for (int s = 0; s < P->nscales; s++)
+	{
+		free(P->I[s]);
+		free(P->Ix[s]);
+		free(P->Iy[s]);
+	}
+	free(P->I);
+	free(P->Ix);
+	free(P->Iy);
+	free(P->nx);
+	free(P->ny);
+	free(P);
+}
+
+
+/**
+ *
+ * Function to compute the optical flow using multiple scales
+ * from the pyramids of the two images; the pyramids are normalized
+ * between 0 and 255 (jointly) one scale at a time
+ *
+ **/
+void Dual_TVL1_optic_flow_pyramid(
+		const tvl1_pyramid *P0, // pyramid of the source image
+		const tvl1_pyramid *P1, // pyramid of the target image
+		float *u1,           // x component of the optical flow
+		float *u2,           // y component of the optical flow
+		const float tau,     // time step
+		const float lambda,  // weight parameter for the data term
+		const float theta,   // weight parameter for (u - v)²
+		const int   nscales, // number of scales
+		const int   fscale , // finer scale (drop the scales finer than this one)
+		const float zfactor, // factor for building the image piramid
+		const int   warps,   // number of warpings per scale
+		const float epsilon, // tolerance for numerical convergence
+		const bool  verbose, // enable/disable the verbose mode
+		const bool  warm_start // start from the input flow
+)
+{
+	const int *nx = P0->nx;
+	const int *ny = P0->ny;
+	const int size = nx[0] * ny[0];
+
+	// normalize both images between 0 and 255 (as "image_normalization")
+	const float max = (P0->max > P1->max)? P0->max : P1->max;
+	const float min = (P0->min < P1->min)? P0->min : P1->min;
+	const float den = max - min;
+	const float a = (den > 0) ? 255.0 / den : 1.0;
+	const float b = (den > 0) ? min : 0.0;
+
+	// normalized images of the current scale
+	size_t sf = sizeof(float);
+	float *I0n  = (float*)xmalloc(size*sf);
+	float *I1n  = (float*)xmalloc(size*sf);
+	float *I1xn = (float*)xmalloc(size*sf);
+	float *I1yn = (float*)xmalloc(size*sf);
+
+	// allocate memory for the flow pyramid
+	float **u1s = (float**)xmalloc(nscales * sizeof(float*));
+	float **u2s = (float**)xmalloc(nscales * sizeof(float*));
+	u1s[0] = u1;
+	u2s[0] = u2;
+	for (int s = 1; s < nscales; s++)
+	{
+		const int sizes = nx[s] * ny[s];
+		u1s[s] = (float*)xmalloc(sizes*sf);
+		u2s[s] = (float*)xmalloc(sizes*sf);
+
+		// zoom out the initial flow, scaled to this scale
+		if (warm_start)
+		{
+			zoom_out(u1s[s-1], u1s[s], nx[s-1], ny[s-1], zfactor);
+			zoom_out(u2s[s-1], u2s[s], nx[s-1], ny[s-1], zfactor);
+			for (int i = 0; i < sizes; i++)
+			{
+				u1s[s][i] *= zfactor;
+				u2s[s][i] *= zfactor;
+			}
+		}
 	}
 
 	// initialize the flow at the coarsest scale
-	for (int i = 0; i < nx[nscales-1] * ny[nscales-1]; i++)
-		u1s[nscales-1][i] = u2s[nscales-1][i] = 0.0;
+	if (!warm_start)
+		for (int i = 0; i < nx[nscales-1] * ny[nscales-1]; i++)
+			u1s[nscales-1][i] = u2s[nscales-1][i] = 0.0;
 
 	// pyramidal structure for computing the optical flow
 	for (int s = nscales-1; s >= fscale; s--)
@@ -448,9 +627,18 @@ void Dual_TVL1_optic_flow_multiscale(
 		if (verbose)
 			fprintf(stderr, "Scale %d: %dx%d\n", s, nx[s], ny[s]);
 
+		// normalize the current scale
+		for (int i = 0; i < nx[s] * ny[s]; i++)
+		{
+			I0n[i]  = a * (P0->I[s][i] - b);
+			I1n[i]  = a * (P1->I[s][i] - b);
+			I1xn[i] = a * P1->Ix[s][i];
+			I1yn[i] = a * P1->Iy[s][i];
+		}
+
 		// compute the optical flow at the current scale
-		Dual_TVL1_optic_flow(
-				I0s[s], I1s[s], u1s[s], u2s[s], nx[s], ny[s],
+		Dual_TVL1_optic_flow_grad(
+				I0n, I1n, I1xn, I1yn, u1s[s], u2s[s], nx[s], ny[s],
 				tau, lambda, theta, warps, epsilon, verbose
 		);
 
@@ -493,20 +681,15 @@ void Dual_TVL1_optic_flow_multiscale(
 	// delete allocated memory
 	for (int i = 1; i < nscales; i++)
 	{
-		free(I0s[i]);
-		free(I1s[i]);
 		free(u1s[i]);
 		free(u2s[i]);
 	}
-	free(I0s[0]);
-	free(I1s[0]);
-
-	free(I0s);
-	free(I1s);
 	free(u1s);
 	free(u2s);
-	free(nx);
-	free(ny);
+	free(I0n);
+	free(I1n);
+	free(I1xn);
+	free(I1yn);
 }
 
 
@@ -8,6 +8,19 @@
 #include <float.h>
 
 
+// pyramid of an image shared by every pair it takes part in
+typedef struct {
+int     nscales; // number of scales
+int    *nx;      // width of each scale
+int    *ny;      // height of each scale
+float **I;       // pre-smoothed image of each scale
+float **Ix;      // x derivative of each scale
+float **Iy;      // y derivative of each scale
+float   min;     // min of the original image
+float   max;     // max of the original image
+} tvl1_pyramid;
+
+
 void Dual_TVL1_optic_flow_multiscale(
 float *I0,           // source image
 float *I1,           // target image
@@ -26,6 +39,69 @@ const float epsilon, // tolerance for numerical convergence
 const bool  verbose  // enable/disable the verbose mode
 );
 
+void Dual_TVL1_optic_flow_multiscale_init(
+float *I0,           // source image
+float *I1,           // target image
+float *u1,           // x component of the optical flow
+float *u2,           // y component of the optical flow
+const int   nxx,     // image width
+const int   nyy,     // image height
+const float tau,     // time step
+const float lambda,  // weight parameter for the data term
+const float theta,   // weight parameter for (u - v)²
+const int   nscales, // number of scales
+const int   fscale , // finer scale (drop the scales finer than this one)
+const float zfactor, // factor for building the image piramid
+const int   warps,   // number of warpings per scale
+const float epsilon, // tolerance for numerical convergence
+const bool  verbose, // enable/disable the verbose mode
+const bool  warm_start // start from the input flow
+);
+
+tvl1_pyramid *tvl1_pyramid_create(
+const float *I,      // input image
+const int   nxx,     // image width
+const int   nyy,     // image height
+const int   nscales, // number of scales
+const float zfactor  // factor for building the image piramid
+);
+
+void tvl1_pyramid_free(tvl1_pyramid *P);
+
+void Dual_TVL1_optic_flow_pyramid(
+const tvl1_pyramid *P0, // pyramid of the source image
+const tvl1_pyramid *P1, // pyramid of the target image
+float *u1,           // x component of the optical flow
+float *u2,           // y component of the optical flow
+const float tau,     // time step
+const float lambda,  // weight parameter for the data term
+const float theta,   // weight parameter for (u - v)²
+const int   nscales, // number of scales
+const int   fscale , // finer scale (drop the scales finer than this one)
+const float zfactor, // factor for building the image piramid
+const int   warps,   // number of warpings per scale
+const float epsilon, // tolerance for numerical convergence
+const bool  verbose, // enable/disable the verbose mode
+const bool  warm_start // start from the input flow
+);
+
+void Dual_TVL1_optic_flow_grad(
+float *I0,           // source image
+float *I1,           // target image
+float *I1x,          // x derivative of the target image
+float *I1y,          // y derivative of the target image
+float *u1,           // x component of the optical flow
+float *u2,           // y component of the optical flow
+const int   nx,      // image width
+const int   ny,      // image height
+const float tau,     // time step
+const float lambda,  // weight parameter for the data term
+const float theta,   // weight parameter for (u - v)²
+const int   warps,   // number of warpings per scale
+const float epsilon, // tolerance for numerical convergence
+const bool  verbose  // enable/disable the verbose mode
+);
+
 void Dual_TVL1_optic_flow(
 float *I0,           // source image
 float *I1,           // target image
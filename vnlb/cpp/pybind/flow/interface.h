@@ -22,7 +22,10 @@ PyTvFlowParams() :
     nwarps(-1),
     epsilon(-1),
     verbose(0),
-    testing(0) {}
+    testing(0),
+    warm_start(0),
+    warm_nscales(-1),
+    warm_nwarps(-1) {}
 
 
   /***
@@ -44,6 +47,12 @@ PyTvFlowParams() :
   int   verbose;
   bool  testing;
 
+  // seed each pair with the flow of the previous pair;
+  // the seeded solves use "warm_nscales" and "warm_nwarps" [-1 = same]
+  bool  warm_start;
+  int   warm_nscales;
+  int   warm_nwarps;
+
 };
 
 void runTV1Flow(const PyTvFlowParams& args, const VnlbTensors& tensors);
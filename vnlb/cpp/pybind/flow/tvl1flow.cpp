@@ -12,6 +12,10 @@
 #include <string>
 #include <sstream>
 #include <float.h>
+#include <algorithm>
+#include <vector>
+#include <mutex>
+#include <omp.h>
 
 #include <vnlb/cpp/utils/VnlbAsserts.h>
 #include <vnlb/cpp/vnlb/VideoNLBayes.hpp>
@@ -39,15 +43,19 @@ void runTV1Flow(const PyTvFlowParams& args, const VnlbTensors& tensors) {
   float *fflow = tensors.fflow;
   float *bflow = tensors.bflow;
 
-  // set flow by direction
-  float *flow;
-  if (args.direction == 0){
-    flow = fflow;
-  }else if(args.direction == 1){
-    flow = bflow;
+  // directions to compute; "2" is both
+  int dir_start, dir_end;
+  if (args.direction == 0 || args.direction == 1){
+    dir_start = args.direction;
+    dir_end = args.direction+1;
+  }else if(args.direction == 2){
+    dir_start = 0;
+    dir_end = 2;
   }else{
     VNLB_THROW_MSG("invalid flow direction.");
   }
+  if (dir_start == 0) VNLB_THROW_IF_NOT_MSG(fflow,"the forward flow is null.");
+  if (dir_end == 2) VNLB_THROW_IF_NOT_MSG(bflow,"the backward flow is null.");
 
 
   // set params
@@ -58,8 +66,21 @@ void runTV1Flow(const PyTvFlowParams& args, const VnlbTensors& tensors) {
   const float N = 1 + log(hypot(w, h)/16.0) / log(1/params.zfactor);
   if (N < params.nscales)
     params.nscales = N;
-  if (params.nscales < params.fscale)
-    params.fscale = params.nscales;
+  if (params.nscales <= params.fscale)
+    params.fscale = params.nscales-1;
+
+  // [warm start] seeded solves may use a coarser pyramid and fewer warps
+  bool warm = args.warm_start;
+  tvFlowParams wparams = params;
+  if (args.warm_nscales > 0 && args.warm_nscales < wparams.nscales)
+    wparams.nscales = args.warm_nscales;
+  if (args.warm_nwarps > 0)
+    wparams.nwarps = args.warm_nwarps;
+  if (wparams.nscales <= wparams.fscale)
+    wparams.fscale = wparams.nscales-1;
+
+  // "nproc = 0" means use all available threads
+  int nThreads = (params.nproc > 0) ? params.nproc : omp_get_max_threads();
 
   // verbose printing
   if (params.verbose){
@@ -67,23 +88,65 @@ void runTV1Flow(const PyTvFlowParams& args, const VnlbTensors& tensors) {
     fprintf(stderr,
 	    "nproc=%d tau=%f lambda=%f theta=%f nscales=%d "
 	    "zfactor=%f nwarps=%d epsilon=%g direction=%d\n",
-	    params.nproc, params.tau, params.lambda,
+	    nThreads, params.tau, params.lambda,
 	    params.theta, params.nscales, params.zfactor,
 	    params.nwarps, params.epsilon, args.direction);
+    if (warm) fprintf(stderr,"warm start: nscales=%d nwarps=%d\n",
+		      wparams.nscales, wparams.nwarps);
   }
 
-  // run flows per image
+  // each (direction, image pair) is an independent solve; run them in
+  // parallel, unless there are fewer solves than threads, in which case
+  // each solve uses the threads itself. With a warm start, the pair "t"
+  // of a direction is seeded by its pair "t-1", so the pairs run in order
+  // and only the (up to two) directions of a pair run together.
   int hwc = h*w*c;
-  for (int _t = 0; _t < (t-1); ++_t){
+  int ndirs = dir_end - dir_start;
+  int npairs = std::max(t-1,0);
+  int njobs = (warm) ? ndirs : ndirs * npairs;
+  bool outer = njobs >= nThreads;
+  int prevThreads = omp_get_max_threads();
+  if (!outer) omp_set_num_threads(nThreads);
+
+  // the pyramid of a frame is built by its first solve, shared by
+  // the (up to four) solves using it, and freed after its last one;
+  // the solves go pair by pair, so only the frames of the pairs in
+  // flight hold a pyramid [two for a warm start]
+  std::vector<tvl1_pyramid*> pyramids(t,nullptr);
+  std::vector<int> nuses(t,0);
+  std::vector<std::mutex> frameMutex(t);
+  for (int _t = 0; _t < npairs; ++_t){
+    nuses[_t] += ndirs;
+    nuses[_t+1] += ndirs;
+  }
+  auto acquire = [&](int frame) -> tvl1_pyramid* {
+    std::lock_guard<std::mutex> lock(frameMutex[frame]);
+    if (!pyramids[frame]){
+      pyramids[frame] = tvl1_pyramid_create(burst + frame*hwc, w, h,
+                                            params.nscales, params.zfactor);
+    }
+    return pyramids[frame];
+  };
+  auto release = [&](int frame){
+    std::lock_guard<std::mutex> lock(frameMutex[frame]);
+    if (--nuses[frame] == 0){
+      tvl1_pyramid_free(pyramids[frame]);
+      pyramids[frame] = nullptr;
+    }
+  };
+
+  // the flow of pair "_t" in "direction"
+  auto solve = [&](int direction, int _t){
+    float *flow = (direction == 0) ? fflow : bflow;
 
     // message
     if (params.verbose){
-      fprintf(stdout,"Computing flow %d/%d\n",_t+1,t-1);
+      fprintf(stdout,"Computing flow %d/%d [direction %d]\n",_t+1,t-1,direction);
     }
 
     // pick offsets
-    int mult1 = (args.direction == 0) ? _t : (_t+1);
-    int mult2 = (args.direction == 0) ? (_t+1) : _t;
+    int mult1 = (direction == 0) ? _t : (_t+1);
+    int mult2 = (direction == 0) ? (_t+1) : _t;
 
     // point to image pairs
     float* image1 = burst + mult1*hwc;
@@ -93,14 +156,54 @@ void runTV1Flow(const PyTvFlowParams& args, const VnlbTensors& tensors) {
     float *u = flow + _t*(h*w*2);
     float *v = u + h*w;
 
+    // [warm start] seed with the flow of the previous pair
+    bool seeded = warm && (_t > 0);
+    if (seeded) std::memcpy(u,u - h*w*2,h*w*2*sizeof(float));
+    tvFlowParams& sparams = (seeded) ? wparams : params;
+
     //compute the optical flow
-    Dual_TVL1_optic_flow_multiscale(image1, image2, u, v,
-				    w, h, params.tau,
-				    params.lambda, params.theta,
-				    params.nscales, params.fscale,
-				    params.zfactor, params.nwarps,
-				    params.epsilon, params.verbose);
+    tvl1_pyramid* pyramid1 = acquire(mult1);
+    tvl1_pyramid* pyramid2 = acquire(mult2);
+    Dual_TVL1_optic_flow_pyramid(pyramid1, pyramid2, u, v,
+                                 sparams.tau, sparams.lambda, sparams.theta,
+                                 sparams.nscales, sparams.fscale,
+                                 sparams.zfactor, sparams.nwarps,
+                                 sparams.epsilon, sparams.verbose,
+                                 seeded);
+    release(mult1);
+    release(mult2);
+
+    // energy of the flow
+    if (tensors.flow_energy){
+      float *diff = new float[h*w];
+      tensors.flow_energy[direction*npairs + _t] =
+        energy_optic_flow(image1, image2, u, v, diff,
+                          w, h, params.lambda);
+      delete[] diff;
+    }
+  };
 
+  // [warm start] pairs in order; the directions of a pair in lockstep
+  int nsteps = (warm) ? npairs : 1;
+  for (int step = 0; step < nsteps; ++step){
+
+#pragma omp parallel num_threads(nThreads) if(outer)
+  {
+  // a solve inside the job loop runs on its thread only
+  if (outer) omp_set_num_threads(1);
+
+#pragma omp for schedule(dynamic)
+  for (int job = 0; job < njobs; ++job){
+
+    // unpack the job; both directions of a pair are neighbours
+    // so its pyramids are freed soon after they are built
+    int direction = dir_start + job % ndirs;
+    int _t = (warm) ? step : job / ndirs;
+    solve(direction,_t);
+
+  }
+  }
   }
+  omp_set_num_threads(prevThreads);
 
 }
@@ -16,6 +16,11 @@ VnlbTensors() :
     groupNoisy(nullptr),
     groupBasic(nullptr),
     indices(nullptr),
+    tile_times(nullptr),
+    tile_groups(nullptr),
+    tile_predicted(nullptr),
+    ntiles_max(0),
+    flow_energy(nullptr),
     use_flow(0),
     use_clean(0),
     use_oracle(0) {}
@@ -31,6 +36,7 @@ VnlbTensors() :
   float* basic;
   float* denoised;
 
+  // [optional] inputs may be null; read only if "use_*" is set
   float* fflow;
   float* bflow;
 
@@ -41,6 +47,15 @@ VnlbTensors() :
   float* groupBasic;
   unsigned* indices;
 
+  // [optional] per-tile stats of each step; shape (2,ntiles_max)
+  float* tile_times;
+  unsigned* tile_groups;
+  unsigned* tile_predicted;
+  int ntiles_max;
+
+  // [optional] TV-L1 energy of each flow; shape (2,t-1) [fwd,bwd]
+  float* flow_energy;
+
   bool use_flow;
   bool use_clean;
   bool use_oracle;
@@ -26,5 +26,11 @@ ReadVideoParams() :
   const char* video_paths;
 };
 
+#ifndef SWIG
+#include <mutex>
+// iio keeps static buffers; one reader at a time once the GIL is released
+std::mutex& iioMutex();
+#endif
+
 void readVideoForVnlbCpp(const ReadVideoParams& args, const VnlbTensors& tensors);
 void readVideoForFlowCpp(const ReadVideoParams& args, const VnlbTensors& tensors);
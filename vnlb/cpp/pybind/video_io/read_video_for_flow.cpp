@@ -47,6 +47,7 @@ void readVideoForFlowCpp(const ReadVideoParams& args, const VnlbTensors& tensors
   }
 
   // load cpp video
+  std::lock_guard<std::mutex> lock(iioMutex());
   int size = tensors.w*tensors.h;
   for(int tidx = args.first_frame;
       tidx <= args.last_frame;
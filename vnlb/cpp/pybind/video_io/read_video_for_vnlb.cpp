@@ -33,6 +33,11 @@ extern "C" {
 
 *******************************/
 
+std::mutex& iioMutex(){
+  static std::mutex mutex;
+  return mutex;
+}
+
 void readVideoForVnlbCpp(const ReadVideoParams& args, const VnlbTensors& tensors) {
 
   // prints
@@ -46,6 +51,7 @@ void readVideoForVnlbCpp(const ReadVideoParams& args, const VnlbTensors& tensors
   }
 
   // init videos
+  std::lock_guard<std::mutex> lock(iioMutex());
   Video<float> cppVideo,pyVideo;
   cppVideo.loadVideo(args.video_paths,args.first_frame,args.last_frame,args.frame_step);
   float* cppPtr = cppVideo.data.data();
@@ -228,3 +228,7 @@ void processNLBayesCpp(VideoNLB::nlbParams& params,
 void init_mask_cpp(MaskParams params, int& ngroups);
 void computeCovMatCpp(CovMatParams params);
 void runFlatAreasCpp(FlatAreaParams& flat_params,VideoNLB::nlbParams& params);
+void saveTileStats(const VideoNLB::tileStats& stats,
+                   const VnlbTensors& tensors, int step);
+int getOmpNumThreads();
+void setOmpNumThreads(int nthreads);
@@ -43,10 +43,13 @@ void processNLBayesCpp(VideoNLB::nlbParams& params,
   noisy.loadVideoFromPtr(tensors.noisy,w,h,c,t);
   basic.loadVideoFromPtr(tensors.basic,w,h,c,t);
   if (tensors.use_flow){
+    VNLB_THROW_IF_NOT_MSG(tensors.fflow && tensors.bflow,
+                          "use_flow is set but the flows are null.");
     fflow.loadVideoFromPtr(tensors.fflow,w,h,2,t);
     bflow.loadVideoFromPtr(tensors.bflow,w,h,2,t);
   }
   if (tensors.use_oracle){
+    VNLB_THROW_IF_NOT_MSG(tensors.oracle,"use_oracle is set but oracle is null.");
     oracle.loadVideoFromPtr(tensors.oracle,w,h,c,t);
   }
 
@@ -66,12 +66,16 @@ void runSimSearch(VideoNLB::nlbParams& params,
   if (params.isFirstStep){
     imBasic.loadVideoFromPtr(tensors.noisy,w,h,c,t);
   } else{
+    VNLB_THROW_IF_NOT_MSG(tensors.basic,"the 2nd step needs a basic estimate.");
     imBasic.loadVideoFromPtr(tensors.basic,w,h,c,t);
   }
   if (tensors.use_clean){
+    VNLB_THROW_IF_NOT_MSG(tensors.clean,"use_clean is set but clean is null.");
     imClean.loadVideoFromPtr(tensors.clean,w,h,c,t);
   }
   if (tensors.use_flow){
+    VNLB_THROW_IF_NOT_MSG(tensors.fflow && tensors.bflow,
+                          "use_flow is set but the flows are null.");
     fflow.loadVideoFromPtr(tensors.fflow,w,h,2,t);
     bflow.loadVideoFromPtr(tensors.bflow,w,h,2,t);
   }
@@ -182,7 +186,9 @@ void runSimSearch(VideoNLB::nlbParams& params,
     //              "groupNoisy.size(): %ld\n",gStep,groupNoisy.size());
     std::memcpy(tensors.groupNoisy+gStep,dataPtr,groupNoisy.size());
     dataPtr = groupBasic.data();
-    std::memcpy(tensors.groupBasic+gStep,dataPtr,groupBasic.size());
+    if (tensors.groupBasic != nullptr){
+      std::memcpy(tensors.groupBasic+gStep,dataPtr,groupBasic.size());
+    }
     // groupNoisy.saveVideoToPtr(tensors.groupNoisy);
     // groupBasic.saveVideoToPtr(tensors.groupBasic);
 
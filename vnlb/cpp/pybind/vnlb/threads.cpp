@@ -0,0 +1,39 @@
+
+#include <algorithm>
+
+#include <vnlb/cpp/pybind/interface.h>
+#include <vnlb/cpp/pybind/vnlb/interface.h>
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+int getOmpNumThreads(){
+#ifdef _OPENMP
+  return omp_get_max_threads();
+#else
+  return 1;
+#endif
+}
+
+void setOmpNumThreads(int nthreads){
+#ifdef _OPENMP
+  if (nthreads > 0) omp_set_num_threads(nthreads);
+#endif
+}
+
+void saveTileStats(const VideoNLB::tileStats& stats,
+                   const VnlbTensors& tensors, int step){
+
+  // -- copy the tiles of one step to (2,ntiles_max) arrays --
+  int ntiles = std::min((int)stats.nTiles, tensors.ntiles_max);
+  int offset = step * tensors.ntiles_max;
+  for (int n = 0; n < ntiles; n++){
+    if (tensors.tile_times != nullptr && n < stats.times[step].size())
+      tensors.tile_times[offset+n] = stats.times[step][n];
+    if (tensors.tile_groups != nullptr && n < stats.groups[step].size())
+      tensors.tile_groups[offset+n] = stats.groups[step][n];
+    if (tensors.tile_predicted != nullptr && n < stats.predicted[step].size())
+      tensors.tile_predicted[offset+n] = stats.predicted[step][n];
+  }
+}
@@ -40,15 +40,19 @@ void runVnlbTimed(VideoNLB::nlbParams& params1, VideoNLB::nlbParams& params2,
   noisy.loadVideoFromPtr(tensors.noisy,w,h,c,t);
   basic.loadVideoFromPtr(tensors.basic,w,h,c,t);
   if (tensors.use_flow){
+    VNLB_THROW_IF_NOT_MSG(tensors.fflow && tensors.bflow,
+                          "use_flow is set but the flows are null.");
     fflow.loadVideoFromPtr(tensors.fflow,w,h,2,t);
     bflow.loadVideoFromPtr(tensors.bflow,w,h,2,t);
   }
   if (tensors.use_oracle){
+    VNLB_THROW_IF_NOT_MSG(tensors.oracle,"use_oracle is set but oracle is null.");
     oracle.loadVideoFromPtr(tensors.oracle,w,h,c,t);
   }
 
   // Percentage or processed groups of patches over total number of pixels
   std::vector<float> groupsRatio;
+  VideoNLB::tileStats stats;
 
   // Run denoising algorithm
   auto tmp = params2.sizePatch;
@@ -58,7 +62,9 @@ void runVnlbTimed(VideoNLB::nlbParams& params1, VideoNLB::nlbParams& params2,
   start = std::chrono::system_clock::now();
 
   groupsRatio = VideoNLB::runNLBayesThreads(noisy, fflow, bflow, basic, final,
-  					    params1, params2, oracle);
+  					    params1, params2, oracle,
+  					    &stats);
+  saveTileStats(stats,tensors,0);
 
   end = std::chrono::system_clock::now();
   std::chrono::duration<double> elapsed_seconds = end - start;
@@ -75,13 +81,16 @@ void runVnlbTimed(VideoNLB::nlbParams& params1, VideoNLB::nlbParams& params2,
     printf("Done. Processed %5.2f%% of possible patch groups in 1st step, and\n"
 		       "%5.2f%% in 2nd step.\n", groupsRatio[0], groupsRatio[1]);
 
+  auto tmp1 = params1.sizePatch;
   params1.sizePatch = 0;
   params2.sizePatch = tmp;
   // re-load noisy image, see git issue #9 in pariasm/vnlb
   noisy.loadVideoFromPtr(tensors.noisy,w,h,c,t);
   start = std::chrono::system_clock::now();
   groupsRatio = VideoNLB::runNLBayesThreads(noisy, fflow, bflow, basic, final,
-  					    params1, params2, oracle);
+  					    params1, params2, oracle,
+  					    &stats);
+  saveTileStats(stats,tensors,1);
 
   end = std::chrono::system_clock::now();
   elapsed_seconds = end - start;
@@ -94,6 +103,15 @@ void runVnlbTimed(VideoNLB::nlbParams& params1, VideoNLB::nlbParams& params2,
     printf("Done. Processed %5.2f%% of possible patch groups in 1st step, and\n"
 		       "%5.2f%% in 2nd step.\n", groupsRatio[0], groupsRatio[1]);
 
+  // restore the 1st step so the params can be reused
+  params1.sizePatch = tmp1;
+
+  // report the number of threads and tiles
+  params1.nThreadsUsed = stats.nThreads;
+  params1.nTilesUsed = stats.nTiles;
+  params2.nThreadsUsed = stats.nThreads;
+  params2.nTilesUsed = stats.nTiles;
+
   // copy back to arrays
   final.saveVideoToPtr(tensors.denoised);
 
@@ -799,8 +799,13 @@ namespace VideoUtils
 	 * video : image to subdivide;
 	 * videoSub : will contain all sub-videos;
 	 * tiles : will store position of the tiles;
-	 * border : boundary around sub-videos;
-	 * ntiles : number of sub-videos wanted. Need to be a power of 2.
+	 * border : spatial boundary around sub-videos;
+	 * ntiles : number of spatial sub-videos wanted;
+	 * border_t : temporal boundary around sub-videos;
+	 * ntiles_t : number of temporal sub-videos wanted.
+	 *
+	 * The video is split into ntiles * ntiles_t parts, ordered by
+	 * (tile_t, tile_y, tile_x).
 	 */
 	template <class T>
 	void subDivideTight(
@@ -808,26 +813,25 @@ namespace VideoUtils
 		std::vector<Video<T> > &vidSub,
 		std::vector<TilePosition> &tiles,
 		const int border,
-		const int ntiles)
+		const int ntiles,
+		const int border_t = 0,
+		const int ntiles_t = 1)
 	{
-		/* FIXME current version splits the video only spatially.
-		 *       The reason is to mantain consistency with Marc's
-		 *       code. For its proper extension to video, we need
-		 *       to determine how to split the video in space and
-		 *       time. */
-
 		// Determine number of sub-images
 		unsigned u_nW, u_nH; // FIXME problem with unsigned and int
 		determineFactor((unsigned)ntiles, u_nW, u_nH);
 		int nW = (int)u_nW;
 		int nH = (int)u_nH;
+		int nT = std::max(1, ntiles_t);
 
 		const int wTmp = ceil(float(vid.sz.width ) / float(nW)); // sizes w/out
 		const int hTmp = ceil(float(vid.sz.height) / float(nH)); //     borders
+		const int tTmp = ceil(float(vid.sz.frames) / float(nT));
 
-		tiles.resize(ntiles);
-		vidSub.resize(ntiles);
-		for (int p = 0, n = 0; p < nH; p++)
+		tiles.resize(nT * ntiles);
+		vidSub.resize(nT * ntiles);
+		for (int k = 0, n = 0; k < nT; k++)
+		for (int p = 0;        p < nH; p++)
 		for (int q = 0;        q < nW; q++, n++)
 		{
 			// Set crop information
@@ -836,12 +840,12 @@ namespace VideoUtils
 			// origin of the crop. the crop contains the tile plus a border
 			tiles[n].origin_x = std::max(0, q * wTmp - border);
 			tiles[n].origin_y = std::max(0, p * hTmp - border);
-			tiles[n].origin_t = 0;
+			tiles[n].origin_t = std::max(0, k * tTmp - border_t);
 
 			// end of the crop
 			tiles[n].ending_x = std::min((int)vid.sz.width , (q+1) * wTmp + border);
 			tiles[n].ending_y = std::min((int)vid.sz.height, (p+1) * hTmp + border);
-			tiles[n].ending_t = vid.sz.frames;
+			tiles[n].ending_t = std::min((int)vid.sz.frames, (k+1) * tTmp + border_t);
 
 			// crop using symmetric boundary conditions
 			VideoUtils::crop(vid, vidSub[n], tiles[n]);
@@ -849,22 +853,22 @@ namespace VideoUtils
 			// tile position with respect to the other tiles
 			tiles[n].tile_x = q;
 			tiles[n].tile_y = p;
-			tiles[n].tile_t = 0;
+			tiles[n].tile_t = k;
 
 			// number of tiles
 			tiles[n].ntiles_x = nW;
 			tiles[n].ntiles_y = nH;
-			tiles[n].ntiles_t =  1;
+			tiles[n].ntiles_t = nT;
 
 			// coordinates of tile origin
 			tiles[n].tile_origin_x = q * wTmp;
-			tiles[n].tile_origin_y = p * wTmp;
-			tiles[n].tile_origin_t = 0;
+			tiles[n].tile_origin_y = p * hTmp;
+			tiles[n].tile_origin_t = k * tTmp;
 
 			// coordinates of tile end
 			tiles[n].tile_ending_x = std::min((int)vid.sz.width , (q+1) * wTmp);
 			tiles[n].tile_ending_y = std::min((int)vid.sz.height, (p+1) * hTmp);
-			tiles[n].tile_ending_t = vid.sz.frames;
+			tiles[n].tile_ending_t = std::min((int)vid.sz.frames, (k+1) * tTmp);
 		}
 
 		return;
@@ -1039,66 +1043,60 @@ namespace VideoUtils
 	 *
 	 * vid : image to reconstruct;
 	 * vidSub : will contain all sub-images;
-	 * border : boundary around sub-videos.
+	 * border : spatial boundary around sub-videos;
+	 * border_t : temporal boundary around sub-videos;
+	 * ntiles_t : number of temporal sub-videos.
 	 *
 	 * none.
 	 */
 	template <class T>
-	void subBuildTight(std::vector<Video<T> > const& vidSub, Video<T> &vid, const int border)
+	void subBuildTight(std::vector<Video<T> > const& vidSub, Video<T> &vid,
+	                   const int border, const int border_t = 0,
+	                   const int ntiles_t = 1)
 	{
-		/* FIXME current version builds a video that has been split
-		 *       only spatially by subDivide.
-		 *       The reason is to mantain consistency with Marc's
-		 *       code. For its proper extension to video, we need
-		 *       to determine how to split the video in space and
-		 *       time. */
-
 		assert(vidSub.size());
 		// assert(vidSub[0].sz.whcf);
 		// assert(vid.sz.whcf);
-		// assert(vid.sz.frames   == vidSub[0].sz.frames  );
 		// assert(vid.sz.channels == vidSub[0].sz.channels);
 
-		// Determine width and height composition
+		// Determine width, height and time composition
 		unsigned nW, nH;
-		determineFactor(vidSub.size(), nW, nH);
+		int nT = std::max(1, ntiles_t);
+		determineFactor(vidSub.size() / nT, nW, nH);
 		const int wTmp = ceil(float(vid.sz.width ) / float(nW)); // sizes w/out 
 		const int hTmp = ceil(float(vid.sz.height) / float(nH)); //     borders
+		const int tTmp = ceil(float(vid.sz.frames) / float(nT));
 
 		// Obtain inner image (containing boundaries)
-		// TODO pending decision for video
-		for (int p = 0, n = 0; p < nH; p++)
+		for (int k = 0, n = 0; k < nT; k++)
+		for (int p = 0;        p < nH; p++)
 		for (int q = 0;        q < nW; q++, n++)
 		{
 			// top-left-front corner of crop
 			int crop_ori_x = std::max(0, q * wTmp - border);
 			int crop_ori_y = std::max(0, p * hTmp - border);
-			int crop_ori_t = 0;
+			int crop_ori_t = std::max(0, k * tTmp - border_t);
 
 			// start of inner crop, removing the boundary
 			int ori_x = q * wTmp;
 			int ori_y = p * hTmp;
-			int ori_t = 0       ;
+			int ori_t = k * tTmp;
 
 			// end of inner crop
 			int end_x = std::min((q+1) * wTmp, (int)vid.sz.width );
 			int end_y = std::min((p+1) * hTmp, (int)vid.sz.height);
-			int end_t = 0       ;
+			int end_t = std::min((k+1) * tTmp, (int)vid.sz.frames);
 
 			// start of inner crop, with inner coordinates
 			int in_ori_x = ori_x - crop_ori_x;
 			int in_ori_y = ori_y - crop_ori_y;
 			int in_ori_t = ori_t - crop_ori_t;
 
-//			int  in_end_x = (q+1) * wTmp - out_ori_x;
-//			int  in_end_y = (p+1) * hTmp - out_ori_y;
-//			int  in_end_t = vid.sz.frames;
-
-			for (unsigned f = 0; f < vid.sz.frames  ; f++)
+			for (unsigned sf = in_ori_t, qf = ori_t; qf < end_t; sf++, qf++)
 			for (unsigned c = 0; c < vid.sz.channels; c++)
 			for (unsigned sy = in_ori_y, qy = ori_y; qy < end_y; sy++, qy++)
 			for (unsigned sx = in_ori_x, qx = ori_x; qx < end_x; sx++, qx++)
-				vid(qx, qy, f, c) = vidSub[n](sx, sy, f, c);
+				vid(qx, qy, qf, c) = vidSub[n](sx, sy, sf, c);
 		}
 
 		return;
@@ -19,6 +19,7 @@
 #include <iostream>
 #include <stdlib.h>
 #include <algorithm>
+#include <chrono>
 #include <math.h>
 #include <float.h>
 
@@ -279,6 +280,40 @@ void printNlbParameters(const nlbParams &prms)
 		printf("\tProcessing only frame %d\n\n", prms.onlyFrame);
 }
 
+/* Number of temporal parts so each tile fits in a memory budget.
+ *
+ * size      : size of the video;
+ * nParts    : number of spatial parts;
+ * border    : spatial border of the tiles;
+ * border_t  : temporal border of the tiles;
+ * memory    : budget per tile in MB.
+ *
+ * Counts the per-tile Videos of both steps: the crops of the noisy,
+ * basic, final and clean videos, the two flows, and the weight,
+ * variance and mask Videos of processNLBayes.
+ */
+unsigned partsForMemory(
+	VideoSize const& size,
+	const unsigned nParts,
+	const int border,
+	const int border_t,
+	const float memory)
+{
+	unsigned nW, nH;
+	VideoUtils::determineFactor(nParts, nW, nH);
+	const int wTile = std::min((int)size.width,  (int)ceil(float(size.width )/nW) + 2*border);
+	const int hTile = std::min((int)size.height, (int)ceil(float(size.height)/nH) + 2*border);
+	const float bytesPerPixel = sizeof(float) * (4 * size.channels + 2 * 2 + 2) + sizeof(char);
+
+	for (unsigned nT = 1; nT < size.frames; ++nT)
+	{
+		const int tTile = std::min((int)size.frames, (int)ceil(float(size.frames)/nT) + 2*border_t);
+		const float tileMB = bytesPerPixel * wTile * hTile * tTile / (1024.f * 1024.f);
+		if (tileMB <= memory) return nT;
+	}
+	return size.frames;
+}
+
 std::vector<float> runNLBayesThreads(
 	Video<float> & imNoisy,
 	Video<float> const& fflow,
@@ -287,7 +322,8 @@ std::vector<float> runNLBayesThreads(
 	Video<float> &imFinal,
 	const nlbParams prms1,
 	const nlbParams prms2,
-	Video<float> &imClean)
+	Video<float> &imClean,
+	tileStats* stats)
 {
 	// Only 1, 3 or 4-channels images can be processed.
 	const unsigned chnls = imNoisy.sz.channels;
@@ -364,52 +400,85 @@ std::vector<float> runNLBayesThreads(
 	if (steps == 2) VideoUtils::transformColorSpace(imBasic, true);
 
 	// Multithreading: split video in tiles
-    int maxThreads = -1;
 	unsigned nThreads = 1;
 #ifdef _OPENMP
-	maxThreads = omp_get_max_threads();
+    // "nThreads = 0" means use all available threads
     assert (prms1.nThreads == prms2.nThreads);
-    if ( (prms1.nThreads > maxThreads) || (prms1.nThreads == 0) ){
-      nThreads = maxThreads;
+    if (prms1.nThreads <= 0){
+      nThreads = omp_get_max_threads();
     }else{
       nThreads = prms1.nThreads;
-      omp_set_num_threads(nThreads);
-      // omp_set_dynamic(1);
-    }
-	if (prms1.verbose){
-      printf(ANSI_CYN "OpenMP is using %d threads\n" ANSI_RST, nThreads);
     }
 #endif
 
     // Parse num parts from paramters
-	unsigned nParts = 2 * nThreads; // number of video parts
+	unsigned nParts = 2 * nThreads; // number of spatial video parts
     assert(prms1.nParts == prms2.nParts);
     if (prms1.nParts > 0){
       nParts = prms1.nParts;
     }
-    assert(nThreads <= nParts);
-    // fprintf(stdout,"nThreads,nParts: %d,%d\n",nThreads,nParts);
 
 	// Borders added to each sub-division of the image (for multi-threading)
 	const int border = std::max(2*(prms1.sizeSearchWindow/2) + prms1.sizePatch - 1,
 	                            2*(prms2.sizeSearchWindow/2) + prms2.sizePatch - 1);
+	// (as in space, so the mask keeps the patches overlapping a part's first frame)
+	const int border_t = std::max(
+		2*((prms1.sizeSearchTimeFwd + prms1.sizeSearchTimeBwd + 1)/2) + prms1.sizePatchTime - 1,
+		2*((prms2.sizeSearchTimeFwd + prms2.sizeSearchTimeBwd + 1)/2) + prms2.sizePatchTime - 1);
+
+	// Number of temporal video parts; from a memory budget if not given
+	unsigned nPartsTime = 1;
+	if (prms1.nPartsTime > 0) nPartsTime = prms1.nPartsTime;
+	else if (prms1.tileMemory > 0)
+		nPartsTime = partsForMemory(size, nParts, border, border_t, prms1.tileMemory);
+	nPartsTime = std::max(1u, std::min(nPartsTime, size.frames));
+
+	// No empty parts: only ceil(frames/tTmp) parts of tTmp frames hold a frame
+	const unsigned tTmp = (size.frames + nPartsTime - 1) / nPartsTime;
+	nPartsTime = (size.frames + tTmp - 1) / tTmp;
+	const unsigned nTiles = nParts * nPartsTime;
+
+    // No more threads than tiles
+    nThreads = std::min(nThreads, nTiles);
+    if (stats != nullptr)
+    {
+      stats->nThreads = nThreads;
+      stats->nTiles = nTiles;
+    }
+    // fprintf(stdout,"nThreads,nParts: %d,%d\n",nThreads,nParts);
+
+#ifdef _OPENMP
+    // Schedule of the tile loop; chunk defaults to nTiles/nThreads
+    // ("balanced" hands out one tile at a time, largest first)
+    const bool balanced = (prms1.ompSchedule == SCHED_BALANCED);
+    int chunk = balanced ? 1 : std::max(1u, nTiles/nThreads);
+    if (prms1.ompChunk > 0) chunk = prms1.ompChunk;
+    omp_sched_t sched = omp_sched_dynamic;
+    if (prms1.ompSchedule == SCHED_STATIC) sched = omp_sched_static;
+    else if (prms1.ompSchedule == SCHED_GUIDED) sched = omp_sched_guided;
+    omp_set_schedule(sched, chunk);
+	if (prms1.verbose){
+      printf(ANSI_CYN "OpenMP is using %d threads for %d parts (%d x %d)\n" ANSI_RST,
+             nThreads, nTiles, nParts, nPartsTime);
+    }
+#endif
 
 	// Split optical flow
-	std::vector<Video<float> > fflowSub(nParts), bflowSub(nParts);
-	std::vector<VideoUtils::TilePosition > oflowCrops(nParts);
-	VideoUtils::subDivideTight(fflow, fflowSub, oflowCrops, border, nParts);
-	VideoUtils::subDivideTight(bflow, bflowSub, oflowCrops, border, nParts);
+	std::vector<Video<float> > fflowSub(nTiles), bflowSub(nTiles);
+	std::vector<VideoUtils::TilePosition > oflowCrops(nTiles);
+	VideoUtils::subDivideTight(fflow, fflowSub, oflowCrops, border, nParts, border_t, nPartsTime);
+	VideoUtils::subDivideTight(bflow, bflowSub, oflowCrops, border, nParts, border_t, nPartsTime);
 
 	// Divide the noisy image into sub-images in order to easier parallelize the process
-	std::vector<Video<float> > imNoisySub(nParts);
-	std::vector<Video<float> > imCleanSub(nParts);
-	std::vector<Video<float> > imBasicSub(nParts);
-	std::vector<VideoUtils::TilePosition > imCrops(nParts);
-	VideoUtils::subDivideTight(imNoisy, imNoisySub, imCrops, border, nParts);
-	VideoUtils::subDivideTight(imClean, imCleanSub, imCrops, border, nParts);
-	VideoUtils::subDivideTight(imBasic, imBasicSub, imCrops, border, nParts);
+	std::vector<Video<float> > imNoisySub(nTiles);
+	std::vector<Video<float> > imCleanSub(nTiles);
+	std::vector<Video<float> > imBasicSub(nTiles);
+	std::vector<VideoUtils::TilePosition > imCrops(nTiles);
+	VideoUtils::subDivideTight(imNoisy, imNoisySub, imCrops, border, nParts, border_t, nPartsTime);
+	VideoUtils::subDivideTight(imClean, imCleanSub, imCrops, border, nParts, border_t, nPartsTime);
+	VideoUtils::subDivideTight(imBasic, imBasicSub, imCrops, border, nParts, border_t, nPartsTime);
 
-	std::vector<Video<float> > imFinalSub(nParts);
+	std::vector<Video<float> > imFinalSub(nTiles);
 
 	std::vector<nlbParams> prms(2);
 	prms[0] = prms1;
@@ -424,45 +493,74 @@ std::vector<float> runNLBayesThreads(
 				if (iter == 0)
 				{
 					printf("1st Step\n");
-					for (int p = 0; p < nParts; ++p) printf("\n");
+					for (int p = 0; p < nTiles; ++p) printf("\n");
 				}
 				else
 				{
-					if (steps == 2) for (int p = 0; p <= nParts; ++p) printf("\n");
-					printf("\x1b[%dF2nd Step\n",nParts+1);
-					for (int p = 0; p < nParts; ++p) printf("\x1b[2K\n");
+					if (steps == 2) for (int p = 0; p <= nTiles; ++p) printf("\n");
+					printf("\x1b[%dF2nd Step\n",nTiles+1);
+					for (int p = 0; p < nTiles; ++p) printf("\x1b[2K\n");
 				}
 			}
 
+			// Predicted work of each tile: the groups in its mask
+			std::vector<unsigned> groupsPredictedSub(nTiles);
+			for (int n = 0; n < (int)nTiles; n++){
+				Video<char> mask(imNoisySub[n].sz.width, imNoisySub[n].sz.height,
+				                 imNoisySub[n].sz.frames, 1, false);
+				groupsPredictedSub[n] = computeMask(mask, prms[iter], imCrops[n]);
+			}
+
+			// Order of the tiles; largest predicted work first if balanced
+			std::vector<int> order(nTiles);
+			for (int n = 0; n < (int)nTiles; n++) order[n] = n;
+			if (prms[iter].ompSchedule == SCHED_BALANCED)
+				std::stable_sort(order.begin(), order.end(), [&](int a, int b){
+					return groupsPredictedSub[a] > groupsPredictedSub[b]; });
+
 			// Process all sub-images
-			std::vector<unsigned> groupsProcessedSub(nParts);
+			std::vector<unsigned> groupsProcessedSub(nTiles);
+			std::vector<float> timesSub(nTiles);
 #ifdef _OPENMP
 			// we make a copy of prms structure because, since it is constant,
 			// it causes a compilation error with OpenMP (only on IPOL server)
 			nlbParams prms_cpy(prms[iter]);
-#pragma omp parallel for schedule(dynamic, nParts/nThreads) \
-			num_threads(4) \
+#pragma omp parallel for schedule(runtime) \
+			num_threads(nThreads) \
 			shared(imNoisySub, imBasicSub, imFinalSub) \
 			firstprivate(prms_cpy)
 #endif
-			for (int n = 0; n < (int)nParts; n++){
+			for (int i = 0; i < (int)nTiles; i++){
+				const int n = order[i];
               // fprintf(stdout,"iter,n: %d,%d\n",iter,n);
               // fprintf(stdout,"n: %d,%d,%d\n",n,
               //         imNoisySub[n].sz.width,imNoisySub[n].sz.whcf);
+				auto start = std::chrono::steady_clock::now();
 				groupsProcessedSub[n] =
 					processNLBayes(imNoisySub[n], fflowSub[n], bflowSub[n],
 					               imBasicSub[n], imFinalSub[n], prms[iter], imCrops[n],
 					               imCleanSub[n]);
+				std::chrono::duration<float> elapsed =
+					std::chrono::steady_clock::now() - start;
+				timesSub[n] = elapsed.count();
             }
 
-			for (int n = 0; n < (int)nParts; n++)
+			for (int n = 0; n < (int)nTiles; n++)
 				groupsRatio[iter] += 100.f * (float)groupsProcessedSub[n]/(float)size.whf;
+
+			// Report the tiles
+			if (stats != nullptr)
+			{
+				stats->predicted[iter] = groupsPredictedSub;
+				stats->groups[iter] = groupsProcessedSub;
+				stats->times[iter] = timesSub;
+			}
 		}
     }
 
 	// Get the basic estimate
-	VideoUtils::subBuildTight(imBasicSub, imBasic, border);
-	VideoUtils::subBuildTight(imFinalSub, imFinal, border);
+	VideoUtils::subBuildTight(imBasicSub, imBasic, border, border_t, nPartsTime);
+	VideoUtils::subBuildTight(imFinalSub, imFinal, border, border_t, nPartsTime);
 
 	// YUV to RGB
 	VideoUtils::transformColorSpace(imNoisy, false);
@@ -473,32 +571,18 @@ std::vector<float> runNLBayesThreads(
 	return groupsRatio;
 }
 
-unsigned processNLBayes(
-	Video<float> const& imNoisy,
-	Video<float> const& fflow,
-	Video<float> const& bflow,
-	Video<float> &imBasic,
-	Video<float> &imFinal,
+unsigned computeMask(
+	Video<char> &mask,
 	nlbParams const& params,
-	VideoUtils::TilePosition crop,
-	Video<float> const &imClean)
+	VideoUtils::TilePosition const& crop)
 {
-	using std::vector;
-
 	// Parameters initialization
-	const bool step1 = params.isFirstStep;
 	const unsigned sWx = params.sizeSearchWindow;
 	const unsigned sWt = params.sizeSearchTimeFwd +
 	                     params.sizeSearchTimeBwd + 1;// VIDEO
 	const unsigned sPx = params.sizePatch;
 	const unsigned sPt = params.sizePatchTime;
-	const VideoSize sz = imNoisy.sz;
-
-	// Weight sum per pixel
-	Video<float> weight(sz.width, sz.height, sz.frames, 1, 0.f);
-
-	// Processing mask: true for pixels that need to be processed
-	Video<char> mask(sz.width, sz.height, sz.frames, 1, false);
+	const VideoSize sz = mask.sz;
 
 	// There's a border added only if the crop doesn't touch the source image border
     // fprintf(stdout,"crop.origin(x,y,t): (%d,%d,%d)\n",
@@ -516,7 +600,7 @@ unsigned processNLBayes(
 	bool border_y1 = crop.ending_y < crop.source_sz.height;
 	bool border_t1 = crop.ending_t < crop.source_sz.frames;
 
-	int n_groups = 0;
+	unsigned n_groups = 0;
 	unsigned stepx = params.procStep;
 	unsigned stepy = params.procStep;
 	unsigned stepf = 1;
@@ -571,6 +655,39 @@ unsigned processNLBayes(
 		}
 	}
 
+	return n_groups;
+}
+
+unsigned processNLBayes(
+	Video<float> const& imNoisy,
+	Video<float> const& fflow,
+	Video<float> const& bflow,
+	Video<float> &imBasic,
+	Video<float> &imFinal,
+	nlbParams const& params,
+	VideoUtils::TilePosition crop,
+	Video<float> const &imClean)
+{
+	using std::vector;
+
+	// Parameters initialization
+	const bool step1 = params.isFirstStep;
+	const unsigned sWx = params.sizeSearchWindow;
+	const unsigned sWt = params.sizeSearchTimeFwd +
+	                     params.sizeSearchTimeBwd + 1;// VIDEO
+	const unsigned sPx = params.sizePatch;
+	const unsigned sPt = params.sizePatchTime;
+	const VideoSize sz = imNoisy.sz;
+
+	// Weight sum per pixel
+	Video<float> weight(sz.width, sz.height, sz.frames, 1, 0.f);
+
+	// Processing mask: true for pixels that need to be processed
+	Video<char> mask(sz.width, sz.height, sz.frames, 1, false);
+
+	// Fill the processing mask
+	int n_groups = computeMask(mask, params, crop);
+
 	// Used matrices during Bayes' estimate
 	const unsigned patch_dim = sPx * sPx * sPt *
       (params.coupleChannels ? sz.channels : 1);
@@ -100,6 +100,17 @@ struct matWorkspace
 	std::vector<float> covEigVals; // buffer to store the eigenvals
 };
 
+/* Structure reporting the tiles of runNLBayesThreads.
+ */
+struct tileStats
+{
+	unsigned nThreads;                // number of threads used
+	unsigned nTiles;                  // number of tiles (nParts * nPartsTime)
+	std::vector<unsigned> predicted[2]; // groups in the mask of each tile, for each step
+	std::vector<unsigned> groups[2];  // groups processed per tile, for each step
+	std::vector<float> times[2];      // seconds per tile, for each step
+};
+
 /* Initialize Parameters of the NL-Bayes algorithm.
  *
  * params : parameter structure to be filled
@@ -152,6 +163,16 @@ void setNSimilarPatches(nlbParams& prms, unsigned nSimilarPatches);
  */
 void printNlbParameters(const nlbParams &params);
 
+/* Number of temporal parts so that each tile, with its borders,
+ * fits in a memory budget of "memory" MB.
+ */
+unsigned partsForMemory(
+	VideoSize const& size,
+	const unsigned nParts,
+	const int border,
+	const int border_t,
+	const float memory);
+
 /* Run the NL-Bayes algorithm in several parallel CPU threads by splitting
  * the video in tiles.
  *
@@ -163,6 +184,12 @@ void printNlbParameters(const nlbParams &params);
  * params1: parameters for first step
  * params1: parameters for second step
  * imClean: original video used as an oracle
+ * stats  : [optional] will contain the threads, group counts and
+ *          timings of the tiles
+ *
+ * With the SCHED_BALANCED schedule, the tiles are started in decreasing
+ * order of their mask's group count (largest first) so the predicted work
+ * is balanced across threads.
  *
  * Returns: Percentage of processed groups over number of pixels.
  */
@@ -174,7 +201,21 @@ std::vector<float> runNLBayesThreads(
 	Video<float> &imFinal,
 	const nlbParams params1,
 	const nlbParams params2,
-	Video<float> &imClean);
+	Video<float> &imClean,
+	tileStats* stats = nullptr);
+
+/* Fill the processing mask of a tile.
+ *
+ * mask   : processing mask, true for the reference patches (output)
+ * params : parameters of the method
+ * crop   : coordinates of the tile
+ *
+ * Returns: Number of groups of patches in the mask
+ */
+unsigned computeMask(
+	Video<char> &mask,
+	nlbParams const& params,
+	VideoUtils::TilePosition const& crop);
 
 /* Run a step of the NL-Bayes denoising for a tile.
  *
@@ -9,6 +9,9 @@
 // allow for use input to change denoising mode
 enum VAR_MODE { CLIPPED, PAUL_VAR, PAUL_SIMPLE, FAT_OG };
 
+// openmp schedule of the tile loop in "runNLBayesThreads"
+enum SCHED_MODE { SCHED_STATIC, SCHED_DYNAMIC, SCHED_GUIDED, SCHED_BALANCED };
+
 namespace VideoNLB
 {
 
@@ -50,6 +53,12 @@ struct nlbParams {
   VAR_MODE var_mode;
   int nThreads;
   int nParts;
+  int nPartsTime;             // number of temporal parts (0 means from tileMemory)
+  float tileMemory;           // memory budget per tile in MB (0 means no budget)
+  SCHED_MODE ompSchedule;     // openmp schedule of the tiles
+  int ompChunk;               // chunk size of the schedule (0 means nParts/nThreads)
+  int nThreadsUsed;           // [output] number of threads used for the tiles
+  int nTilesUsed;             // [output] number of tiles
 
   // to allow for inputs in the swig-python code (hacky)
   bool use_imread;
@@ -33,13 +33,32 @@ from .loader import *
 import numpy as np
 from easydict import EasyDict as edict
 
-def compute_flow(noisy,sigma):
+def compute_flow(noisy,sigma,cache=None,flow_scale=None,method="tvl1"):
+    """
+
+    TV-L1 flows with the default params; "cache" as in "swig.runPyFlow"
+
+    The flows are estimated at "flow_scale" (1, 1/2 or 1/4) of the
+    resolution and upsampled; the default params use 1/2 ("fscale" = 1).
+
+    With method "bm", the flows are estimated by the (faster)
+    coarse-to-fine block matching of "cpu.runBlockMatchFlow" with
+    quarter-pixel vectors; "cache" and "flow_scale" apply to TV-L1 only.
+
+    """
     assert isinstance(noisy,np.ndarray)
-    flow_params = {"nproc":0,"tau":0.25,"lambda":0.2,"theta":0.3,"nscales":100,
-                   "fscale":1,"zfactor":0.5,"nwarps":5,"epsilon":0.01,
-                   "verbose":False,"testing":False,'bw':False}
-    flowImages = utils.rgb2bw(noisy)
-    fflow,bflow = swig.runPyFlow(flowImages,sigma,flow_params)
+    if method == "tvl1":
+        flowImages = utils.rgb2bw(noisy)
+        flow_params = {"nproc":0,"tau":0.25,"lambda":0.2,"theta":0.3,"nscales":100,
+                       "fscale":1,"zfactor":0.5,"nwarps":5,"epsilon":0.01,
+                       "verbose":False,"testing":False,'bw':False,'cache':cache}
+        if not(flow_scale is None): flow_params['flow_scale'] = flow_scale
+        fflow,bflow = swig.runPyFlow(flowImages,sigma,flow_params)
+    elif method == "bm":
+        flow_params = {"bsize":8,"radius":8,"nscales":3,"subpel":4}
+        fflow,bflow = cpu.runBlockMatchFlow(noisy,sigma,flow_params)
+    else:
+        raise ValueError(f"Uknown flow method [{method}]")
     flows = edict()
     flows.fflow = fflow
     flows.bflow = bflow
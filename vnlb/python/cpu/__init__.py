@@ -1,8 +1,12 @@
-from .sim_search import runSimSearch,idx2coords,simSearchImage
+from .sim_search import runSimSearch,idx2coords,simSearchImage,simSearchVideo,getColorXform
 from .bayes_est import runBayesEstimate
 from .comp_agg import computeAggregation
 from .vnlb import runPythonVnlb
+from .tiles import runPythonVnlbTiled,subDivideTight,subBuildTight
 from .proc_nlb import processNLBayes
 from .init_mask import initMask
-from .cov_mat import computeCovMat
+from .cov_mat import computeCovMat,computeCovMatAccuracy
 from .flat_areas import runFlatAreas
+from .topk import topk
+from .workspace import Workspace
+from .block_match import runBlockMatchFlow
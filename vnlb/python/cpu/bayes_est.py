@@ -4,8 +4,9 @@ import numpy as np
 from einops import rearrange,repeat
 import svnlb
 
-from .cov_mat import computeCovMat
-from svnlb.utils import groups2patches,patches2groups
+from .cov_mat import computeCovMat,computeCovMatBatch
+from .workspace import Workspace
+from svnlb.utils import groups2patches,patches2groups,optional
 
 def check_steps(step1,step):
     is_step_1 = (step1 == True) and (step == 0)
@@ -34,12 +35,14 @@ def runBayesEstimate(groupNoisy,groupBasic,rank_var,nSimP,shape,
     sigmab2 = params['beta'][step] * params['sigmaBasic'][step]**2 if step==1 else sigma**2
     rank =  params['rank'][step]
     thresh =  params['variThres'][step]
+    solver = optional(params,'covSolver',["exact","exact"],object)[step]
     t,c,h,w = shape
     group_chnls = 1 if couple_ch else c
 
     # -- exec python version --
     results = exec_bayes_estimate(groupNoisy,groupBasic,sigma,sigmab2,rank,nSimP,
-                                  c,group_chnls,thresh,step==1,flatPatch,groupClean)
+                                  c,group_chnls,thresh,step==1,flatPatch,groupClean,
+                                  solver=solver)
 
     # -- format results --
     results['psX'] = ps
@@ -47,6 +50,137 @@ def runBayesEstimate(groupNoisy,groupBasic,rank_var,nSimP,shape,
 
     return results
 
+def runBayesEstimateBatch(groupNoisy,groupBasic,rank_var,nSimP,shape,
+                          params,step=0,flatPatch=None,groupClean=None,
+                          wspace=None):
+    """
+
+    Bayes estimate for a batch of groups of shape (B,c,psT,psX,psX,nSimP)
+
+    """
+
+    # -- extract info for explicit call --
+    ps = params['sizePatch'][step]
+    ps_t = params['sizePatchTime'][step]
+    couple_ch = params['coupleChannels'][step]
+    step1 = params['isFirstStep'][step]
+    check_steps(step1,step)
+    sigma = params['sigma'][step]
+    sigmab2 = params['beta'][step] * params['sigmaBasic'][step]**2 if step==1 else sigma**2
+    rank =  params['rank'][step]
+    thresh =  params['variThres'][step]
+    solver = optional(params,'covSolver',["exact","exact"],object)[step]
+    t,c,h,w = shape
+    group_chnls = 1 if couple_ch else c
+
+    # -- exec batched python version; groups are updated in-place --
+    if flatPatch is None:
+        flatPatch = np.zeros(groupNoisy.shape[0],dtype=np.bool_)
+    rank_var = exec_bayes_estimate_batch(groupNoisy,groupBasic,sigma,sigmab2,rank,
+                                         nSimP,c,group_chnls,thresh,step==1,
+                                         flatPatch,groupClean,solver=solver,
+                                         wspace=wspace)
+
+    # -- format results --
+    results = {}
+    results['groupNoisy'] = groupNoisy
+    results['groupBasic'] = groupBasic
+    results['rank_var'] = rank_var
+    results['psX'] = ps
+    results['psT'] = ps_t
+
+    return results
+
+def exec_bayes_estimate_batch(groupNoisy,groupBasic,sigma,sigmab2,
+                              rank,nSimP,channels,group_chnls,thresh,
+                              step2,flatPatch,groupClean=None,mod_sel="clipped",
+                              solver="exact",wspace=None):
+
+    # -- shaping --
+    if wspace is None: wspace = Workspace()
+    nbatch,c = groupNoisy.shape[:2]
+    pdim = groupNoisy[0,0].size // nSimP
+    gNoisy = groupNoisy.reshape(nbatch,c,pdim,nSimP)
+    gBasic = None if groupBasic is None else groupBasic.reshape(nbatch,c,pdim,nSimP)
+    gClean = None if groupClean is None else groupClean.reshape(nbatch,c,pdim,nSimP)
+
+    # -- group basic --
+    centerBasic = None
+    if step2:
+        centerBasic = wspace.get("centerBasic",(nbatch,c,pdim))
+        np.mean(gBasic,axis=-1,out=centerBasic)
+        gBasic -= centerBasic[...,None]
+
+    # -- group clean --
+    centerClean = None
+    if not(gClean is None):
+        centerClean = wspace.get("centerClean",(nbatch,c,pdim))
+        np.mean(gClean,axis=-1,out=centerClean)
+        gClean -= centerClean[...,None]
+
+    # -- group noisy --
+    centerNoisy = wspace.get("center",(nbatch,c,pdim))
+    np.mean(gNoisy,axis=-1,out=centerNoisy)
+    if step2:
+        for b in np.flatnonzero(flatPatch):
+            centerNoisy[b] = centerBasic[b]
+    if not(centerClean is None):
+        centerNoisy = centerClean
+    gNoisy -= centerNoisy[...,None]
+
+    # -- denoising! --
+    rank_var = wspace.get("rank_var",(nbatch,),np.float32,0.)
+    for chnl in range(group_chnls):
+
+        # -- select data to create denoiser --
+        gInput = gNoisy if not(step2) else gBasic
+        if not(gClean is None): gInput = gClean
+
+        # -- cov mat into the workspace --
+        covMat = None
+        if solver in ["exact","eigh"]:
+            covMat = wspace.get("covMat",(nbatch,pdim,pdim))
+            np.matmul(gInput[:,chnl],gInput[:,chnl].transpose(0,2,1),out=covMat)
+            covMat /= nSimP
+
+        # -- compute the denoiser info for the whole batch --
+        results = computeCovMatBatch(gInput[:,chnl],rank,covMat,solver)
+        eigVals,eigVecs = results.covEigVals,results.covEigVecs
+        eigVals = denoise_eigvals_batch(eigVals,sigmab2,mod_sel)
+        rank_var += np.sum(eigVals,axis=1)
+        eigVals = bayes_filter_coeff(eigVals,sigma,thresh)
+
+        # -- run the denoiser: hX = U * W * U' * X --
+        Z = wspace.get("Z",(nbatch,nSimP,rank))
+        R = wspace.get("R",(nbatch,pdim,rank))
+        update_group_batch(gNoisy[:,chnl],eigVals,eigVecs,Z,R,out=gNoisy[:,chnl])
+
+    # -- add back center --
+    gNoisy += centerNoisy[...,None]
+
+    return rank_var
+
+def denoise_eigvals_batch(eigVals,sigmab2,mod_sel):
+    if mod_sel == "clipped":
+        eigVals -= np.minimum(eigVals,sigmab2)
+    else:
+        raise ValueError(f"Uknown eigen-stuff modifier: [{mod_sel}]")
+    return eigVals
+
+def update_group_batch(groupInput,eigVals,eigVecs,Z=None,R=None,out=None):
+
+    # Z = X' * U [ (B x n x p) x (B x p x r) ]
+    Z = np.matmul(groupInput.transpose(0,2,1),eigVecs,out=Z)
+
+    # R = U * W
+    R = np.multiply(eigVecs,eigVals[:,None,:],out=R)
+
+    # hX' = Z * R'; the products of "update_group", so both paths agree exactly
+    if out is None: out = np.empty_like(groupInput)
+    np.matmul(Z,R.transpose(0,2,1),out=out.transpose(0,2,1))
+
+    return out
+
 def index_groups(group,nSimP,pdim,c):
     igroup = group.ravel()[nSimP*pdim * c:nSimP*pdim * (c+1)]
     return igroup.reshape(pdim,nSimP)
@@ -175,7 +309,8 @@ def exec_bayes_estimate_v2(groupNoisy,groupBasic,sigma,sigmab2,
 
 def exec_bayes_estimate(groupNoisy,groupBasic,sigma,sigmab2,
                         rank,nSimP,channels,group_chnls,thresh,
-                        step2,flatPatch,groupClean=None,mod_sel="clipped"):
+                        step2,flatPatch,groupClean=None,mod_sel="clipped",
+                        solver="exact"):
 
     # -- shaping --
     shape = list(groupNoisy.shape)
@@ -218,7 +353,7 @@ def exec_bayes_estimate(groupNoisy,groupBasic,sigma,sigmab2,
         # -- compute the denoiser info --
         group_c = index_groups(groupInput,nSimP,pdim,chnl)
         # print("g: ",group_c.min(),group_c.max())
-        covMat,eigVals,eigVecs = compute_eig_stuff(group_c,shape,rank)
+        covMat,eigVals,eigVecs = compute_eig_stuff(group_c,shape,rank,solver)
         # print("c: ",covMat.min(),covMat.max())
         # print(chnl,eigVals)
         eigVals = denoise_eigvals(eigVals,sigmab2,mod_sel,rank)
@@ -260,12 +395,12 @@ def exec_bayes_estimate(groupNoisy,groupBasic,sigma,sigmab2,
     results['rank_var'] = rank_var
     return results
 
-def compute_eig_stuff(group,shape,rank):
+def compute_eig_stuff(group,shape,rank,solver="exact"):
 
     # -- exec --
     group = group.reshape(shape)
     # results = svnlb.swig.computeCovMat(group,rank)
-    results = computeCovMat(group,rank)
+    results = computeCovMat(group,rank,solver=solver)
 
     # -- unpack --
     covMat = results.covMat
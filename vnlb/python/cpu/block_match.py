@@ -0,0 +1,198 @@
+
+import numpy as np
+from numba import njit,prange
+
+from svnlb.utils import optional
+
+def runBlockMatchFlow(noisy,sigma,params=None):
+    """
+
+    Forward and backward flows of each pair of frames by
+    coarse-to-fine block matching; a faster alternative to TV-L1.
+
+    Each "bsize" block is matched (sum of absolute differences) within
+    "radius" pixels at the coarsest of "nscales" scales; at each finer
+    scale it is refined by one pixel around the vectors of the coarser
+    block and its neighbors. With "subpel" 2 or 4 the vectors are
+    refined to half or quarter pixels. The flows are constant on each
+    block and have the layout of "runPyFlow": (t-1,2,h,w) with the
+    (x,y) displacement in the channels; "sigma" is unused.
+
+    """
+
+    # -- params --
+    bsize = optional(params,'bsize',8)
+    radius = optional(params,'radius',8)
+    nscales = optional(params,'nscales',3)
+    subpel = optional(params,'subpel',4)
+    if not(subpel in [1,2,4]):
+        raise ValueError(f"The subpel must be 1, 2, or 4 [{subpel}].")
+
+    # -- grayscale frames --
+    t,c,h,w = noisy.shape
+    frames = np.ascontiguousarray(noisy.mean(1),dtype=np.float32)
+    bsize = min(bsize,h,w)
+
+    # -- pyramid of each frame, shared by both directions --
+    nscales = max(1,min(nscales,num_scales(h,w,bsize)))
+    pyramids = [blockPyramid(frame,nscales) for frame in frames]
+
+    # -- exec --
+    fflow = np.zeros((t-1,2,h,w),dtype=np.float32)
+    bflow = np.zeros((t-1,2,h,w),dtype=np.float32)
+    for ti in range(t-1):
+        fflow[ti] = blockMatchPair(pyramids[ti],pyramids[ti+1],
+                                   bsize,radius,subpel)
+        bflow[ti] = blockMatchPair(pyramids[ti+1],pyramids[ti],
+                                   bsize,radius,subpel)
+
+    return fflow,bflow
+
+def num_scales(h,w,bsize):
+    """
+    Number of scales with at least two blocks along each side
+    """
+    nscales = 1
+    while min(h,w) // 2**nscales >= 2*bsize: nscales += 1
+    return nscales
+
+def blockPyramid(frame,nscales):
+    """
+    The frame and its 2x2 box-filtered downsamplings; finest first
+    """
+    pyramid = [frame]
+    for s in range(1,nscales):
+        prev = pyramid[-1]
+        hs,ws = prev.shape[0]//2,prev.shape[1]//2
+        prev = prev[:2*hs,:2*ws]
+        frame_s = (prev[0::2,0::2] + prev[1::2,0::2] +
+                   prev[0::2,1::2] + prev[1::2,1::2])/4.
+        pyramid.append(np.ascontiguousarray(frame_s,dtype=np.float32))
+    return pyramid
+
+def blockMatchPair(pyramid0,pyramid1,bsize,radius,subpel):
+    """
+    Flow (2,h,w) from the first frame to the second
+    """
+
+    # -- coarse-to-fine integer search --
+    nscales = len(pyramid0)
+    pred = np.zeros((1,1,2),dtype=np.float32)
+    for s in reversed(range(nscales)):
+        srange = max(1,-(-radius//2**s)) if s == nscales-1 else 1
+        vecs = numba_block_search(pyramid0[s],pyramid1[s],pred,bsize,srange)
+        pred = 2*vecs
+
+    # -- sub-pixel refinement --
+    if subpel > 1:
+        numba_subpel_refine(pyramid0[0],pyramid1[0],vecs,bsize,subpel)
+
+    # -- one vector per block to one per pixel --
+    h,w = pyramid0[0].shape
+    rows = np.minimum(np.arange(h)//bsize,vecs.shape[0]-1)
+    cols = np.minimum(np.arange(w)//bsize,vecs.shape[1]-1)
+    flow = vecs[rows][:,cols].transpose(2,0,1)
+
+    return flow
+
+@njit
+def block_sad(img0,img1,h0,w0,dy,dx,bsize,best):
+    sad = 0.
+    for i in range(bsize):
+        for j in range(bsize):
+            sad += abs(img0[h0+i,w0+j] - img1[h0+dy+i,w0+dx+j])
+        if sad >= best: break
+    return sad
+
+@njit(parallel=True,cache=True)
+def numba_block_search(img0,img1,pred,bsize,srange):
+
+    # -- init shapes --
+    h,w = img0.shape
+    nbh,nbw = -(-h//bsize),-(-w//bsize)
+    nph,npw = pred.shape[0],pred.shape[1]
+    vecs = np.zeros((nbh,nbw,2),dtype=np.float32)
+
+    # -- parallel over blocks --
+    for bi in prange(nbh*nbw):
+        bh = bi // nbw
+        bw = bi % nbw
+        h0 = min(bh*bsize,h-bsize)
+        w0 = min(bw*bsize,w-bsize)
+
+        # -- no motion is always a candidate --
+        best = block_sad(img0,img1,h0,w0,0,0,bsize,np.inf)
+        best_x,best_y = 0,0
+
+        # -- search around the predictions of the coarse block & its neighbors --
+        ph,pw = min(bh//2,nph-1),min(bw//2,npw-1)
+        for ci in range(max(ph-1,0),min(ph+2,nph)):
+            for cj in range(max(pw-1,0),min(pw+2,npw)):
+                px = int(pred[ci,cj,0])
+                py = int(pred[ci,cj,1])
+                for dy in range(py-srange,py+srange+1):
+                    if h0+dy < 0 or h0+dy+bsize > h: continue
+                    for dx in range(px-srange,px+srange+1):
+                        if w0+dx < 0 or w0+dx+bsize > w: continue
+                        sad = block_sad(img0,img1,h0,w0,dy,dx,bsize,best)
+                        if sad < best:
+                            best = sad
+                            best_x,best_y = dx,dy
+        vecs[bh,bw,0] = best_x
+        vecs[bh,bw,1] = best_y
+
+    return vecs
+
+@njit
+def bilinear_at(img,y,x):
+    h,w = img.shape
+    y = min(max(y,0.),h-1.)
+    x = min(max(x,0.),w-1.)
+    y0,x0 = min(int(y),h-2),min(int(x),w-2)
+    fy,fx = y-y0,x-x0
+    top = (1-fx)*img[y0,x0] + fx*img[y0,x0+1]
+    bot = (1-fx)*img[y0+1,x0] + fx*img[y0+1,x0+1]
+    return (1-fy)*top + fy*bot
+
+@njit
+def block_sad_subpel(img0,img1,h0,w0,dy,dx,bsize,best):
+    sad = 0.
+    for i in range(bsize):
+        for j in range(bsize):
+            sad += abs(img0[h0+i,w0+j] - bilinear_at(img1,h0+i+dy,w0+j+dx))
+        if sad >= best: break
+    return sad
+
+@njit(parallel=True,cache=True)
+def numba_subpel_refine(img0,img1,vecs,bsize,subpel):
+
+    # -- init shapes --
+    h,w = img0.shape
+    nbh,nbw = vecs.shape[0],vecs.shape[1]
+    if h < 2 or w < 2: return
+
+    # -- parallel over blocks --
+    for bi in prange(nbh*nbw):
+        bh = bi // nbw
+        bw = bi % nbw
+        h0 = min(bh*bsize,h-bsize)
+        w0 = min(bw*bsize,w-bsize)
+        best_x = vecs[bh,bw,0]
+        best_y = vecs[bh,bw,1]
+        best = block_sad_subpel(img0,img1,h0,w0,best_y,best_x,bsize,np.inf)
+
+        # -- half, then quarter, pixel steps around the best --
+        step = 0.5
+        while step >= 1./subpel:
+            cx,cy = best_x,best_y
+            for sy in range(-1,2):
+                for sx in range(-1,2):
+                    if sx == 0 and sy == 0: continue
+                    dx,dy = cx + sx*step,cy + sy*step
+                    sad = block_sad_subpel(img0,img1,h0,w0,dy,dx,bsize,best)
+                    if sad < best:
+                        best = sad
+                        best_x,best_y = dx,dy
+            step /= 2
+        vecs[bh,bw,0] = best_x
+        vecs[bh,bw,1] = best_y
@@ -122,3 +122,127 @@ def exec_aggregation(deno,patches,indices,weights,mask,
 
     return nmasked
 
+
+def computeAggregationBatch(deno,groups,indices,weights,params,step=0):
+    """
+
+    Aggregate a batch of denoised groups of shape (B,c,psT,psX,psX,nSimP)
+
+    """
+
+    # -- extract info for explicit call --
+    ps = params['sizePatch'][step]
+    ps_t = params['sizePatchTime'][step]
+    onlyFrame = params['onlyFrame'][step]
+
+    # -- exec aggregation --
+    exec_aggregation_batch(deno,groups,indices,weights,ps,ps_t,onlyFrame)
+
+    # -- pack results --
+    results = {}
+    results['deno'] = deno
+    results['weights'] = weights
+    results['psX'] = ps
+    results['psT'] = ps_t
+
+    return results
+
+def runPasteTrickBatch(mask,refs,indices,c,params,step=0,accept=None):
+    """
+
+    Accept the reference pixels of a batch in order and apply the "paste trick".
+
+    A reference is dropped when an earlier group (of this batch or a previous one)
+    already removed it from the mask, so the accepted set matches the
+    pixel-by-pixel loop exactly.
+
+    """
+
+    # -- extract info for explicit call --
+    ps = params['sizePatch'][step]
+    onlyFrame = params['onlyFrame'][step]
+    aggreBoost =  params['aggreBoost'][step]
+
+    # -- exec --
+    if accept is None:
+        accept = np.zeros(len(refs),dtype=np.bool_)
+    nmasked = exec_paste_trick_batch(mask,refs,indices,accept,c,
+                                     ps,onlyFrame,aggreBoost)
+    return accept,nmasked
+
+@njit
+def exec_paste_trick_batch(mask,refs,indices,accept,c,ps,onlyFrame,aggreBoost):
+
+    # -- init --
+    nmasked = 0
+    t,h,w = mask.shape
+    whc = w*h*c
+    wh = w*h
+
+    for b in range(refs.shape[0]):
+
+        # -- skip references removed by earlier groups --
+        accept[b] = mask[refs[b,0],refs[b,1],refs[b,2]] == 1
+        if not(accept[b]): continue
+
+        for n in range(indices.shape[1]):
+
+            # -- get the sim locaion --
+            ind = indices[b,n]
+            if ind == -1: continue
+            t1 = ind // whc
+            h1 = (ind % wh) // w
+            w1 = ind % w
+
+            # -- handle "only frame" case --
+            if onlyFrame >= 0 and onlyFrame != t1:
+                continue
+
+            # -- apply paste trick --
+            if (mask[t1,h1,w1] == 1): nmasked += 1
+            mask[t1,h1,w1] = False
+
+            if (aggreBoost):
+                if ( (h1 > 2*ps) and (mask[t1,h1-1,w1]==1) ): nmasked += 1
+                if ( (h1 < (h - 2*ps)) and (mask[t1,h1+1,w1]==1) ): nmasked += 1
+                if ( (w1 > 2*ps) and (mask[t1,h1,w1-1]==1) ): nmasked += 1
+                if ( (w1 < (w - 2*ps)) and (mask[t1,h1,w1+1]==1) ): nmasked += 1
+
+                if (h1 > 2*ps):  mask[t1,h1-1,w1] = False
+                if (h1 < (h - 2*ps)): mask[t1,h1+1,w1] = False
+                if (w1 > 2*ps):  mask[t1,h1,w1-1] = False
+                if (w1 < (w - 2*ps)): mask[t1,h1,w1+1] = False
+
+    return nmasked
+
+@njit
+def exec_aggregation_batch(deno,groups,indices,weights,ps,ps_t,onlyFrame):
+
+    # -- init --
+    t,c,h,w = deno.shape
+    whc = w*h*c
+    wh = w*h
+
+    # -- update [deno,weights] in group order --
+    for b in range(indices.shape[0]):
+        for n in range(indices.shape[1]):
+
+            # -- get the sim locaion --
+            ind = indices[b,n]
+            if ind == -1: continue
+            t0 = ind // whc
+            h0 = (ind % wh) // w
+            w0 = ind % w
+
+            # -- handle "only frame" case --
+            if onlyFrame >= 0 and onlyFrame != t0:
+                continue
+
+            # -- set using patch info --
+            for pt in range(ps_t):
+                for pi in range(ps):
+                    for pj in range(ps):
+                        for ci in range(c):
+                            gval = groups[b,ci,pt,pi,pj,n]
+                            deno[t0+pt,ci,h0+pi,w0+pj] += gval
+                        weights[t0+pt,h0+pi,w0+pj] += 1
@@ -5,7 +5,7 @@ import numpy as np
 from einops import rearrange
 from easydict import EasyDict as edict
 
-def computeCovMat(groups,rank,covMat=None):
+def computeCovMat(groups,rank,covMat=None,solver="exact"):
 
     # -- shapes --
     ndim = groups.ndim
@@ -22,6 +22,15 @@ def computeCovMat(groups,rank,covMat=None):
         groups = groups.copy()
     pdim,nSimP = groups.shape
 
+    # -- low-rank solvers skip the cov mat --
+    if not(solver in ["exact","eigh"]):
+        eigVals,eigVecs = low_rank_eigs(groups[None],rank,solver)
+        results = edict()
+        results.covMat = None
+        results.covEigVals = eigVals[0]
+        results.covEigVecs = eigVecs[0]
+        return results
+
     # -- cov mat --
     if covMat is None:
         groups = groups.astype(np.float32)
@@ -46,3 +55,128 @@ def computeCovMat(groups,rank,covMat=None):
     results.covEigVecs = eigVecs
 
     return results
+
+def computeCovMatBatch(groups,rank,covMat=None,solver="exact"):
+    """
+
+    Top-"rank" eigenpairs of a batch of groups (B,pdim,nSimP)
+
+    solver = "exact" eigendecomposes each covariance with "ssyevx"
+    (as "computeCovMat" and the C++), so it matches the per-group path,
+    solver = "eigh" eigendecomposes the stacked covariances at once;
+    faster, but only equal to "exact" up to float rounding,
+    solver = "randomized" uses a randomized range finder on the groups,
+    solver = "svd" uses a thin SVD of the groups (cheap when nSimP < pdim)
+
+    """
+
+    # -- shapes --
+    groups = groups.astype(np.float32,copy=False)
+    nbatch,pdim,nSimP = groups.shape
+
+    # -- low-rank solvers skip the cov mat --
+    if not(solver in ["exact","eigh"]):
+        eigVals,eigVecs = low_rank_eigs(groups,rank,solver)
+        results = edict()
+        results.covMat = None
+        results.covEigVals = eigVals
+        results.covEigVecs = eigVecs
+        return results
+
+    # -- cov mat --
+    if covMat is None:
+        covMat = np.matmul(groups,groups.transpose(0,2,1))/nSimP
+        covMat = covMat.astype(np.float32)
+
+    # -- eigen stuff; ascending like ssyevx --
+    if solver == "exact":
+        eigVals = np.zeros((nbatch,rank),dtype=np.float32)
+        eigVecs = np.zeros((nbatch,pdim,rank),dtype=np.float32)
+        kwargs = {"compute_v":1,"range":'I',"lower":0,"vl":-1,"vu":0,
+                  "il":pdim-rank+1,"iu":pdim,"abstol":0,"overwrite_a":0}
+        for b in range(nbatch):
+            eigs = scipy_linalg.lapack.ssyevx(covMat[b],**kwargs)
+            eigVals[b],eigVecs[b] = eigs[0][:rank],eigs[1][:,:rank]
+    else:
+        eigVals,eigVecs = np.linalg.eigh(covMat)
+        eigVals = eigVals[:,pdim-rank:].astype(np.float32,copy=False)
+        eigVecs = eigVecs[:,:,pdim-rank:].astype(np.float32,copy=False)
+
+    # -- format output --
+    results = edict()
+    results.covMat = covMat
+    results.covEigVals = eigVals
+    results.covEigVecs = eigVecs
+
+    return results
+
+def low_rank_eigs(groups,rank,solver,noversample=10,niters=2,seed=0):
+    """
+
+    Top-"rank" eigenpairs of XX'/nSimP from the (B,pdim,nSimP) groups,
+    in ascending order like ssyevx.
+
+    """
+
+    # -- shapes --
+    nbatch,pdim,nSimP = groups.shape
+
+    # -- orthonormal basis for the range of the groups --
+    if solver == "svd":
+        U,S,_ = np.linalg.svd(groups,full_matrices=False)
+    elif solver == "randomized":
+        rng = np.random.default_rng(seed)
+        nsamples = min(rank + noversample,pdim,nSimP)
+        omega = rng.standard_normal((nbatch,nSimP,nsamples)).astype(np.float32)
+        Q,_ = np.linalg.qr(np.matmul(groups,omega))
+        for _ in range(niters):
+            Z,_ = np.linalg.qr(np.matmul(groups.transpose(0,2,1),Q))
+            Q,_ = np.linalg.qr(np.matmul(groups,Z))
+        B = np.matmul(Q.transpose(0,2,1),groups)
+        Ub,S,_ = np.linalg.svd(B,full_matrices=False)
+        U = np.matmul(Q,Ub)
+    else:
+        raise ValueError(f"Uknown cov mat solver [{solver}]")
+
+    # -- singular values -> eigen values; pad if rank > basis size --
+    nfound = min(rank,S.shape[1])
+    eigVals = np.zeros((nbatch,rank),dtype=np.float32)
+    eigVecs = np.zeros((nbatch,pdim,rank),dtype=np.float32)
+    eigVals[:,rank-nfound:] = (S[:,:nfound]**2/nSimP)[:,::-1]
+    eigVecs[:,:,rank-nfound:] = U[:,:,:nfound][:,:,::-1]
+
+    return eigVals,eigVecs
+
+def computeCovMatAccuracy(groups,rank,solver):
+    """
+
+    Accuracy of a cov mat solver against the "exact" solver
+    for a batch of groups (B,pdim,nSimP)
+
+    """
+
+    # -- exec both --
+    exact = computeCovMatBatch(groups,rank,solver="exact")
+    approx = computeCovMatBatch(groups,rank,solver=solver)
+
+    # -- relative error of the eigen values --
+    eigVals_e,eigVals_a = exact.covEigVals,approx.covEigVals
+    denom = np.maximum(np.abs(eigVals_e),np.finfo(np.float32).eps)
+    eig_err = np.abs(eigVals_a - eigVals_e) / denom
+
+    # -- distance between the rank-"rank" subspaces: || P_e - P_a ||_F --
+    Ue,Ua = exact.covEigVecs,approx.covEigVecs
+    Pe = np.matmul(Ue,Ue.transpose(0,2,1))
+    Pa = np.matmul(Ua,Ua.transpose(0,2,1))
+    subspace_err = np.sqrt(np.sum((Pe - Pa)**2,axis=(1,2)))
+
+    # -- pack results --
+    results = edict()
+    results.solver = solver
+    results.eigVals_relerr = eig_err.max(axis=1)
+    results.eigVals_relerr_mean = eig_err.mean()
+    results.subspace_err = subspace_err
+    results.subspace_err_mean = subspace_err.mean()
+
+    return results
+
@@ -9,6 +9,7 @@ from numba import njit,prange
 
 # -- parser for cpp --
 from svnlb.swig.vnlb.mask_parser import mask_parser
+from svnlb.utils import optional
 
 def initMask(shape,vnlb_params,step=0,info=None):
 
@@ -17,7 +18,8 @@ def initMask(shape,vnlb_params,step=0,info=None):
     mask = np.zeros((t,h,w),dtype=np.int8)
     vnlb_params = {k:v[step] for k,v in vnlb_params.items()}
     mask_params = mask_parser(mask,vnlb_params,info)
-    params = comp_params(mask_params,t,h,w)
+    source_shape = optional(info,'source_shape',(t,h,w))
+    params = comp_params(mask_params,t,h,w,source_shape)
 
     # -- exec --
     ngroups = fill_mask_launcher(mask,params)
@@ -29,10 +31,12 @@ def initMask(shape,vnlb_params,step=0,info=None):
 
     return results
 
-def comp_params(mask_params,t,h,w):
+def comp_params(mask_params,t,h,w,source_shape=None):
 
     # -- init --
     params = edict()
+    if source_shape is None: source_shape = (t,h,w)
+    src_t,src_h,src_w = source_shape
     sPx = mask_params.ps
     sPt = mask_params.ps_t
     sWx = mask_params.sWx
@@ -42,9 +46,9 @@ def comp_params(mask_params,t,h,w):
     params.border_w0 = mask_params.origin_w > 0
     params.border_h0 = mask_params.origin_h > 0
     params.border_t0 = mask_params.origin_t > 0
-    params.border_w1 = mask_params.ending_w < w
-    params.border_h1 = mask_params.ending_h < h
-    params.border_t1 = mask_params.ending_t < t
+    params.border_w1 = mask_params.ending_w < src_w
+    params.border_h1 = mask_params.ending_h < src_h
+    params.border_t1 = mask_params.ending_t < src_t
 
     # -- origins --
     border_s = sPx-1 + sWx//2
@@ -2,17 +2,21 @@
 # -- python deps --
 import copy
 import numpy as np
+from numba import njit
 from easydict import EasyDict as edict
 import svnlb
 
 # -- local imports --
-from .sim_search import runSimSearch
-from .bayes_est import runBayesEstimate
-from .comp_agg import computeAggregation
+from .sim_search import runSimSearchBatch,exec_select_cpp_groups_batch
+from .sim_search import exec_sim_search_integral,getColorXform
+from .bayes_est import runBayesEstimateBatch
+from .comp_agg import computeAggregationBatch,runPasteTrickBatch
 from .init_mask import initMask
+from .workspace import Workspace
 from .flat_areas import runFlatAreas
 from svnlb.utils import idx2coords,coords2idx,patches2groups,groups2patches
-from svnlb.utils import apply_color_xform_cpp,numpy_div0,yuv2rgb_cpp
+from svnlb.utils import numpy_div0,yuv2rgb_cpp
+from svnlb.utils import check_flows,check_and_expand_flows
 from svnlb.testing import save_images
 
 # -- project imports --
@@ -23,11 +27,14 @@ def optional(pydict,key,default):
     if key in pydict: return pydict[key]
     else: return default
 
-def processNLBayes(noisy,sigma,step,tensors,params,clean=None):
+def processNLBayes(noisy,sigma,step,tensors,params,clean=None,crop=None):
     """
 
     A Python implementation for one step of the NLBayes code
 
+    "crop" is the tile's position in the source video (see "subDivideTight");
+    tiles that do not touch the source's edge skip their border pixels.
+
     """
 
     # -- init outputs --
@@ -43,7 +50,7 @@ def processNLBayes(noisy,sigma,step,tensors,params,clean=None):
         flows = edict({'fflow':tensors['fflow'],'bflow':tensors['bflow']})
 
     # -- run the step --
-    step_results = exec_step(noisy,basic,weights,sigma,flows,params,step,clean)
+    step_results = exec_step(noisy,basic,weights,sigma,flows,params,step,clean,crop)
 
     # -- format outputs --
     results = edict()
@@ -53,255 +60,207 @@ def processNLBayes(noisy,sigma,step,tensors,params,clean=None):
 
     return results
 
-def exec_step(noisy,basic,weights,sigma,flows,params,step,clean=None):
+def exec_step(noisy,basic,weights,sigma,flows,params,step,clean=None,crop=None):
     """
 
     Primary sub-routine of VNLB
 
-    """
+    The reference pixels are processed in batches of "batchSize":
+    search, paste trick, bayes estimate, and aggregation run on the
+    whole batch at once. The search of a batch is one numba kernel,
+    parallel over its reference patches.
 
+    """
 
     # -- shapes --
     shape = noisy.shape
     t,c,h,w = noisy.shape
     nframes,chnls,height,width = t,c,h,w
     ps,ps_t = params['sizePatch'][step],params['sizePatchTime'][step]
+    bsize = optional(params,'batchSize',[128,128])[step]
 
     # -- init denoised --
     deno = basic if step == 0 else np.zeros_like(noisy)
-    # deno = np.zeros_like(noisy)
 
     # -- init mask --
-    minfo = initMask(noisy.shape,params,step)
-    # minfo = vnlb.init_mask(noisy.shape,params,step)
+    minfo = initMask(noisy.shape,params,step,crop)
     mask,n_groups = minfo['mask'],minfo['ngroups']
-    access = np.zeros_like(mask)
 
-    # -- color xform --
-    noisy_yuv = apply_color_xform_cpp(noisy)
-    basic_yuv = apply_color_xform_cpp(basic)
+    # -- color xform (once per step); step 1 writes "basic", never reads it --
+    use_imread = params['use_imread'][step]
+    step1 = params['isFirstStep'][step]
+    tensors = edict({k:v for k,v in flows.items()})
+    yuv = getColorXform(noisy,None if step1 else basic,clean)
+    noisy_yuv,basic_yuv,clean_yuv = yuv.noisy,yuv.basic,yuv.clean
+
+    # -- search & group images --
+    srch_img = noisy_yuv if step1 else basic_yuv
+    if not(clean is None): srch_img = clean_yuv
+    img_noisy = noisy if use_imread else noisy_yuv
+    img_basic = basic if use_imread else basic_yuv
+    img_clean = None
+    if not(clean is None): img_clean = clean if use_imread else clean_yuv
+
+    # -- format flows for c++ (t-1 -> t) --
+    if check_flows(tensors):
+        check_and_expand_flows(tensors,t)
+    zflow = np.zeros((t,2,h,w),dtype=np.float32)
+    fflow = optional(tensors,'fflow',zflow)
+    bflow = optional(tensors,'bflow',zflow)
+
+    # -- valid reference pixels in scan order --
+    valid = np.zeros((t,h,w),dtype=np.bool_)
+    valid[:t-ps_t+1,:h-ps+1,:w-ps+1] = True
+    refs_mask = np.logical_and(valid,mask == 1)
+    cands = np.stack(np.where(refs_mask),-1)
+    cands = cands.astype(np.int64)
+
+    # -- [optional] search every reference at once with box sums --
+    video_srch = None
+    search_mode = optional(params,'simSearchMode',["brute","brute"])[step]
+    if search_mode == "integral":
+        tau = optional(params,'tau',[None,None])[step]
+        video_srch = exec_sim_search_integral(srch_img,fflow,bflow,refs_mask,ps,ps_t,
+                                              params['nSimilarPatches'][step],
+                                              params['sizeSearchWindow'][step],
+                                              params['sizeSearchTimeFwd'][step],
+                                              params['sizeSearchTimeBwd'][step],
+                                              1 if step1 else c,tau)
+        ref_ids = np.full((t,h,w),-1,dtype=np.int64)
+        ref_ids[refs_mask] = np.arange(len(cands))
+
+    # -- buffers reused by every batch --
+    wspace = Workspace(shape,params,step,bsize)
 
     # -- init looping vars --
-    npixels = t*h*w
     g_remain = n_groups
     g_counter = 0
+    cursor = 0
+    refs = np.zeros((bsize,3),dtype=np.int64)
 
-    # -- run npixels --
-    for pidx in range(npixels):
-
-        # -- pix index to coords --
-        # pidx = t*wh + y*width + x;
-        ti = pidx // (w*h)
-        hi = (pidx - ti*w*h) // w
-        wi = pidx - ti*w*h - hi*w
-
-        # pidx3 = t*whc + c*wh + y*width + x
-
-        # ti,ci,hi,wi = idx2coords(pidx,c,h,w)
-        # pidx3 = coords2idx(ti,hi,wi,1,h,w)
-        # t1,c1,h1,w1 = idx2coords(pidx3,1,h,w)
-        pidx4 = ti*w*h*c + hi*w + wi
-
-        # -- skip if invalid --
-        valid_t = (ti + ps_t - 1) < nframes
-        valid_h = (hi + ps - 1) < height
-        valid_w = (wi + ps - 1) < width
-        valid = valid_t and valid_h and valid_w
-        if not(valid): continue
-        access[ti,hi,wi] = 1
-
-        # -- skip masked --
-        if (mask[ti,hi,wi] == 0): continue
-        # print("mask: ",mask[0,0,0],mask[0,0,1],mask[0,0,2],mask[0,0,3])
-        # print("pidx3: ",pidx,pidx3,ti,hi,wi)
-
+    # -- run batches --
+    while cursor < len(cands):
 
-        # -- inc counter --
-        # if g_counter > 2: break
-        # print("group_counter: %d" % g_counter)
-        g_counter += 1
-        # print("(t,h,w,-): %d,%d,%d,%d" %(ti,hi,wi,mask[1,0,24]))
-        # print("ij,ij3: %d,%d\n" % (pidx,pidx3))
+        # -- next "bsize" reference pixels still in the mask --
+        nrefs,cursor = select_ref_batch(mask,cands,cursor,refs)
+        if nrefs == 0: break
+        refs_b = refs[:nrefs]
+        pidxs = refs_b[:,0]*w*h*c + refs_b[:,1]*w + refs_b[:,2]
 
         # -- sim search --
-        sim_results = estimateSimPatches(noisy,basic,sigma,pidx4,flows,
-                                         params,step,clean)
-        groupNoisy,groupBasic,groupClean,indices = sim_results
-        nSimP = len(indices)
-
-        # -- optional flat patch --
-        flatPatch = False
-        if params.flatAreas[step]:
-            psX,psT = params.sizePatch[step],params.sizePatchTime[step]
-            gamma = params.gamma[step]
-            flatPatch = runFlatAreas(groupNoisy,psX,psT,nSimP,chnls,gamma,sigma)
-
-        # -- bayes estimate --
-        rank_var = 0.
-        groupNoisy,rank_var = computeBayesEstimate(groupNoisy,groupBasic,
-                                                   nSimP,shape,params,
-                                                   step,flatPatch,groupClean)
-
-        # -- debug zone. --
-        # from vnlb.pylib.tests import save_images
-        # print(groups.shape)
-        # patches_yuv = groups2patches(groups,c,7,2,groups.shape[-1])[:100]
-        # patches_yuv = groups2patches(groups,c,7,2,groups.shape[-1],1)
-        # patches_rgb = yuv2rgb_cpp(patches_yuv)
-        # print(patches_rgb)
-        # save_images(patches_rgb,f"output/patches_{pidx}.png",imax=255.)
-
-        # -- stats --
-        # n_neg = np.sum(indices == -1)
-        # n_zero = np.sum(indices == 0)
-        # n_elems = indices.size * 1.
-        # perc_neg = n_neg / n_elems * 100
-        # perc_zero = n_zero / n_elems * 100
-        # print("Perc Neg: %2.1f" % perc_neg)
-        # print("Perc Zero: %2.1f" % perc_zero)
-
-        # -- aggregate results --
-        deno,weights,mask,nmasked = computeAgg(deno,groupNoisy,indices,weights,
-                                               mask,nSimP,params,step)
-        # print("deno.ravel()[0]: ",deno.ravel()[0])
-        # print("deno.ravel()[1]: ",deno.ravel()[1])
+        if video_srch is None:
+            sim_results = runSimSearchBatch(srch_img,fflow,bflow,sigma,
+                                            pidxs,params,step,wspace)
+            indices = sim_results.indices
+            nSimPs = sim_results.nSimPs
+        else:
+            rids = ref_ids[refs_b[:,0],refs_b[:,1],refs_b[:,2]]
+            indices,nSimPs = select_packed_groups(video_srch,rids,wspace)
+
+        # -- paste trick; drop refs masked by earlier groups --
+        accept = wspace.get("accept",(nrefs,),np.bool_)
+        accept,nmasked = runPasteTrickBatch(mask,refs_b,indices,c,params,
+                                            step,accept)
+        indices,nSimPs = indices[accept],nSimPs[accept]
+        g_counter += len(indices)
         g_remain -= nmasked
 
+        # -- denoise runs of equal group size, in order --
+        runs = np.r_[0,np.flatnonzero(np.diff(nSimPs))+1,len(nSimPs)]
+        for start,end in zip(runs[:-1],runs[1:]):
+            if start == end: continue
+            nSimP = nSimPs[start]
+            indices_r = np.ascontiguousarray(indices[start:end,:nSimP])
+            denoiseGroupsBatch(deno,weights,indices_r,img_noisy,img_basic,
+                               img_clean,sigma,shape,params,step,wspace)
+
     # -- save --
     wmax = weights.max().item()
     save_images(weights[:,None],"output/weights.png",imax=wmax)
 
-    # amax = access.max().item()
-    # print("amax")
-    # save_images(access[:,None],"output/access.png",imax=amax)
-
     # -- reduce using weighted ave --
     wimg = noisy if params.use_imread[step] else noisy_yuv
     weightedAggregation(deno,wimg,weights)
-    # deno = numpy_div0(deno,weights[:,None],0.)
-    # print(weights[0,0,0])
-    # print(deno[0,0,0])
 
     # -- re-colorize --
     if not(params.use_imread[step]):
         deno[...] = yuv2rgb_cpp(deno)
-    # basic = yuv2rgb_cpp(basic)
 
     # -- pack results --
     results = edict()
-    # results.denoised = deno if step == 1 else np.zeros_like(deno)
     results.denoised = deno
     results.basic = basic
     results.ngroups = g_counter
 
     return results
 
-
-def estimateSimPatches(noisy,basic,sigma,pidx,flows,params,step,clean=None):
+def denoiseGroupsBatch(deno,weights,indices,img_noisy,img_basic,img_clean,
+                       sigma,shape,params,step,wspace=None):
 
     # -- unpack --
-    t,c,h,w = noisy.shape
-    psX = params.sizePatch[step]
-    psT = params.sizePatchTime[step]
-
-    # -- cpp exec --
-    # sim_results = vnlb.simPatchSearch(noisy,sigma,pidx,flows,params,step)
-    # sim_results = edict(sim_results)
-    # groupsNoisy = sim_results.groupNoisy
-    # groupsBasic = sim_results.groupBasic
-    # indices = sim_results.indices
-
-    # sim_groupsNoisy = sim_results.groupNoisy
-    # sim_groupsBasic = sim_results.groupBasic
-    # sim_indices = sim_results.indices
-
-    # -- sim search --
-    # params.use_imread = [False,False]
-    tensors = edict({k:v for k,v in flows.items()})
-    tensors.basic = basic
-    sim_results = runSimSearch(noisy,sigma,pidx,tensors,params,step,clean)
-
-    patchesNoisy = sim_results.patchesNoisy
-    patchesBasic = sim_results.patchesBasic
-    patchesClean = sim_results.patchesClean
-    indices = sim_results.indices
-    nSimP = sim_results.nSimP
-    ngroups = sim_results.ngroups
-    groupsNoisy = patches2groups(patchesNoisy,c,psX,psT,ngroups,1)
-    groupsBasic = patches2groups(patchesBasic,c,psX,psT,ngroups,1)
-    groupsClean = None
-    if not(patchesClean is None):
-        groupsClean = patches2groups(patchesClean,c,psX,psT,ngroups,1)
-
-    # -- check -- # 563
-    # delta = np.sum(np.sort(indices) - np.sort(sim_indices))
-    # if delta >1e-3:
-    #     print(pidx,step)
-    #     print(np.stack([np.sort(indices),np.sort(sim_indices)],-1))
-    # assert delta < 1e-3
-
-    # py_order = np.argsort(indices)
-    # sim_order = np.argsort(sim_indices)
-
-
-    # py_patches = patchesNoisy[py_order]
-    # sim_patches = groups2patches(sim_groupsNoisy,3,7,2,nSimP)[sim_order]
-    # delta = np.abs(py_patches-sim_patches)
-    # if np.any(delta>1e-3):
-    #     print(np.unique(np.where(delta>1e-3)[0]))
-    #     print(np.stack([py_patches[0],sim_patches[0]],-1))
-    #     assert False
-
-
-    # from vnlb.pylib.tests import save_images
-    # print("patches.shape: ",patches.shape)
-    # patches_rgb = yuv2rgb_cpp(patches)
-    # save_images(patches_rgb,"output/patches.png",imax=255.)
-
-    return groupsNoisy,groupsBasic,groupsClean,indices
-
-def computeBayesEstimate(groupNoisy,groupBasic,nSimP,shape,params,
-                         step,flatPatch,groupClean):
-
-    # -- prepare --
+    t,c,h,w = shape
+    nbatch,nSimP = indices.shape
+    ps,ps_t = params['sizePatch'][step],params['sizePatchTime'][step]
+    step1 = params['isFirstStep'][step]
+    if wspace is None: wspace = Workspace()
+    gshape = (nbatch,c,ps_t,ps,ps,nSimP)
+
+    # -- gather groups --
+    groupNoisy = exec_select_cpp_groups_batch(img_noisy,indices,ps,ps_t,
+                                              wspace.get("groupNoisy",gshape))
+    groupBasic,groupClean = None,None
+    if not(step1):
+        groupBasic = exec_select_cpp_groups_batch(img_basic,indices,ps,ps_t,
+                                                  wspace.get("groupBasic",gshape))
+    if not(img_clean is None):
+        groupClean = exec_select_cpp_groups_batch(img_clean,indices,ps,ps_t,
+                                                  wspace.get("groupClean",gshape))
+
+    # -- optional flat patch --
+    flatPatch = wspace.get("flatPatch",(nbatch,),np.bool_,False)
+    if params.flatAreas[step]:
+        psX,psT = params.sizePatch[step],params.sizePatchTime[step]
+        gamma = params.gamma[step]
+        for b in range(nbatch):
+            flatPatch[b] = runFlatAreas(groupNoisy[b],psX,psT,nSimP,
+                                        c,gamma,sigma)
+
+    # -- bayes estimate --
     rank_var = 0.
+    bayes_results = runBayesEstimateBatch(groupNoisy,groupBasic,rank_var,
+                                          nSimP,shape,params,step,
+                                          flatPatch,groupClean,wspace)
+    groupNoisy = bayes_results['groupNoisy']
+
+    # -- aggregate results --
+    computeAggregationBatch(deno,groupNoisy,indices,weights,params,step)
 
-    # -- exec --
-    # bayes_results = vnlb.computeBayesEstimate(groupNoisy.copy(),
-    #                                             groupBasic.copy(),0.,
-    #                                             nSimP,shape,params,step)
-    bayes_results = runBayesEstimate(groupNoisy.copy(),groupBasic.copy(),
-                                     rank_var,nSimP,shape,params,step,
-                                     flatPatch,groupClean)
-
-    # -- format --
-    groups = bayes_results['groupNoisy']
-    rank_var = bayes_results['rank_var']
-
-
-    return groups,rank_var
-
-def computeAgg(deno,groupNoisy,indices,weights,mask,nSimP,params,step):
-
-    # -- cpp version --
-    # params.isFirstStep[step] = step == 0
-    # results = vnlb.computeAggregation(deno,groupNoisy,
-    #                                     indices,weights,
-    #                                     mask,nSimP,params)
-    # deno = results['deno']
-    # mask = results['mask']
-    # weights = results['weights']
-    # nmasked = results['nmasked']
-
-    # -- python version --
-    agg_results = computeAggregation(deno,groupNoisy,indices,weights,mask,
-                                     nSimP,params,step)
-    deno = agg_results['deno']
-    weights = agg_results['weights']
-    mask = agg_results['mask']
-    nmasked = agg_results['nmasked']
-
-    return deno,weights,mask,nmasked
+def select_packed_groups(packed,rids,wspace):
+    """
+    The groups of references "rids" from a packed search;
+    padded with -1 to the largest one
+    """
+    values,indices,offsets = packed
+    nSimPs = offsets[rids+1] - offsets[rids]
+    nmax = nSimPs.max() if len(rids) > 0 else 0
+    groups = wspace.get("indices",(len(rids),nmax),np.int32,-1)
+    for b,rid in enumerate(rids):
+        groups[b,:nSimPs[b]] = indices[offsets[rid]:offsets[rid+1]]
+    return groups,nSimPs
+
+@njit
+def select_ref_batch(mask,cands,cursor,refs):
+    nrefs = 0
+    ncands = cands.shape[0]
+    while cursor < ncands and nrefs < refs.shape[0]:
+        ti,hi,wi = cands[cursor,0],cands[cursor,1],cands[cursor,2]
+        cursor += 1
+        if mask[ti,hi,wi] == 0: continue
+        refs[nrefs,0] = ti
+        refs[nrefs,1] = hi
+        refs[nrefs,2] = wi
+        nrefs += 1
+    return nrefs,cursor
 
 def weightedAggregation(deno,noisy,weights):
     gtz = np.where(weights > 0)
@@ -9,8 +9,10 @@ from easydict import EasyDict as edict
 from svnlb.utils import get_patch_shapes_from_params,optional,groups2patches,check_flows,check_and_expand_flows,apply_color_xform_cpp,patches2groups
 
 from svnlb.testing import save_images
+from .topk import topk,numba_topk,numba_heap_push,numba_heap_sort
+from .workspace import Workspace
 
-def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None):
+def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None,yuv=None):
 
     # -- extract info for explicit call --
     t,c,h,w = noisy.shape
@@ -24,6 +26,9 @@ def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None):
     couple_ch = params['coupleChannels'][step]
     step1 = params['isFirstStep'][step]
     use_imread = params['use_imread'][step] # use rgb for patches or yuv?
+    use_access = optional(params,'testing',[False,False],np.bool_)[step]
+    verbose = optional(params,'verbose',[False,False],np.bool_)[step]
+    tau = optional(params,'tau',[None,None],object)[step]
     basic = optional(tensors,'basic',np.zeros_like(noisy))
 
     # -- format flows for c++ (t-1 -> t) --
@@ -35,18 +40,19 @@ def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None):
     fflow = optional(tensors,'fflow',zflow.copy())
     bflow = optional(tensors,'bflow',zflow.copy())
 
-    # -- color transform --
-    noisy_yuv = apply_color_xform_cpp(noisy)
-    basic_yuv = apply_color_xform_cpp(basic)
+    # -- color transform [or precomputed by the caller, see "getColorXform"] --
+    if yuv is None: yuv = getColorXform(noisy,basic,clean)
+    noisy_yuv,basic_yuv,clean_yuv = yuv.noisy,yuv.basic,yuv.clean
     # print(noisy_yuv[0,0,0,0])
 
     # -- find the best patches using c++ logic --
     srch_img = noisy_yuv if step1 else basic_yuv
     if not(clean is None):
-        srch_img = apply_color_xform_cpp(clean)
+        srch_img = clean_yuv
     values,indices,access,nsearch = exec_cpp_sim_search(pidx,srch_img,fflow,bflow,sigma,
                                                         ps,ps_t,npatches,nwindow_xy,
-                                                        nfwd,nbwd,couple_ch,step1)
+                                                        nfwd,nbwd,couple_ch,step1,
+                                                        use_access,verbose,tau)
 
     # -- group the values and indices --
     img_noisy = noisy if use_imread else noisy_yuv
@@ -71,7 +77,6 @@ def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None):
     # -- handle clean image --
     patchesClean,groupClean = None,None
     if not(clean is None):
-        clean_yuv = apply_color_xform_cpp(clean)
         img_clean = clean if use_imread else clean_yuv
         groupClean = exec_select_cpp_groups(img_clean,indices,ps,ps_t)
         patchesClean = groups2patches(groupClean)
@@ -105,6 +110,21 @@ def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None):
 
     return results
 
+def getColorXform(noisy,basic=None,clean=None):
+    """
+
+    The "yuv" images of a step [None if not given].
+
+    A loop of "runSimSearch" over one video can compute these once and
+    pass them as "yuv"; they must be recomputed after the images change.
+
+    """
+    yuv = edict()
+    yuv.noisy = apply_color_xform_cpp(noisy)
+    yuv.basic = None if basic is None else apply_color_xform_cpp(basic)
+    yuv.clean = None if clean is None else apply_color_xform_cpp(clean)
+    return yuv
+
 # -----------------------------------
 #
 #      Estimate Sim Search
@@ -112,43 +132,550 @@ def runSimSearch(noisy,sigma,pidx,tensors,params,step=0,clean=None):
 # -----------------------------------
 
 def simSearchImage(noisy,basic,sigma,flows,params,step,clean=None):
-    # -- run npixels --
-    npatches = 100
+    tensors = edict({k:v for k,v in flows.items()})
+    tensors.basic = basic
+    results = simSearchVideo(noisy,sigma,tensors,params,step,clean)
+    return results.indices
+
+def simSearchVideo(noisy,sigma,tensors,params,step=0,clean=None,mode=None):
+    """
+
+    Search the similar patches of every valid pixel in one compiled pass.
+
+    Returns the dense neighbor indices (K,t,h,w) [int32, -1 if invalid]
+    and their patch distances (K,t,h,w) [float32, inf if invalid].
+
+    mode = "brute" compares each candidate pixel-by-pixel;
+    mode = "integral" uses box sums of squared difference images,
+    so each candidate costs O(1) regardless of the patch size.
+    The tables are built per 32x32 block of reference pixels over the
+    displacements of that block's windows; their cost grows with the
+    spread of the flows within a block, not across the frame.
+    "integral" pays off as the patch grows (2x faster than "brute" for
+    sizePatch 3, 4x for sizePatch 7 with smooth flows); flows that
+    change from pixel to pixel make every block span the full spread
+    and roughly halve that gain.
+
+    """
+
+    # -- extract info for explicit call --
     t,c,h,w = noisy.shape
-    nframes,height,width = t,h,w
-    hw = height*width
-    npixels = t*h*w
     ps = params['sizePatch'][step]
     ps_t = params['sizePatchTime'][step]
-    inds = np.zeros((npatches,t,h,w)).astype(np.int32)
-    for pidx in range(npixels):
+    npatches = params['nSimilarPatches'][step]
+    nwindow_xy = params['sizeSearchWindow'][step]
+    nfwd = params['sizeSearchTimeFwd'][step]
+    nbwd = params['sizeSearchTimeBwd'][step]
+    step1 = params['isFirstStep'][step]
+    basic = optional(tensors,'basic',np.zeros_like(noisy))
+    if mode is None: mode = optional(params,'simSearchMode',["brute","brute"],object)[step]
+    chnls = 1 if step1 else c
+
+    # -- format flows for c++ (t-1 -> t) --
+    if check_flows(tensors):
+        check_and_expand_flows(tensors,t)
+    zflow = np.zeros((t,2,h,w),dtype=np.float32)
+    fflow = optional(tensors,'fflow',zflow)
+    bflow = optional(tensors,'bflow',zflow)
+
+    # -- search image --
+    if not(clean is None): srch_img = apply_color_xform_cpp(clean)
+    elif step1: srch_img = apply_color_xform_cpp(noisy)
+    else: srch_img = apply_color_xform_cpp(basic)
+
+    # -- exec search --
+    values,indices = exec_sim_search_video(srch_img,fflow,bflow,ps,ps_t,npatches,
+                                           nwindow_xy,nfwd,nbwd,chnls,mode)
 
-        # -- pix index to coords --
-        ti = pidx // hw
-        # hi = (pidx - ti*w*h) // w
-        # wi = pidx - ti*w*h - hi*w
-        hi = (pidx % hw) // width
-        wi = pidx % width
-        pidx3 = ti*w*h*c + hi*w + wi
+    # -- pack results --
+    results = edict()
+    results.values = values
+    results.indices = indices
+    results.nSimP = values.shape[0]
+    results.ps = ps
+    results.ps_t = ps_t
 
-        # -- skip --
-        valid_t = (ti + ps_t - 1) < nframes
-        valid_h = (hi + ps - 1) < height
-        valid_w = (wi + ps - 1) < width
-        valid = valid_t and valid_h and valid_w
-        if not(valid):
-            inds[:,ti,hi,wi] = -1
-            continue
+    return results
 
-        # -- sim search --
-        sim_results = runSimSearch(noisy,sigma,pidx3,flows,params,step)
-        pix_inds = sim_results.indices
+def exec_sim_search_video(srch_img,fflow,bflow,ps,ps_t,npatches,
+                          nwindow_xy,nWt_f,nWt_b,chnls,mode="brute"):
+
+    # -- init outputs --
+    t,c,h,w = srch_img.shape
+    nsearch = (t-ps_t+1)*nwindow_xy*nwindow_xy
+    npatches = min(npatches,nsearch)
+    values = np.full((npatches,t,h,w),np.inf,dtype=np.float32)
+    indices = -np.ones((npatches,t,h,w),dtype=np.int32)
+
+    # -- exec search --
+    if mode == "brute":
+        numba_sim_search_video(srch_img,fflow,bflow,values,indices,
+                               ps,ps_t,nwindow_xy,nWt_f,nWt_b,chnls)
+    elif mode == "integral":
+        nframes,nrows,ncols = t-ps_t+1,h-ps+1,w-ps+1
+        refs = np.ones((nframes,nrows,ncols),dtype=np.bool_)
+        vals_r,inds_r,_ = exec_sim_search_integral(srch_img,fflow,bflow,refs,
+                                                   ps,ps_t,npatches,nwindow_xy,
+                                                   nWt_f,nWt_b,chnls)
+        shape = (nframes,nrows,ncols,npatches)
+        values[:,:nframes,:nrows,:ncols] = vals_r.reshape(shape).transpose(3,0,1,2)
+        indices[:,:nframes,:nrows,:ncols] = inds_r.reshape(shape).transpose(3,0,1,2)
+    else:
+        raise ValueError(f"Uknown search mode [{mode}]")
+
+    return values,indices
+
+@njit(parallel=True,cache=True)
+def numba_sim_search_video(noisy,fflow,bflow,vals,inds,ps,ps_t,nWxy,nWt_f,nWt_b,chnls):
 
-        # -- fill output --
-        inds[:,ti,hi,wi] = pix_inds
+    # -- init shapes --
+    t,c,h,w = noisy.shape
+    whc = w*h*c
+    npatches = vals.shape[0]
+    nframes,nrows,ncols = t-ps_t+1,h-ps+1,w-ps+1
+
+    # -- parallel over (frame,row) of references --
+    for th in prange(nframes*nrows):
+        t_c = th // nrows
+        h_c = th % nrows
+        heap_vals = np.empty(npatches,dtype=np.float32)
+        heap_inds = np.empty(npatches,dtype=np.int32)
+        for w_c in range(ncols):
+
+            # -- search ranges --
+            ranges = numba_search_ranges(t_c,h_c,w_c,fflow,bflow,t,h,w,
+                                         ps,ps_t,nWxy,nWt_f,nWt_b)
+            t_start,nt,h_starts,h_ends,w_starts,w_ends = ranges
+
+            # -- compare patches; keep the best in a bounded heap --
+            heap_n = 0
+            for t_idx in range(nt):
+                t_i = t_start + t_idx
+                for h_i in range(h_starts[t_idx],h_ends[t_idx]):
+                    for w_i in range(w_starts[t_idx],w_ends[t_idx]):
+                        val = numba_patch_delta(noisy,t_c,h_c,w_c,
+                                                t_i,h_i,w_i,ps,ps_t,chnls)
+                        ind = t_i * whc + h_i * w + w_i
+                        heap_n = numba_heap_push(heap_vals,heap_inds,heap_n,
+                                                 np.float32(val),ind)
+
+            # -- top-k --
+            numba_heap_sort(heap_vals,heap_inds,heap_n,
+                            vals[:,t_c,h_c,w_c],inds[:,t_c,h_c,w_c])
+
+def exec_sim_search_integral(srch_img,fflow,bflow,refs,ps,ps_t,npatches,
+                             nwindow_xy,nWt_f,nWt_b,chnls,tau=None,bsize=32):
+    """
+
+    The "integral" search of the reference pixels where "refs" [(t,h,w) bool].
+
+    Returns the groups of the references in scan order, packed:
+    group "r" is values[offsets[r]:offsets[r+1]] (and indices).
+    Without "tau", each group holds "k" patches [inf,-1 if the window has fewer].
+    With "tau", once the kth distance is <= tau the group is every
+    patch <= tau, as "topk"; patches tied with a kth distance above
+    tau are not added.
+
+    """
 
-    return inds
+    # -- init shapes --
+    t,c,h,w = srch_img.shape
+    nW = nwindow_xy
+    nframes,nrows,ncols = t-ps_t+1,h-ps+1,w-ps+1
+    k = min(npatches,nframes*nW*nW)
+
+    # -- reference ids in scan order; -1 elsewhere --
+    refs = refs[:nframes,:nrows,:ncols]
+    ref_ids = np.full((nframes,nrows,ncols),-1,dtype=np.int64)
+    nrefs = int(refs.sum())
+    ref_ids[refs] = np.arange(nrefs)
+
+    # -- "tau" is a sum of squares; match our normalized distances --
+    use_tau = not(tau is None)
+    tau = tau / (255.**2 * ps*ps*ps_t*chnls) if use_tau else 0.
+    tau = np.float32(tau)
+
+    # -- top-k of each reference & its number of distances <= tau --
+    topk_vals = np.full((nrefs,k),np.inf,dtype=np.float32)
+    topk_inds = np.full((nrefs,k),-1,dtype=np.int32)
+    nle = np.zeros(nrefs,dtype=np.int64)
+    use = np.zeros(nrefs,dtype=np.bool_)
+    offsets = np.zeros(nrefs+1,dtype=np.int64)
+    values = np.zeros(0,dtype=np.float32)
+    indices = np.zeros(0,dtype=np.int32)
+    numba_sim_search_integral(srch_img,fflow,bflow,ref_ids,topk_vals,topk_inds,
+                              nle,use,offsets,values,indices,ps,ps_t,nW,
+                              nWt_f,nWt_b,chnls,use_tau,tau,False,bsize)
+
+    # -- "tau" sets the group once the kth distance is below it --
+    if use_tau and k > 0:
+        kth = topk_vals[:,k-1]
+        use[...] = np.logical_and(np.isfinite(kth),kth <= tau)
+    nSimPs = np.where(use,nle,k)
+    offsets[1:] = np.cumsum(nSimPs)
+
+    # -- pack; the "tau" groups need a second pass --
+    values = np.zeros(offsets[-1],dtype=np.float32)
+    indices = np.zeros(offsets[-1],dtype=np.int32)
+    fixed = np.flatnonzero(np.logical_not(use))
+    pos = offsets[fixed][:,None] + np.arange(k)[None,:]
+    values[pos] = topk_vals[fixed]
+    indices[pos] = topk_inds[fixed]
+    if np.any(use):
+        numba_sim_search_integral(srch_img,fflow,bflow,ref_ids,topk_vals,topk_inds,
+                                  nle,use,offsets,values,indices,ps,ps_t,nW,
+                                  nWt_f,nWt_b,chnls,use_tau,tau,True,bsize)
+        numba_sort_groups(values,indices,offsets,use)
+
+    return values,indices,offsets
+
+@njit(parallel=True,cache=True)
+def numba_sim_search_integral(noisy,fflow,bflow,ref_ids,topk_vals,topk_inds,
+                              nle,use,offsets,values,indices,ps,ps_t,nWxy,
+                              nWt_f,nWt_b,chnls,use_tau,tau,collect,bsize):
+    """
+    Box-sum search over blocks of "bsize" x "bsize" reference pixels;
+    the ranges & heaps of a block live only in its iteration.
+    Keeps the top-k of each reference [collect = False] or writes
+    its distances <= tau into its packed group [collect = True]
+    """
 
+    # -- init shapes --
+    t,c,h,w = noisy.shape
+    whc = w*h*c
+    k = topk_vals.shape[1]
+    nframes,nrows,ncols = ref_ids.shape
+    nt_max = nWt_f + nWt_b + 1
+    norm = ps*ps*ps_t*chnls
+
+    # -- blocks of reference pixels; each builds its own tables --
+    nby = (nrows + bsize - 1) // bsize
+    nbx = (ncols + bsize - 1) // bsize
+    nblocks = nby * nbx
+
+    # -- parallel over (reference frame, block) --
+    for tb in prange(nframes*nblocks):
+        t_c = tb // nblocks
+        by0 = ((tb % nblocks) // nbx) * bsize
+        bx0 = ((tb % nblocks) % nbx) * bsize
+        by1 = min(by0 + bsize,nrows)
+        bx1 = min(bx0 + bsize,ncols)
+
+        # -- references searched by this pass --
+        active = np.zeros((by1-by0,bx1-bx0),dtype=np.bool_)
+        for h_c in range(by0,by1):
+            for w_c in range(bx0,bx1):
+                rid = ref_ids[t_c,h_c,w_c]
+                if rid < 0: continue
+                if collect and not(use[rid]): continue
+                active[h_c-by0,w_c-bx0] = True
+        if not(np.any(active)): continue
+
+        # -- search ranges of the block --
+        t_start,nt = 0,0
+        h_starts = np.zeros((by1-by0,bx1-bx0,nt_max),dtype=np.int64)
+        h_ends = np.zeros((by1-by0,bx1-bx0,nt_max),dtype=np.int64)
+        w_starts = np.zeros((by1-by0,bx1-bx0,nt_max),dtype=np.int64)
+        w_ends = np.zeros((by1-by0,bx1-bx0,nt_max),dtype=np.int64)
+        for h_c in range(by0,by1):
+            for w_c in range(bx0,bx1):
+                if not(active[h_c-by0,w_c-bx0]): continue
+                ranges = numba_search_ranges(t_c,h_c,w_c,fflow,bflow,t,h,w,
+                                             ps,ps_t,nWxy,nWt_f,nWt_b)
+                t_start,nt,h_s,h_e,w_s,w_e = ranges
+                h_starts[h_c-by0,w_c-bx0,:nt] = h_s
+                h_ends[h_c-by0,w_c-bx0,:nt] = h_e
+                w_starts[h_c-by0,w_c-bx0,:nt] = w_s
+                w_ends[h_c-by0,w_c-bx0,:nt] = w_e
+
+        # -- bounded max-heaps [top-k] or write cursors [collect] --
+        heap_vals = np.zeros((by1-by0,bx1-bx0,k),dtype=np.float32)
+        heap_inds = np.zeros((by1-by0,bx1-bx0,k),dtype=np.int32)
+        heap_n = np.zeros((by1-by0,bx1-bx0),dtype=np.int64)
+
+        integ = np.zeros((bsize+ps,bsize+ps),dtype=np.float64)
+        for t_idx in range(nt):
+            t_i = t_start + t_idx
+
+            # -- displacements covering every window of this block --
+            dy_min,dy_max,dx_min,dx_max = h,-h,w,-w
+            for h_c in range(by0,by1):
+                for w_c in range(bx0,bx1):
+                    bh,bw = h_c-by0,w_c-bx0
+                    if not(active[bh,bw]): continue
+                    dy_min = min(dy_min,h_starts[bh,bw,t_idx] - h_c)
+                    dy_max = max(dy_max,h_ends[bh,bw,t_idx] - 1 - h_c)
+                    dx_min = min(dx_min,w_starts[bh,bw,t_idx] - w_c)
+                    dx_max = max(dx_max,w_ends[bh,bw,t_idx] - 1 - w_c)
+
+            for dy in range(dy_min,dy_max+1):
+                for dx in range(dx_min,dx_max+1):
+
+                    # -- references of the block with both patches inside the frame --
+                    y0,y1 = max(by0,-dy),min(by1,nrows-dy)
+                    x0,x1 = max(bx0,-dx),min(bx1,ncols-dx)
+                    if y0 >= y1 or x0 >= x1: continue
+                    ny,nx = y1-y0+ps-1,x1-x0+ps-1
+
+                    # -- integral image of the squared difference --
+                    for yi in range(ny):
+                        row = 0.
+                        for xi in range(nx):
+                            y,x = y0+yi,x0+xi
+                            delta = 0.
+                            for pt in range(ps_t):
+                                for c_i in range(chnls):
+                                    pix_l = noisy[t_c+pt,c_i,y,x]/255.
+                                    pix_k = noisy[t_i+pt,c_i,y+dy,x+dx]/255.
+                                    delta += (pix_l - pix_k)**2.
+                            row += delta
+                            integ[yi+1,xi+1] = integ[yi,xi+1] + row
+
+                    # -- O(1) box sum per candidate --
+                    for h_c in range(y0,y1):
+                        h_i = h_c + dy
+                        bh = h_c - by0
+                        for w_c in range(x0,x1):
+                            w_i = w_c + dx
+                            bw = w_c - bx0
+                            if not(active[bh,bw]): continue
+                            if h_i < h_starts[bh,bw,t_idx]: continue
+                            if h_i >= h_ends[bh,bw,t_idx]: continue
+                            if w_i < w_starts[bh,bw,t_idx]: continue
+                            if w_i >= w_ends[bh,bw,t_idx]: continue
+                            yi,xi = h_c-y0,w_c-x0
+                            box = integ[yi+ps,xi+ps] - integ[yi,xi+ps]
+                            box += integ[yi,xi] - integ[yi+ps,xi]
+                            val = np.float32(box/norm)
+                            ind = t_i * whc + h_i * w + w_i
+                            rid = ref_ids[t_c,h_c,w_c]
+                            if collect:
+                                if val > tau: continue
+                                pos = offsets[rid] + heap_n[bh,bw]
+                                values[pos],indices[pos] = val,ind
+                                heap_n[bh,bw] += 1
+                                continue
+                            heap_n[bh,bw] = numba_heap_push(heap_vals[bh,bw],
+                                                            heap_inds[bh,bw],
+                                                            heap_n[bh,bw],val,ind)
+                            if use_tau and val <= tau: nle[rid] += 1
+
+        # -- sorted top-k --
+        if collect: continue
+        for h_c in range(by0,by1):
+            for w_c in range(bx0,bx1):
+                bh,bw = h_c-by0,w_c-bx0
+                if not(active[bh,bw]): continue
+                rid = ref_ids[t_c,h_c,w_c]
+                numba_heap_sort(heap_vals[bh,bw],heap_inds[bh,bw],heap_n[bh,bw],
+                                topk_vals[rid],topk_inds[rid])
+
+@njit(parallel=True,cache=True)
+def numba_sort_groups(values,indices,offsets,use):
+    """
+    Sort the packed groups with "use" by (distance,index)
+    """
+    for rid in prange(use.shape[0]):
+        if not(use[rid]): continue
+        start,end = offsets[rid],offsets[rid+1]
+        order = np.argsort(indices[start:end])
+        vals_r = values[start:end][order]
+        inds_r = indices[start:end][order]
+        order = np.argsort(vals_r,kind='mergesort')
+        values[start:end] = vals_r[order]
+        indices[start:end] = inds_r[order]
+
+#
+# -- batched search & selection --
+#
+
+def runSimSearchBatch(srch_img,fflow,bflow,sigma,pidxs,params,step=0,wspace=None):
+    """
+
+    Search a batch of reference patches in an (already color-transformed) image.
+
+    """
+
+    # -- extract info for explicit call --
+    t,c,h,w = srch_img.shape
+    ps = params['sizePatch'][step]
+    ps_t = params['sizePatchTime'][step]
+    npatches = params['nSimilarPatches'][step]
+    nwindow_xy = params['sizeSearchWindow'][step]
+    nfwd = params['sizeSearchTimeFwd'][step]
+    nbwd = params['sizeSearchTimeBwd'][step]
+    couple_ch = params['coupleChannels'][step]
+    step1 = params['isFirstStep'][step]
+    tau = optional(params,'tau',[None,None],object)[step]
+
+    # -- exec search --
+    values,indices,nSimPs = exec_sim_search_batch(pidxs,srch_img,fflow,bflow,sigma,
+                                                  ps,ps_t,npatches,nwindow_xy,
+                                                  nfwd,nbwd,couple_ch,step1,tau,
+                                                  wspace)
+
+    # -- pack results --
+    results = edict()
+    results.values = values
+    results.indices = indices
+    results.nSimPs = nSimPs
+    results.nSimP = indices.shape[1]
+    results.ps = ps
+    results.ps_t = ps_t
+
+    return results
+
+def exec_sim_search_batch(pidxs,noisy,fflow,bflow,sigma,ps,ps_t,npatches,
+                          nwindow_xy,nWt_f,nWt_b,couple_ch,step1,tau=None,
+                          wspace=None):
+
+    # -- init shapes --
+    t,c,h,w = noisy.shape
+    if wspace is None: wspace = Workspace()
+    nbatch = len(pidxs)
+    nW = nwindow_xy
+    nsearch = search_window_size(t,ps_t,nW,nWt_f,nWt_b)
+    chnls = 1 if step1 else c
+
+    # -- "exec_cpp_sim_search" keeps "k" over all frames; pad with inf --
+    k = min(npatches,(t-ps_t+1)*nW*nW)
+
+    # -- "tau" is a sum of squares; match our normalized distances --
+    use_tau = not(tau is None)
+    tau = tau / (255.**2 * ps*ps*ps_t*chnls) if use_tau else 0.
+
+    # -- search & select all reference patches together --
+    pidxs = np.ascontiguousarray(pidxs,dtype=np.int64)
+    nsel = max(k,nsearch)
+    srch_vals = wspace.get("srch_vals",(nbatch,nsearch),np.float32)
+    srch_inds = wspace.get("srch_inds",(nbatch,nsearch),np.int32)
+    sel_vals = wspace.get("sel_vals",(nbatch,nsel),np.float32)
+    sel_inds = wspace.get("sel_inds",(nbatch,nsel),np.int32)
+    heap_vals = wspace.get("heap_vals",(nbatch,k),np.float32)
+    heap_inds = wspace.get("heap_inds",(nbatch,k),np.int64)
+    order = wspace.get("order",(nbatch,nsearch),np.int64)
+    nSimPs = wspace.get("nSimPs",(nbatch,),np.int64)
+    numba_sim_search_batch(pidxs,noisy,fflow,bflow,srch_vals,srch_inds,
+                           sel_vals,sel_inds,heap_vals,heap_inds,order,
+                           nSimPs,ps,ps_t,k,nW,nWt_f,nWt_b,chnls,
+                           use_tau,np.float32(tau))
+
+    # -- pad to the largest group; "tau" can add patches --
+    nmax = nSimPs.max() if nbatch > 0 else 0
+    vals = wspace.get("vals",(nbatch,nmax),np.float32)
+    indices = wspace.get("indices",(nbatch,nmax),np.int32)
+    vals[...] = sel_vals[:,:nmax]
+    indices[...] = sel_inds[:,:nmax]
+    pad = np.arange(nmax)[None,:] >= nSimPs[:,None]
+    vals[pad] = np.inf
+    indices[pad] = -1
+
+    return vals,indices,nSimPs
+
+def search_window_size(t,ps_t,nWxy,nWt_f,nWt_b):
+    """
+    Number of candidates in one search window; at most
+    "nWt_f+nWt_b+1" frames are searched
+    """
+    nt = min(t-ps_t+1,nWt_f+nWt_b+1)
+    return nt*nWxy*nWxy
+
+@njit(parallel=True,cache=True)
+def numba_sim_search_batch(pidxs,noisy,fflow,bflow,srch_vals,srch_inds,
+                           sel_vals,sel_inds,heap_vals,heap_inds,order,
+                           nSimPs,ps,ps_t,k,nWxy,nWt_f,nWt_b,chnls,
+                           use_tau,tau):
+    """
+    The search & "topk" selection of "exec_cpp_sim_search" for each
+    reference patch; parallel over the reference patches
+    """
+
+    # -- init shapes --
+    t,c,h,w = noisy.shape
+    whc = w*h*c
+    wh = w*h
+    nsearch = srch_vals.shape[1]
+
+    for bi in prange(pidxs.shape[0]):
+
+        # -- "center" coords at index "pidx" --
+        pidx = pidxs[bi]
+        t_c = pidx // whc
+        h_c = (pidx % wh) // w
+        w_c = pidx % w
+
+        # -- search ranges --
+        ranges = numba_search_ranges(t_c,h_c,w_c,fflow,bflow,t,h,w,
+                                     ps,ps_t,nWxy,nWt_f,nWt_b)
+        t_start,nt,h_starts,h_ends,w_starts,w_ends = ranges
+
+        # -- compare patches --
+        vals_b = srch_vals[bi]
+        inds_b = srch_inds[bi]
+        vals_b[:] = np.inf
+        inds_b[:] = -1
+        for t_idx in range(nt):
+            t_i = t_start + t_idx
+            for h_idx in range(nWxy):
+                h_i = h_starts[t_idx] + h_idx
+                if h_i >= h_ends[t_idx]: continue
+                nw = w_ends[t_idx] - w_starts[t_idx]
+                for w_idx in range(nw):
+                    w_i = w_starts[t_idx] + w_idx
+                    valid_t = (t_i + ps_t - 1) < t
+                    valid_h = (h_i + ps - 1) < h
+                    valid_w = (w_i + ps - 1) < w
+                    if not(valid_h and valid_w and valid_t): continue
+                    pos = (t_idx*nWxy + h_idx)*nWxy + w_idx
+                    vals_b[pos] = numba_patch_delta(noisy,t_c,h_c,w_c,t_i,h_i,w_i,
+                                                    ps,ps_t,chnls)
+                    inds_b[pos] = t_i * whc + h_i * w + w_i
+
+        # -- "topk": k smallest (ties by position) & all <= max(tau,kth) --
+        nsel = numba_topk(vals_b,k,use_tau,tau,heap_vals[bi],
+                          heap_inds[bi],order[bi])
+        for n in range(nsel):
+            sel_vals[bi,n] = vals_b[order[bi,n]]
+            sel_inds[bi,n] = inds_b[order[bi,n]]
+
+        # -- the frames outside the window are all inf --
+        for n in range(nsel,k):
+            sel_vals[bi,n] = np.inf
+            sel_inds[bi,n] = -1
+        nSimPs[bi] = max(nsel,k)
+
+def exec_select_cpp_groups_batch(noisy,indices,ps,ps_t,out=None):
+    t,c,h,w = noisy.shape
+    nbatch,npatches = indices.shape
+    if out is None:
+        groups = np.zeros((nbatch,c,ps_t,ps,ps,npatches),dtype=np.float32)
+    else:
+        groups = out
+        groups.fill(0)
+    numba_select_cpp_groups_batch(groups,noisy,indices,ps,ps_t)
+    return groups
+
+@njit
+def numba_select_cpp_groups_batch(groups,noisy,indices,ps,ps_t):
+
+    # -- init shapes --
+    t,c,h,w = noisy.shape
+    whc = w*h*c
+    wh = w*h
+
+    # -- exec copy --
+    for bi in range(indices.shape[0]):
+        for n in range(indices.shape[1]):
+            ind = indices[bi,n]
+            if ind == -1: continue
+            ti = ind // whc
+            hi = (ind % wh) // w
+            wi = ind % w
+            for ci in range(c):
+                for pt in range(ps_t):
+                    for pi in range(ps):
+                        for pj in range(ps):
+                            groups[bi,ci,pt,pi,pj,n] = noisy[ti+pt,ci,hi+pi,wi+pj]
 
 #
 # -- select patches of noisy regions --
@@ -252,167 +779,172 @@ def idx2coords(idx,width,height,color):
 
 
 def exec_cpp_sim_search(pidx,noisy,fflow,bflow,sigma,ps,ps_t,
-                        npatches,nwindow_xy,nWt_f,nWt_b,couple_ch,step1):
+                        npatches,nwindow_xy,nWt_f,nWt_b,couple_ch,step1,
+                        use_access=False,verbose=False,tau=None,wspace=None):
 
     # -- init shapes --
     t,c,h,w = noisy.shape
-    # patches = np.zeros((npatches,ps_t,c,ps,ps))
-    vals = np.ones((t-ps_t+1,nwindow_xy,nwindow_xy),dtype=np.float32)*np.inf
-    indices = -np.ones((t-ps_t+1,nwindow_xy,nwindow_xy),dtype=np.int32)
-    access = np.zeros((3,t-ps_t+1,nwindow_xy,nwindow_xy),dtype=np.uint32)
+    nW = nwindow_xy
+    if wspace is None: wspace = Workspace()
+    vals = wspace.get("srch_vals",(t-ps_t+1,nW,nW),np.float32,np.inf)
+    indices = wspace.get("srch_inds",(t-ps_t+1,nW,nW),np.int32,-1)
     nsearch = indices.size
 
+    # -- [optional] log accessed coordinates --
+    if use_access:
+        access = np.zeros((3,t-ps_t+1,nW,nW),dtype=np.uint32)
+    else:
+        access = wspace.get("srch_access",(3,1,1,1),np.uint32)
+
     # -- search --
-    # print("-"*30)
-    # print("exec_cpp: ",noisy[0,0,0,0])
     numba_cpp_sim_search(pidx,vals,indices,access,noisy,fflow,bflow,sigma,
-                         ps,ps_t,nwindow_xy,nWt_f,nWt_b,couple_ch,step1)
-
-    # -- remove ref frame --
-    # t_c = coords(pidx,w,h,c)[0]
-    # ncat = np.concatenate
-    # print(deltas[:t_c].shape)
-    # deltas = ncat([deltas[:t_c],deltas[t_c+1:]],axis=0)
-    # print("deltas.shape: ",deltas.shape)
-    # save_images("sim_search.png",deltas[:,None])
-    # print(deltas)
-    # checks = [1095,37824]
-    # for idx in checks:
-    #     i_idx = np.where(indices == idx)
-    #     print(i_idx)
-    #     print("vals[%d]: %2.3f" % (idx,vals[i_idx]))
+                         ps,ps_t,nwindow_xy,nWt_f,nWt_b,couple_ch,step1,
+                         use_access,verbose)
+    if not(use_access): access = None
+
+    # -- "tau" is a sum of squares; match our normalized distances --
+    if not(tau is None):
+        chnls = 1 if step1 else c
+        tau = tau / (255.**2 * ps*ps*ps_t*chnls)
 
     # -- argmin --
     vals_f = vals.ravel()
-    vindices = np.argsort(vals_f)[:npatches]
+    vindices = topk(vals_f,npatches,tau)
     vals = vals_f[vindices]
     indices = indices.ravel()[vindices]
-    # print("nsearch: %d\n" % nsearch)
-    # print("npatches: %d\n" % npatches)
 
     return vals,indices,access,nsearch
 
-# @njit
+@njit(parallel=True,cache=True)
 def numba_cpp_sim_search(pidx,vals,indices,access,noisy,fflow,bflow,sigma,
-                         ps,ps_t,nWxy,nWt_f,nWt_b,couple_ch,step1):
+                         ps,ps_t,nWxy,nWt_f,nWt_b,couple_ch,step1,
+                         use_access,verbose):
+
     # -- init shapes --
     t,c,h,w = noisy.shape
     nframes,color,height,width = t,c,h,w
     chnls = 1 if step1 else color
-    print("[cpu] chnls = ",chnls)
-
-    def coords2pix(hi,wi,ti):
-        pix = ti * width * height * color
-        pix += hi * width
-        pix += wi
-        return pix
-
-    def idx2coords(idx):
-
-        # -- get shapes --
-        whc = width*height*color
-        wh = width*height
-
-        # -- compute coords --
-        t = (idx      ) // whc
-        c = (idx % whc) // wh
-        y = (idx % wh ) // width
-        x = idx % width
-
-        return t,c,y,x
+    whc = width*height*color
+    wh = width*height
 
     # -- "center" coords at index "pidx" --
-    t_c,c_c,h_c,w_c = idx2coords(pidx)
-    # print(t_c,c_c,h_c,w_c)
+    t_c = pidx // whc
+    h_c = (pidx % wh) // width
+    w_c = pidx % width
+
+    # -- search ranges --
+    ranges = numba_search_ranges(t_c,h_c,w_c,fflow,bflow,t,h,w,
+                                 ps,ps_t,nWxy,nWt_f,nWt_b)
+    t_start,nt,h_starts,h_ends,w_starts,w_ends = ranges
+    if verbose:
+        print("[cpu] chnls = ",chnls)
+        print("[cpu] ranget: ",t_start,t_start+nt-1)
+        for t_idx in range(nt):
+            print("[cpu] t,rangex,rangey: ",t_start+t_idx,
+                  w_starts[t_idx],w_ends[t_idx]-1,
+                  h_starts[t_idx],h_ends[t_idx]-1)
+
+    # -- compare patches; parallel over (frame,row) --
+    for th in prange(nt*nWxy):
+        t_idx = th // nWxy
+        h_idx = th % nWxy
+        t_i = t_start + t_idx
+        h_i = h_starts[t_idx] + h_idx
+        if h_i >= h_ends[t_idx]: continue
+        nw = w_ends[t_idx] - w_starts[t_idx]
+        for w_idx in range(nw):
+            w_i = w_starts[t_idx] + w_idx
+
+            # -- valid check --
+            valid_t = (t_i + ps_t - 1) < nframes
+            valid_h = (h_i + ps - 1) < height
+            valid_w = (w_i + ps - 1) < width
+            invalid = not(valid_h and valid_w and valid_t)
+
+            # -- compute patch deltas --
+            delta = np.inf
+            if not(invalid):
+                delta = numba_patch_delta(noisy,t_c,h_c,w_c,t_i,h_i,w_i,
+                                          ps,ps_t,chnls)
+            vals[t_idx,h_idx,w_idx] = delta
+            ind = t_i * whc + h_i * width + w_i
+            indices[t_idx,h_idx,w_idx] = -1 if invalid else ind
+
+            # -- for testing --
+            if use_access:
+                access[0,t_idx,h_idx,w_idx] = t_i
+                access[1,t_idx,h_idx,w_idx] = h_i
+                access[2,t_idx,h_idx,w_idx] = w_i
 
+@njit(cache=True)
+def numba_patch_delta(noisy,t_c,h_c,w_c,t_i,h_i,w_i,ps,ps_t,chnls):
+    delta = 0.
+    for pt in range(ps_t):
+        for pi in range(ps):
+            for pj in range(ps):
+                for c_i in range(chnls):
+                    pix_l = noisy[t_c+pt,c_i,h_c+pi,w_c+pj]/255.
+                    pix_k = noisy[t_i+pt,c_i,h_i+pi,w_i+pj]/255.
+                    delta += (pix_l - pix_k)**2.
+    return delta/(ps*ps*ps_t*chnls)
+
+@njit(cache=True)
+def numba_search_ranges(t_c,h_c,w_c,fflow,bflow,t,h,w,ps,ps_t,nWxy,nWt_f,nWt_b):
+    """
+    Search window of each frame, following the flow from the reference
+    frame as in "estimateSimilarPatches" (cx,cy,ct)
+    """
+
+    # -- temporal range --
     # int shift_t = std::min(0, (int)pt -  sWt_b)
     # + std::max(0, (int)pt +  sWt_f - (int)sz.frames + sPt);
     # ranget[0] = std::max(0, (int)pt - sWt_b - shift_t);
     # ranget[1] = std::min((int)sz.frames - sPt, (int)pt +  sWt_f - shift_t);
-
-    # -- search --
-    npatch = 0
     shift_t = min(0,t_c - nWt_b) + max(0,t_c + nWt_f - t + ps_t)
     t_start = max(t_c - nWt_b - shift_t,0)
     t_end = min(t - ps_t, t_c + nWt_f - shift_t)+1
-    t_idx = 0
-
-    # -- states --
-    cw_vals = np.zeros(t_end-t_start+1,dtype=np.int32)
-    ch_vals = np.zeros(t_end-t_start+1,dtype=np.int32)
-    ct_vals = np.zeros(t_end-t_start+1,dtype=np.int32)
-
-    # print("example: ",noisy[2,0,20,23],2,0,20,23)
-    # print("example: ",noisy[2,0,23,20],2,0,23,20)
-    # print("ps: %d" % ps)
-    # print("t_c,c_c,h_c,w_c: (%d,%d,%d,%d)" % (t_c,c_c,h_c,w_c))
-
-    # ---------------------
-    # for (int qt = pt+1; qt <= ranget[1]; ++qt) srch_ranget.push_back(qt);
-    # for (int qt = pt-1; qt >= ranget[0]; --qt) srch_ranget.push_back(qt);
-    # ---------------------
-
-    # print("ranget: (%d,%d,%d)" % (t_start,t_end,shift_t))
-    # print(t_c)
-    # print(np.arange(t_c+1,t_end))
-    # print(np.arange(t_c-1,t_start-1,-1))
-    trange = [t_c]
-    trange_s = np.arange(t_c+1,t_end)
-    trange_e = np.arange(t_start,t_c)[::-1]
-    for t_i in range(trange_s.shape[0]):
-        trange.append(trange_s[t_i])
-    for t_i in range(trange_e.shape[0]):
-        trange.append(trange_e[t_i])
-    # trange = np.concatenate([np.array([t_c],np.int32),np.arange(t_c+1,t_end),],axis=0)
-    # trange = np.roll(trange,shift_t)
-    # print(trange)
-    # exit()
-
-    # -- start search --
-    t_idx = 0
-    for t_i in trange:
-
-        # -------------------------------------
-
-	# int dt = qt - ranget[0]; // search region frame number
-	# int dir = std::max(-1, std::min(1, qt - (int)pt)); // direction (forward or backwards from pt)
-
-        # "previous"
-	# int cx0 = cx[dt - dir];
-	# int cy0 = cy[dt - dir];
-	# int ct0 = ct[dt - dir];
-
-        # "update values"
-	# float cx_f = cx0 + (use_flow ? (dir > 0 ? fflow(cx0,cy0,ct0,0) : bflow(cx0,cy0,ct0,0)) : 0.f);
-	# float cy_f = cy0 + (use_flow ? (dir > 0 ? fflow(cx0,cy0,ct0,1) : bflow(cx0,cy0,ct0,1)) : 0.f);
-
-        # "current"
-	# cx[dt] = std::max(0.f, std::min((float)sz.width  - 1, roundf(cx_f)));
-	# cy[dt] = std::max(0.f, std::min((float)sz.height - 1, roundf(cy_f)));
-	# ct[dt] = qt;
-
-        # -------------------------------------
+    nt = t_end - t_start
+
+    # -- search order: [pt, pt+1, ..., ranget[1], pt-1, ..., ranget[0]] --
+    trange = np.zeros(nt,dtype=np.int64)
+    trange[0] = t_c
+    t_idx = 1
+    for t_i in range(t_c+1,t_end):
+        trange[t_idx] = t_i
+        t_idx += 1
+    for t_i in range(t_c-1,t_start-1,-1):
+        trange[t_idx] = t_i
+        t_idx += 1
+
+    # -- follow the flow to center each frame's window --
+    cw_vals = np.zeros(nt,dtype=np.int32)
+    ch_vals = np.zeros(nt,dtype=np.int32)
+    ct_vals = np.zeros(nt,dtype=np.int32)
+    h_starts = np.zeros(nt,dtype=np.int64)
+    h_ends = np.zeros(nt,dtype=np.int64)
+    w_starts = np.zeros(nt,dtype=np.int64)
+    w_ends = np.zeros(nt,dtype=np.int64)
+    for ti in range(nt):
 
         # -- centering --
-        t_idx = t_i - min(trange)
+        t_i = trange[ti]
+        t_idx = t_i - t_start
         direction = max(-1,min(1,t_i - t_c))
-        # print("(t_i,t_idx,dir): (%d,%d,%d)" % (t_i,t_idx,direction))
         if direction != 0:
             cw0 = cw_vals[t_idx-direction]
             ch0 = ch_vals[t_idx-direction]
             ct0 = ct_vals[t_idx-direction]
-
-            flow = fflow if direction > 0 else bflow
-
-            # print(cw0,ch0,ct0)
-            cw_f = cw0 + flow[ct0,0,ch0,cw0]
-            ch_f = ch0 + flow[ct0,1,ch0,cw0]
-            # print("(cw0,ch0,ct0): (%d,%d,%d)" % (cw0,ch0,ct0))
-            # print("(cw_f,ch_f,dir): (%2.3f,%2.3f)" % (cw_f,ch_f))
-
-            cw = max(0,min(w-1,round(cw_f)))
-            ch = max(0,min(h-1,round(ch_f)))
-            ct = t_i#dx
+            if direction > 0:
+                cw_f = cw0 + fflow[ct0,0,ch0,cw0]
+                ch_f = ch0 + fflow[ct0,1,ch0,cw0]
+            else:
+                cw_f = cw0 + bflow[ct0,0,ch0,cw0]
+                ch_f = ch0 + bflow[ct0,1,ch0,cw0]
+
+            # -- roundf; negative ties are clipped to zero anyway --
+            cw = max(0,min(w-1,int(np.floor(cw_f+0.5))))
+            ch = max(0,min(h-1,int(np.floor(ch_f+0.5))))
+            ct = t_i
         else:
             cw = w_c
             ch = h_c
@@ -423,99 +955,14 @@ def numba_cpp_sim_search(pidx,vals,indices,access,noisy,fflow,bflow,sigma,
         ch_vals[t_idx] = ch
         ct_vals[t_idx] = ct
 
-        # -- grab patches --
-        # fwd_l = fflow[ti,ci,hl,wl]
-        # fwd_k = fflow[ti,ci,hk,wk]
-        # bwd_l = bflow[ti,ci,hl,wl]
-        # bwd_k = bflow[ti,ci,hk,wk]
-
-        # ------------------------
-
-	# int shift_x = std::min(0, cx[dt] - (sWx-1)/2);
-	# int shift_y = std::min(0, cy[dt] - (sWy-1)/2);
-
-	# shift_x += std::max(0, cx[dt] + (sWx-1)/2 - (int)sz.width  + sPx);
-	# shift_y += std::max(0, cy[dt] + (sWy-1)/2 - (int)sz.height + sPx);
-
-	# rangex[0] = std::max(0, cx[dt] - (sWx-1)/2 - shift_x);
-	# rangey[0] = std::max(0, cy[dt] - (sWy-1)/2 - shift_y);
-
-	# rangex[1] = std::min((int)sz.width  - sPx, cx[dt] + (sWx-1)/2 - shift_x);
-	# rangey[1] = std::min((int)sz.height - sPx, cy[dt] + (sWy-1)/2 - shift_y);
-
-        # ------------------------
-
         # -- shifts --
         shift_w = min(0,cw - (nWxy-1)//2) + max(0,cw + (nWxy-1)//2 - w  + ps)
         shift_h = min(0,ch - (nWxy-1)//2) + max(0,ch + (nWxy-1)//2 - h  + ps)
-        # shift_h = max(0,ch + (nWxy-1)//2 - h  + ps)
 
         # -- spatial endpoints --
-        h_start = max(0,ch - (nWxy-1)//2 - shift_h)
-        h_end = min(h-ps,ch + (nWxy-1)//2 - shift_h)+1
-
-        w_start = max(0,cw - (nWxy-1)//2 - shift_w)
-        w_end = min(w-ps,cw + (nWxy-1)//2 - shift_w)+1
-
-        # if t_idx == 2:
-        #     w_start = 4
-        #     w_end = 30+1
-        # elif t_idx == 3:
-        #     w_start = 0
-        #     w_end = 26+1
-        # -- for each in spatial windows --
-        # h_start = 1
-        # w_start = 0
-        # h_end = 28
-        # w_end = 27
-
-	# int dt = qt - ranget[0]; // search region frame number
-	# int dir = std::max(-1, std::min(1, qt - (int)pt)); // direction (forward or backwards from pt)
-
-
-        # print("rangex[0,1]: (%d,%d,%d,%d)" % (w_start,w_end,shift_w,cw))
-        # print("rangey[0,1]: (%d,%d,%d,%d)" % (h_start,h_end,shift_h,ch))
-
-        h_range = np.arange(h_start,h_end)
-        w_range = np.arange(w_start,w_end)
-        for h_idx in prange(len(h_range)):
-            h_i = h_range[h_idx]
-            for w_idx in prange(len(w_range)):
-                w_i = w_range[w_idx]
-                # pix_idx = coords2pix(h_i,w_i,t_i)
-
-                c_ind = coords2pix(h_c,w_c,t_c)
-                i_ind = coords2pix(h_i,w_i,t_i)
-                if i_ind == 1620:
-                    print("[cpu] t: ",t_i,ps_t,nframes,t_i+ps_t-1,trange_s)
-                    print("[cpu] h: ",h_i,h_idx,h_start,h_end,shift_h)
-                    print("[cpu] w: ",w_i,w_idx,w_start,w_end,shift_w)
-                    print("misc: ",c_ind,i_ind)
-                    for iiii,iiiii in enumerate(trange):
-                        print("trange[%d]: %d" % (iiii,iiiii))
-
-                # -- valid check --
-                valid_t = (t_i + ps_t - 1) < nframes
-                valid_h = (h_i + ps - 1) < height
-                valid_w = (w_i + ps - 1) < width
-                invalid = not(valid_h and valid_w and valid_t)
-
-                # -- compute patch deltas --
-                delta = 0.
-                for pt in range(ps_t):
-                    for pi in range(ps):
-                        for pj in range(ps):
-                            for c_i in range(chnls):
-                                pix_l = 0 if invalid else noisy[t_c+pt,c_i,h_c+pi,w_c+pj]/255.
-                                pix_k = 0 if invalid else noisy[t_i+pt,c_i,h_i+pi,w_i+pj]/255.
-                                delta += (pix_l - pix_k)**2.
-                delta = np.inf if invalid else delta
-                vals[t_idx,h_idx,w_idx] = delta/(ps*ps*ps_t*chnls)
-                ind = coords2pix(h_i,w_i,t_i)
-                indices[t_idx,h_idx,w_idx] = -1 if invalid else ind
-
-                # -- for testing --
-                access[0,t_idx,h_idx,w_idx] = t_i
-                access[1,t_idx,h_idx,w_idx] = h_i
-                access[2,t_idx,h_idx,w_idx] = w_i
-        t_idx += 1
+        h_starts[t_idx] = max(0,ch - (nWxy-1)//2 - shift_h)
+        h_ends[t_idx] = min(h-ps,ch + (nWxy-1)//2 - shift_h)+1
+        w_starts[t_idx] = max(0,cw - (nWxy-1)//2 - shift_w)
+        w_ends[t_idx] = min(w-ps,cw + (nWxy-1)//2 - shift_w)+1
+
+    return t_start,nt,h_starts,h_ends,w_starts,w_ends
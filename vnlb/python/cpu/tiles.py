@@ -0,0 +1,310 @@
+
+# -- python deps --
+import os,time
+import numpy as np
+from easydict import EasyDict as edict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+# -- numba --
+import numba
+
+# -- local imports --
+from .proc_nlb import processNLBayes
+from .init_mask import initMask
+
+# -- project imports --
+from svnlb.utils import optional,check_flows,check_and_expand_flows
+
+
+def determineFactor(n):
+    """
+    n = a * b, with a and b as great as possible (a >= b)
+    """
+    if n == 1: return 1,1
+    b = 2
+    while n % b > 0: b += 1
+    a = n // b
+    if b > a:
+        a = b
+        b = n // a
+    return a,b
+
+def subDivideTight(shape,border,ntiles,border_t=0,ntiles_t=1):
+    """
+
+    The tiles of the C++ "VideoUtils::subDivideTight"
+
+    Each crop is a tile plus a "border" in space and "border_t" in time
+    (clipped at the video's edge). The video is split into
+    "ntiles" spatial x "ntiles_t" temporal parts, ordered by (t,h,w).
+
+    """
+
+    # -- number of tiles per dim --
+    t,c,h,w = shape
+    nW,nH = determineFactor(ntiles)
+    nT = max(1,ntiles_t)
+    wTmp = int(np.ceil(float(w)/float(nW)))
+    hTmp = int(np.ceil(float(h)/float(nH)))
+    tTmp = int(np.ceil(float(t)/float(nT)))
+
+    # -- tile positions --
+    tiles = []
+    for k in range(nT):
+        for p in range(nH):
+            for q in range(nW):
+                tile = edict()
+                tile.source_shape = (t,h,w)
+
+                # -- crop = tile + border --
+                tile.origin_t = max(0,k*tTmp - border_t)
+                tile.origin_h = max(0,p*hTmp - border)
+                tile.origin_w = max(0,q*wTmp - border)
+                tile.ending_t = min(t,(k+1)*tTmp + border_t)
+                tile.ending_h = min(h,(p+1)*hTmp + border)
+                tile.ending_w = min(w,(q+1)*wTmp + border)
+
+                # -- inner tile --
+                tile.tile_origin_t = k*tTmp
+                tile.tile_origin_h = p*hTmp
+                tile.tile_origin_w = q*wTmp
+                tile.tile_ending_t = min(t,(k+1)*tTmp)
+                tile.tile_ending_h = min(h,(p+1)*hTmp)
+                tile.tile_ending_w = min(w,(q+1)*wTmp)
+
+                tiles.append(tile)
+
+    return tiles
+
+def partsForMemory(shape,ntiles,border,border_t,memory):
+    """
+
+    The number of temporal parts so each tile fits in "memory" MB;
+    the C++ "partsForMemory".
+
+    Counts the per-tile videos of both steps: noisy, basic, denoised,
+    clean, two flows, and the weights, variance and mask.
+
+    """
+    t,c,h,w = shape
+    nW,nH = determineFactor(ntiles)
+    wTile = min(w,int(np.ceil(float(w)/nW)) + 2*border)
+    hTile = min(h,int(np.ceil(float(h)/nH)) + 2*border)
+    bytes_per_pixel = 4 * (4 * c + 2 * 2 + 2) + 1
+    for nT in range(1,t):
+        tTile = min(t,int(np.ceil(float(t)/nT)) + 2*border_t)
+        tile_mb = bytes_per_pixel * wTile * hTile * tTile / (1024. * 1024.)
+        if tile_mb <= memory: return nT
+    return t
+
+def crop_tile(vid,tile):
+    """
+    Copy the crop of "tile" from a (t,c,h,w) video
+    """
+    if vid is None: return None
+    ts,te = tile.origin_t,tile.ending_t
+    hs,he = tile.origin_h,tile.ending_h
+    ws,we = tile.origin_w,tile.ending_w
+    return vid[ts:te,:,hs:he,ws:we].copy()
+
+def subBuildTight(vidSub,vid,tiles):
+    """
+
+    The C++ "VideoUtils::subBuildTight"
+
+    Write the inner tile (border removed) of each crop into "vid".
+
+    """
+    for sub,tile in zip(vidSub,tiles):
+        ts,te = tile.tile_origin_t,tile.tile_ending_t
+        hs,he = tile.tile_origin_h,tile.tile_ending_h
+        ws,we = tile.tile_origin_w,tile.tile_ending_w
+        its,ite = ts - tile.origin_t,te - tile.origin_t
+        ihs,ihe = hs - tile.origin_h,he - tile.origin_h
+        iws,iwe = ws - tile.origin_w,we - tile.origin_w
+        vid[ts:te,:,hs:he,ws:we] = sub[its:ite,:,ihs:ihe,iws:iwe]
+    return vid
+
+def predictTileGroups(shape,tiles,params):
+    """
+
+    The number of groups the mask of each tile will process,
+    per step; the C++ "computeMask" run on every tile.
+
+    """
+    c = shape[1]
+    predicted = np.zeros((2,len(tiles)),dtype=np.int64)
+    for step in range(2):
+        for n,tile in enumerate(tiles):
+            tile_shape = (tile.ending_t - tile.origin_t, c,
+                          tile.ending_h - tile.origin_h,
+                          tile.ending_w - tile.origin_w)
+            predicted[step,n] = initMask(tile_shape,params,step,tile).ngroups
+    return predicted
+
+def tileBorder(params):
+    """
+
+    Borders added to each tile (space,time); the max over both steps
+
+    As in space, the border is twice the half window plus the patch, so
+    the mask of a crop ("computeMask" drops "sPt-1 + sWt//2" frames)
+    still holds the reference patches that overlap the tile's first frame.
+
+    """
+    sWx = params['sizeSearchWindow']
+    sPx = params['sizePatch']
+    sPt = params['sizePatchTime']
+    sWt = [params['sizeSearchTimeFwd'][i] + params['sizeSearchTimeBwd'][i] + 1
+           for i in range(2)]
+    border = int(max([2*(sWx[i]//2) + sPx[i] - 1 for i in range(2)]))
+    border_t = int(max([2*(sWt[i]//2) + sPt[i] - 1 for i in range(2)]))
+    return border,border_t
+
+# -----------------------------------
+#
+#      Run Tiles
+#
+# -----------------------------------
+
+def runPythonVnlbTiled(noisy,sigma,flows,params,clean=None,nParts=1,nThreads=0,
+                       nPartsTime=0,tileMemory=0.):
+    """
+
+    The tiled version of "runPythonVnlb" as in the C++ "runNLBayesThreads".
+
+    The video is split into "nParts" x "nPartsTime" overlapping tiles;
+    both steps run on each tile and the inner tiles are stitched back together.
+    With "nPartsTime" = 0, the temporal parts are set by "tileMemory" [MB].
+    Tiles run on a pool of "nThreads" processes [0 = all cores] that read
+    the inputs from and write the outputs to shared-memory buffers.
+    Tiles are submitted largest-first by their predicted number of groups
+    (as "SCHED_BALANCED" in C++) so one slow tile does not finish last.
+
+    """
+
+    # -- tiles --
+    t = noisy.shape[0]
+    border,border_t = tileBorder(params)
+    if nPartsTime <= 0:
+        nPartsTime = 1
+        if tileMemory > 0:
+            nPartsTime = partsForMemory(noisy.shape,nParts,border,border_t,tileMemory)
+    nPartsTime = max(1,min(nPartsTime,t))
+
+    # -- no empty parts: only ceil(t/tTmp) parts of tTmp frames hold a frame --
+    tTmp = int(np.ceil(float(t)/nPartsTime))
+    nPartsTime = int(np.ceil(float(t)/tTmp))
+    tiles = subDivideTight(noisy.shape,border,nParts,border_t,nPartsTime)
+    nThreads = os.cpu_count() if nThreads <= 0 else nThreads
+    nThreads = min(nThreads,len(tiles))
+
+    # -- flows for every frame (t-1 -> t) so they crop like the video --
+    if check_flows(flows):
+        flows = edict({'fflow':flows['fflow'],'bflow':flows['bflow']})
+        check_and_expand_flows(flows,t)
+
+    # -- shared inputs & outputs --
+    shms,names = edict(),edict()
+    tensors = edict({'noisy':noisy,'clean':clean,
+                     'fflow':optional(flows,'fflow',None),
+                     'bflow':optional(flows,'bflow',None),
+                     'basic':np.zeros_like(noisy),
+                     'denoised':np.zeros_like(noisy)})
+    for key,val in tensors.items():
+        if val is None: continue
+        val = np.ascontiguousarray(val,dtype=np.float32)
+        shm = SharedMemory(create=True,size=max(val.nbytes,1))
+        np.ndarray(val.shape,np.float32,shm.buf)[...] = val
+        shms[key] = shm
+        names[key] = (shm.name,val.shape)
+
+    # -- largest tiles first --
+    predicted = predictTileGroups(noisy.shape,tiles,params)
+    order = np.argsort(-predicted.sum(0),kind='stable')
+
+    # -- exec --
+    try:
+        args = [(names,tiles[n],sigma,params) for n in order]
+        if nThreads == 1:
+            outs = [exec_tile(*arg) for arg in args]
+        else:
+            ctx = get_context("spawn")
+            nthreads_numba = max(1,os.cpu_count()//nThreads)
+            with ProcessPoolExecutor(nThreads,mp_context=ctx,
+                                     initializer=init_tile_worker,
+                                     initargs=(nthreads_numba,)) as pool:
+                futures = [pool.submit(exec_tile,*arg) for arg in args]
+                outs = [future.result() for future in futures]
+
+        # -- back to tile order --
+        ngroups,times = [None]*len(tiles),[None]*len(tiles)
+        for n,(ngroups_n,times_n) in zip(order,outs):
+            ngroups[n],times[n] = ngroups_n,times_n
+
+        # -- copy outputs --
+        results = edict()
+        for key in ['basic','denoised']:
+            buf = shms[key].buf
+            results[key] = np.ndarray(noisy.shape,np.float32,buf).copy()
+        results.ngroups = ngroups
+        results.tile_groups = np.array(ngroups,dtype=np.int64).T
+        results.tile_predicted = predicted
+        results.tile_times = np.array(times,dtype=np.float32).T
+        results.nParts = nParts
+        results.nPartsTime = nPartsTime
+        results.nThreads = nThreads
+    finally:
+        for shm in shms.values():
+            shm.close()
+            shm.unlink()
+
+    return results
+
+def init_tile_worker(nthreads):
+    # -- split the cores between the workers --
+    numba.set_num_threads(min(nthreads,numba.config.NUMBA_NUM_THREADS))
+
+def exec_tile(names,tile,sigma,params):
+
+    # -- attach to shared buffers --
+    shms,tensors = [],edict()
+    for key,(name,shape) in names.items():
+        shm = SharedMemory(name=name)
+        tensors[key] = np.ndarray(shape,np.float32,shm.buf)
+        shms.append(shm)
+
+    # -- crop --
+    noisy = crop_tile(tensors.noisy,tile)
+    clean = crop_tile(optional(tensors,'clean',None),tile)
+    flows = edict()
+    if 'fflow' in tensors and 'bflow' in tensors:
+        flows.fflow = crop_tile(tensors.fflow,tile)
+        flows.bflow = crop_tile(tensors.bflow,tile)
+
+    # -- step 1 --
+    start = time.perf_counter()
+    step_results = processNLBayes(noisy,sigma,0,flows,params,clean,tile)
+    basic = step_results.basic.copy()
+    ngroups = [step_results.ngroups]
+    times = [time.perf_counter() - start]
+
+    # -- step 2 [uses the tile's own basic, as in C++] --
+    step_tensors = edict(flows)
+    step_tensors.basic = basic.copy()
+    start = time.perf_counter()
+    step_results = processNLBayes(noisy,sigma,1,step_tensors,params,None,tile)
+    ngroups.append(step_results.ngroups)
+    times.append(time.perf_counter() - start)
+
+    # -- write inner tile --
+    subBuildTight([basic],tensors.basic,[tile])
+    subBuildTight([step_results.denoised],tensors.denoised,[tile])
+
+    # -- detach --
+    del tensors
+    for shm in shms: shm.close()
+
+    return ngroups,times
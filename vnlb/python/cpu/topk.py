@@ -0,0 +1,130 @@
+
+# -- python deps --
+import numpy as np
+
+# -- numba --
+from numba import njit
+
+def topk(vals,k,tau=None):
+    """
+
+    Order of the "k" smallest values of a flat array (ties by position).
+
+    With "tau", every value <= max(tau,kth value) is kept, as in the C++
+    "estimateSimilarPatches"; the kth value is only taken over finite values.
+
+    """
+
+    # -- select the k smallest without a full sort --
+    nvals = vals.shape[0]
+    k = min(k,nvals)
+    if k < nvals:
+        kth = vals[np.argpartition(vals,k-1)[k-1]]
+    else:
+        kth = vals.max()
+
+    # -- "tau" threshold --
+    thresh = kth
+    if not(tau is None) and np.isfinite(kth):
+        thresh = max(tau,kth)
+
+    # -- sort the winners; all ties with the kth value are included --
+    cands = np.flatnonzero(vals <= thresh)
+    order = cands[np.argsort(vals[cands],kind='stable')]
+    if tau is None or not(np.isfinite(kth)):
+        order = order[:k]
+
+    return order
+
+@njit(cache=True)
+def numba_topk(vals,k,use_tau,tau,hvals,hinds,order):
+    """
+
+    "topk" for numba kernels; writes the order into "order"
+    [len(vals)] and returns its length.
+
+    The "k" smallest are kept in a bounded max-heap ("hvals","hinds"
+    of size >= k) keyed on (value,position), so ties go by position;
+    with "use_tau", a second pass adds every value <= max(tau,kth).
+
+    """
+
+    # -- k smallest in a bounded heap --
+    nvals = vals.shape[0]
+    k = min(k,nvals)
+    hvals,hinds = hvals[:k],hinds[:k]
+    heap_n = 0
+    for i in range(nvals):
+        heap_n = numba_heap_push(hvals,hinds,heap_n,vals[i],i)
+
+    # -- sort the winners by (value,position) --
+    winners = np.sort(hinds[:heap_n])
+    winners = winners[np.argsort(vals[winners],kind='mergesort')]
+    order[:k] = winners
+    if k == 0: return 0
+
+    # -- "tau" threshold; adds the values tied with or below it --
+    kth,kth_pos = vals[order[k-1]],order[k-1]
+    if not(use_tau) or not(np.isfinite(kth)): return k
+    thresh = max(tau,kth)
+    nsel = k
+    for i in range(nvals):
+        if vals[i] <= thresh and heap_gt(vals[i],i,kth,kth_pos):
+            order[nsel] = i
+            nsel += 1
+    extra = order[k:nsel].copy()
+    order[k:nsel] = extra[np.argsort(vals[extra],kind='mergesort')]
+
+    return nsel
+
+@njit(cache=True)
+def numba_heap_push(hvals,hinds,n,val,ind):
+    """
+    Keep the "len(hvals)" smallest (val,ind) pairs in a max-heap;
+    returns the heap size
+    """
+    K = hvals.shape[0]
+    if n < K:
+        i = n
+        hvals[i],hinds[i] = val,ind
+        while i > 0:
+            p = (i-1)//2
+            if not(heap_gt(hvals[i],hinds[i],hvals[p],hinds[p])): break
+            hvals[p],hvals[i] = hvals[i],hvals[p]
+            hinds[p],hinds[i] = hinds[i],hinds[p]
+            i = p
+        return n+1
+    if not(heap_gt(hvals[0],hinds[0],val,ind)): return n
+    hvals[0],hinds[0] = val,ind
+    i = 0
+    while True:
+        l,r,m = 2*i+1,2*i+2,i
+        if l < K and heap_gt(hvals[l],hinds[l],hvals[m],hinds[m]): m = l
+        if r < K and heap_gt(hvals[r],hinds[r],hvals[m],hinds[m]): m = r
+        if m == i: break
+        hvals[m],hvals[i] = hvals[i],hvals[m]
+        hinds[m],hinds[i] = hinds[i],hinds[m]
+        i = m
+    return n
+
+@njit(cache=True)
+def numba_heap_sort(hvals,hinds,n,vals,inds):
+    """
+    Write the heap in ascending order; pops the heap
+    """
+    for k in range(n-1,-1,-1):
+        vals[k],inds[k] = hvals[0],hinds[0]
+        hvals[0],hinds[0] = hvals[k],hinds[k]
+        i = 0
+        while True:
+            l,r,m = 2*i+1,2*i+2,i
+            if l < k and heap_gt(hvals[l],hinds[l],hvals[m],hinds[m]): m = l
+            if r < k and heap_gt(hvals[r],hinds[r],hvals[m],hinds[m]): m = r
+            if m == i: break
+            hvals[m],hvals[i] = hvals[i],hvals[m]
+            hinds[m],hinds[i] = hinds[i],hinds[m]
+            i = m
+
+@njit(cache=True)
+def heap_gt(val_a,ind_a,val_b,ind_b):
+    return (val_a > val_b) or (val_a == val_b and ind_a > ind_b)
@@ -11,16 +11,21 @@ from .sim_search import runSimSearch
 from .bayes_est import runBayesEstimate
 from .comp_agg import computeAggregation
 from .proc_nlb import processNLBayes
+from .tiles import runPythonVnlbTiled
 
 
 # -- project imports --
-from svnlb.utils import groups2patches,patches2groups
+from svnlb.utils import groups2patches,patches2groups,optional
 
 def runPythonVnlb(noisy,sigma,flows,params=None,clean=None):
     """
 
     A Python implementation of the C++ code.
 
+    With "nParts" > 1 (space) or "nPartsTime" > 1 or "tileMemory" > 0 (time)
+    the video is split into tiles as in C++ and the tiles run on
+    "nThreads" processes.
+
     """
 
     # -- create params --
@@ -35,6 +40,15 @@ def runPythonVnlb(noisy,sigma,flows,params=None,clean=None):
     # print(params.nSimilarPatches)
     # print(params.aggreBoost)
 
+    # -- [optional] split into tiles --
+    nParts = int(optional(params,'nParts',[0,0])[0])
+    nThreads = int(optional(params,'nThreads',[0,0])[0])
+    nPartsTime = int(optional(params,'nPartsTime',[0,0])[0])
+    tileMemory = float(optional(params,'tileMemory',[0,0])[0])
+    if nParts > 1 or nPartsTime > 1 or tileMemory > 0:
+        return runPythonVnlbTiled(noisy,sigma,flows,params,clean,max(nParts,1),
+                                  nThreads,nPartsTime,tileMemory)
+
     # -- step 1 --
     step_results = processNLBayes(noisy,sigma,0,flows,params,clean)
     step1_results = step_results
@@ -0,0 +1,74 @@
+
+# -- python deps --
+import numpy as np
+
+class Workspace():
+    """
+
+    Buffers reused across the batches of one step; the Python
+    version of the C++ "matWorkspace".
+
+    Each named buffer is allocated once and only grows when a
+    larger view is requested (e.g. "tau" adds similar patches).
+
+    """
+
+    def __init__(self,shape=None,params=None,step=0,bsize=128):
+        self.bufs = {}
+        if not(shape is None or params is None):
+            self.reserve(shape,params,step,bsize)
+
+    def get(self,name,shape,dtype=np.float32,fill=None):
+        size = int(np.prod(shape))
+        buf = self.bufs.get(name,None)
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            buf = np.empty(size,dtype=dtype)
+            self.bufs[name] = buf
+        view = buf[:size].reshape(shape)
+        if not(fill is None): view.fill(fill)
+        return view
+
+    def reserve(self,shape,params,step,bsize):
+
+        # -- unpack --
+        t,c,h,w = shape
+        ps = params['sizePatch'][step]
+        ps_t = params['sizePatchTime'][step]
+        nSimP = params['nSimilarPatches'][step]
+        nW = params['sizeSearchWindow'][step]
+        rank = params['rank'][step]
+        pdim = ps*ps*ps_t
+        gshape = (bsize,c,ps_t,ps,ps,nSimP)
+
+        # -- search --
+        nWt_f = params['sizeSearchTimeFwd'][step]
+        nWt_b = params['sizeSearchTimeBwd'][step]
+        nt = min(t-ps_t+1,nWt_f+nWt_b+1)
+        nsearch = nt*nW*nW
+        k = min(nSimP,(t-ps_t+1)*nW*nW)
+        self.get("srch_vals",(bsize,nsearch))
+        self.get("srch_inds",(bsize,nsearch),np.int32)
+        self.get("sel_vals",(bsize,max(k,nsearch)))
+        self.get("sel_inds",(bsize,max(k,nsearch)),np.int32)
+        self.get("heap_vals",(bsize,k))
+        self.get("heap_inds",(bsize,k),np.int64)
+        self.get("order",(bsize,nsearch),np.int64)
+        self.get("vals",(bsize,nSimP))
+        self.get("indices",(bsize,nSimP),np.int32)
+        self.get("nSimPs",(bsize,),np.int64)
+        self.get("accept",(bsize,),np.bool_)
+
+        # -- groups --
+        self.get("groupNoisy",gshape)
+        if not(params['isFirstStep'][step]):
+            self.get("groupBasic",gshape)
+
+        # -- bayes --
+        self.get("center",(bsize,c,pdim))
+        self.get("centerBasic",(bsize,c,pdim))
+        self.get("covMat",(bsize,pdim,pdim))
+        self.get("eigVals",(bsize,rank))
+        self.get("eigVecs",(bsize,pdim,rank))
+        self.get("Z",(bsize,nSimP,rank))
+        self.get("rank_var",(bsize,))
+        self.get("flatPatch",(bsize,),np.bool_)
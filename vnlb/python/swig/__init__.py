@@ -5,9 +5,15 @@ from .vnlb.interface import simPatchSearch,computeBayesEstimate,computeAggregati
 from .vnlb.interface import processNLBayes,init_mask
 from .vnlb.interface import computeCovMat
 from .vnlb.interface import runFlatAreas
+from .vnlb.stream import VnlbStream
+from .vnlb.chunked import runPyVnlbChunked
+from .vnlb.session import VnlbSession
+from .vnlb.many import runPyVnlbMany
+from .vnlb.batch import runPyVnlbBatch
 
 # -- flow interface files --
 from .flow.interface import runPyTvL1Flow,runPyFlow,runPyFlowFB
+from .flow.cache import FlowCache
 # from .flow.flow_utils import flow2img,flow2burst
 
 # -- video interface files --
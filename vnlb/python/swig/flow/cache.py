@@ -0,0 +1,114 @@
+"""
+On-disk cache of TV-L1 flows
+
+"""
+
+# -- python imports --
+import os
+import shutil
+import hashlib
+import numpy as np
+from pathlib import Path
+
+# -- flow params that do not change the flows --
+IGNORE_PARAMS = ["nproc","verbose","testing","cache"]
+
+class FlowCache():
+    """
+
+    Content-addressed cache of (fflow,bflow) on disk.
+
+    Each entry is keyed on a hash of the frames, sigma and flow params
+    and stored as two float32 ".npy" files, returned memory-mapped
+    (read-only) on a hit. Entries are evicted least-recently-used first
+    once the cache holds more than "max_bytes".
+
+    """
+
+    def __init__(self,root=None,max_bytes=2*1024**3):
+        if root is None:
+            root = os.getenv("SVNLB_FLOW_CACHE","~/.cache/svnlb/flows")
+        self.root = Path(root).expanduser()
+        self.root.mkdir(parents=True,exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self,noisy,sigma,pyargs=None):
+        """
+        Hash of the frames, sigma and the flow params
+        """
+        noisy = np.ascontiguousarray(noisy)
+        khash = hashlib.blake2b(digest_size=20)
+        khash.update(str((noisy.shape,noisy.dtype.str,sigma)).encode())
+        khash.update(memoryview(noisy).cast("B"))
+        params = {} if pyargs is None else pyargs
+        params = sorted([(k,str(v)) for k,v in params.items()
+                         if not(k in IGNORE_PARAMS)])
+        khash.update(str(params).encode())
+        return khash.hexdigest()
+
+    def get(self,key):
+        """
+        The cached (fflow,bflow) of "key" or None
+        """
+        path = self.root / key
+        if not(path.exists()): return None
+        try:
+            fflow = np.load(path / "fflow.npy",mmap_mode='r')
+            bflow = np.load(path / "bflow.npy",mmap_mode='r')
+        except (OSError,ValueError):
+            return None
+        os.utime(path) # most recently used
+        return fflow,bflow
+
+    def put(self,key,fflow,bflow):
+        """
+        Store the flows of "key" and evict old entries
+        """
+        path = self.root / key
+        tmp = self.root / (key + f".tmp{os.getpid()}")
+        tmp.mkdir(parents=True,exist_ok=True)
+        np.save(tmp / "fflow.npy",np.asarray(fflow,dtype=np.float32))
+        np.save(tmp / "bflow.npy",np.asarray(bflow,dtype=np.float32))
+        try:
+            os.replace(tmp,path)
+        except OSError: # another process wrote it first
+            shutil.rmtree(tmp,ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """
+        (mtime,nbytes,path) of each entry
+        """
+        entries = []
+        for path in self.root.iterdir():
+            if not(path.is_dir()) or ".tmp" in path.name: continue
+            nbytes = sum([f.stat().st_size for f in path.iterdir()])
+            entries.append((path.stat().st_mtime,nbytes,path))
+        return entries
+
+    def nbytes(self):
+        return sum([entry[1] for entry in self.entries()])
+
+    def evict(self):
+        """
+        Remove the least-recently used entries until under "max_bytes"
+        """
+        entries = sorted(self.entries(),key=lambda entry: entry[0])
+        total = sum([entry[1] for entry in entries])
+        for mtime,nbytes,path in entries:
+            if total <= self.max_bytes: break
+            shutil.rmtree(path,ignore_errors=True)
+            total -= nbytes
+
+    def clear(self):
+        for mtime,nbytes,path in self.entries():
+            shutil.rmtree(path,ignore_errors=True)
+
+def get_flow_cache(cache):
+    """
+    The "cache" flow param: a FlowCache, a directory, True [default dir] or None
+    """
+    if cache is None or cache is False: return None
+    if isinstance(cache,FlowCache): return cache
+    if cache is True: return FlowCache()
+    return FlowCache(cache)
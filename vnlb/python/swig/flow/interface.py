@@ -9,6 +9,7 @@ import svnlb
 # -- local imports --
 from svnlb.utils import optional
 from .parser import parse_args
+from .cache import get_flow_cache
 
 # -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 #
@@ -17,6 +18,21 @@ from .parser import parse_args
 # -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 
 def runPyFlow(noisy,sigma,pyargs=None):
+    """
+
+    Forward and backward TV-L1 flows of each pair of frames;
+    the 2(t-1) solves run on "nproc" OpenMP threads [0 = all].
+    The pyramid and gradients of each frame are built once and
+    shared by the (up to four) solves using the frame.
+
+    With "flow_scale" (1, 1/2 or 1/4) the flows are estimated at that
+    fraction of the resolution (the finer scales of the pyramid are
+    skipped, as with "fscale") and upsampled to the full resolution.
+
+    With a "cache" param (a FlowCache, a directory or True) the flows
+    are read from and saved to an on-disk cache.
+
+    """
     return runPyFlowFB(noisy,sigma,pyargs)
 
 def runPyFlowFB(noisy,sigma,pyargs=None):
@@ -24,16 +40,25 @@ def runPyFlowFB(noisy,sigma,pyargs=None):
     # -- extract info --
     t,c,h,w = noisy.shape
     assert c in [1,3,4],"must have the color channel be 1, 3, or 4"
+
+    # -- cached flows --
+    cache = get_flow_cache(optional(pyargs,'cache',None))
+    if not(cache is None):
+        key = cache.key(noisy,sigma,pyargs)
+        flows = cache.get(key)
+        if not(flows is None): return flows
     args,swig_args,tensors,swig_tensors = parse_args(noisy,sigma,pyargs)
 
-    # -- exec using numpy --
-    swig_args.direction = 0
+    # -- exec using numpy; both directions and all pairs in parallel --
+    swig_args.direction = 2
     svnlb.runTV1Flow(swig_args,swig_tensors)
     fflow = tensors.fflow
-    swig_args.direction = 1
-    svnlb.runTV1Flow(swig_args,swig_tensors)
     bflow = tensors.bflow
 
+    # -- save to cache --
+    if not(cache is None):
+        cache.put(key,fflow,bflow)
+
     return fflow,bflow
 
 def runPyTvL1Flow(noisy,sigma,pyargs=None):
@@ -41,12 +66,28 @@ def runPyTvL1Flow(noisy,sigma,pyargs=None):
     return res
 
 def runPyTvL1Flow_np(noisy,sigma,pyargs=None):
+    """
+
+    TV-L1 flows of each pair of frames in "direction"
+    [0 = forward, 1 = backward, 2 = both].
+
+    With "warm_start", each pair starts from the flow of the previous
+    pair, and those solves use "warm_nscales" scales and "warm_nwarps"
+    warps [-1 = same as the first pair]. The pairs of a direction are
+    then solved one after the other. The TV-L1 energy of each flow is
+    returned as "energy" (2,t-1) [forward,backward] to compare settings.
+
+    """
 
     # -- extract info --
     t,c,h,w  = noisy.shape
     assert c in [1,3,4],"must have the color channel be 1, 3, or 4"
     args,swig_args,tensors,swig_tensors = parse_args(noisy,sigma,pyargs)
 
+    # -- energy of each flow --
+    energy = numpy.zeros((2,max(t-1,0)),dtype=numpy.float32)
+    swig_tensors.flow_energy = svnlb.swig_ptr(energy)
+
     # -- exec using numpy --
     svnlb.runTV1Flow(swig_args,swig_tensors)
 
@@ -54,11 +95,12 @@ def runPyTvL1Flow_np(noisy,sigma,pyargs=None):
     res = {}
     res['fflow'] = tensors.fflow #t c h w
     res['bflow'] = tensors.bflow
+    res['energy'] = energy
 
     # -- alias some vars --
     direction = optional(pyargs,'direction',0)
-    if direction == 0: res['flow'] = res['fflow']
-    else: res['flow'] = res['bflow']
+    if direction == 1: res['flow'] = res['bflow']
+    else: res['flow'] = res['fflow']
 
     return res
 
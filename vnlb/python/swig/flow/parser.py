@@ -35,6 +35,24 @@ def set_optional_params(args,pyargs):
     args.verbose = optional(pyargs,'verbose',False)
     args.testing = optional(pyargs,'testing',False)
     args.direction = optional(pyargs,'direction',0)
+    args.warm_start = optional(pyargs,'warm_start',False)
+    args.warm_nscales = optional(pyargs,'warm_nscales',-1)
+    args.warm_nwarps = optional(pyargs,'warm_nwarps',-1)
+
+    # -- estimate at "flow_scale" [1, 1/2, 1/4] of the resolution --
+    flow_scale = optional(pyargs,'flow_scale',None)
+    if not(flow_scale is None):
+        args.fscale = get_fscale(flow_scale,args.zfactor)
+
+def get_fscale(flow_scale,zfactor):
+    """
+    The finest scale of the pyramid ("fscale") at "flow_scale" of the resolution
+    """
+    zfactor = 0.5 if zfactor < 0 else zfactor
+    fscale = int(np.round(np.log(flow_scale)/np.log(zfactor)))
+    if fscale < 0 or not(np.isclose(zfactor**fscale,flow_scale)):
+        raise ValueError(f"The flow_scale must be a power of the zfactor [{zfactor}].")
+    return fscale
 
 
 #
@@ -45,13 +63,12 @@ def np_zero_tensors(t,c,h,w):
     tensors = edict()
     tensors.fflow = np.zeros((t-1,2,h,w),dtype=np.float32)
     tensors.bflow = np.zeros((t-1,2,h,w),dtype=np.float32)
-    tensors.clean = np.zeros((t,c,h,w),dtype=np.float32)
     return tensors
 
 def set_tensors(targs,pyargs,tensors):
     targs.fflow = optional(pyargs,'fflow',tensors.fflow)
     targs.bflow = optional(pyargs,'bflow',tensors.bflow)
-    targs.clean = optional(pyargs,'clean',tensors.clean)
+    targs.clean = optional(pyargs,'clean',None)
 
     targs.use_clean = check_none(optional(pyargs,'clean',None),'neq')
     targs.use_flow = True
@@ -0,0 +1,136 @@
+
+# -- python imports --
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+# -- vnlb imports --
+from svnlb.utils import check_omp_num_threads
+
+# -- local imports --
+from .interface import runPyVnlb
+
+def runPyVnlbBatch(noisy_list,sigma_list,flows=None,workers=None,params=None):
+    """
+
+    Denoise a list of independent videos on a pool of "workers" processes.
+
+    The videos, flows and outputs are passed through shared memory (one
+    block per kind of tensor) rather than pickled, and the C++ denoiser
+    writes its outputs straight into the shared blocks. Each worker uses
+    "cpu_count // workers" OpenMP threads so the pool does not oversubscribe.
+
+    """
+
+    # -- inputs per video --
+    nvids = len(noisy_list)
+    if not(isinstance(sigma_list,(list,tuple))): sigma_list = [sigma_list,]*nvids
+    if flows is None: flows = [None,]*nvids
+    check_batch_flows(flows,nvids)
+    workers = os.cpu_count() if workers is None else workers
+    workers = max(1,min(workers,nvids))
+    nthreads = max(1,os.cpu_count()//workers)
+    params = {} if params is None else dict(params)
+    if not('nThreads' in params or 'nthreads' in params):
+        params['nThreads'] = [nthreads,nthreads]
+
+    # -- shared blocks --
+    shms = []
+    try:
+        blocks = {}
+        blocks['noisy'] = share_arrays(noisy_list,shms)
+        blocks['denoised'] = share_arrays(noisy_list,shms,copy=False)
+        blocks['basic'] = share_arrays(noisy_list,shms,copy=False)
+        if nvids > 0 and not(flows[0] is None):
+            blocks['fflow'] = share_arrays([f['fflow'] for f in flows],shms)
+            blocks['bflow'] = share_arrays([f['bflow'] for f in flows],shms)
+
+        # -- exec --
+        args = [(blocks,i,sigma_list[i],params) for i in range(nvids)]
+        if workers == 1:
+            outs = [exec_video(*arg) for arg in args]
+        else:
+            ctx = get_context("spawn")
+            with ProcessPoolExecutor(workers,mp_context=ctx,
+                                     initializer=init_batch_worker,
+                                     initargs=(nthreads,)) as pool:
+                outs = list(pool.map(exec_video,*zip(*args)))
+
+        # -- copy outputs --
+        results = []
+        for i in range(nvids):
+            res = dict(outs[i])
+            for key in ['denoised','basic']:
+                res[key] = view_array(blocks[key],i).copy()
+            results.append(res)
+    finally:
+        for shm in shms:
+            _blocks.pop(shm.name,None)
+            shm.close()
+            shm.unlink()
+
+    return results
+
+def check_batch_flows(flows,nvids):
+    """
+    The flows are a list with one entry per video, all given or all None
+    """
+    if len(flows) != nvids:
+        raise ValueError(f"Expected one flow per video [{nvids}] but got [{len(flows)}].")
+    missing = [i for i,f in enumerate(flows) if f is None]
+    if 0 < len(missing) < nvids:
+        raise ValueError(f"The flows must be given for all videos or none; missing videos {missing}.")
+
+def share_arrays(arrays,shms,copy=True):
+    """
+    Place float32 arrays in one shared block; returns (name,offsets,shapes)
+    """
+    shapes = [tuple(arr.shape) for arr in arrays]
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    offsets = np.cumsum([0,] + sizes)
+    shm = SharedMemory(create=True,size=max(4*int(offsets[-1]),1))
+    shms.append(shm)
+    _blocks[shm.name] = shm
+    block = (shm.name,offsets,shapes)
+    if copy:
+        for i,arr in enumerate(arrays):
+            view_array(block,i,shm)[...] = arr
+    return block
+
+def view_array(block,i,shm=None):
+    """
+    The i-th array of a shared block
+    """
+    name,offsets,shapes = block
+    if shm is None: shm = attach_block(name)
+    if offsets[-1] == 0: return np.zeros(shapes[i],dtype=np.float32)
+    buf = np.ndarray((int(offsets[-1]),),np.float32,shm.buf)
+    return buf[offsets[i]:offsets[i+1]].reshape(shapes[i])
+
+_blocks = {}
+def attach_block(name):
+    # -- keep one handle per block for the life of the process --
+    if not(name in _blocks):
+        _blocks[name] = SharedMemory(name=name)
+    return _blocks[name]
+
+def init_batch_worker(nthreads):
+    # -- split the cores between the workers --
+    check_omp_num_threads(nthreads)
+
+def exec_video(blocks,i,sigma,params):
+
+    # -- views of the shared blocks; outputs are written in place --
+    noisy = view_array(blocks['noisy'],i)
+    tensors = {'denoised':view_array(blocks['denoised'],i),
+               'basic':view_array(blocks['basic'],i)}
+    if 'fflow' in blocks:
+        tensors['fflow'] = view_array(blocks['fflow'],i)
+        tensors['bflow'] = view_array(blocks['bflow'],i)
+
+    # -- exec --
+    res = runPyVnlb(noisy,sigma,tensors,dict(params))
+
+    return {'nthreads_omp':res['nthreads_omp']}
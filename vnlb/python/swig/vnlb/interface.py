@@ -36,6 +36,7 @@ def runVnlb_np(noisy,sigma,tensors=None,params=None):
     t,c,h,w  = noisy.shape
     assert c in [1,3,4],"must have the color channel be 1, 3, or 4"
     args,swig_args,tensors,swig_tensors = parse_args(noisy,sigma,tensors,params)
+    tiles = tile_stats_buffers(t,swig_args[0],swig_tensors)
 
     # -- exec using numpy --
     svnlb.runVnlb(swig_args[0],swig_args[1],swig_tensors)
@@ -46,6 +47,10 @@ def runVnlb_np(noisy,sigma,tensors=None,params=None):
     res['basic'] = tensors.basic
     res['fflow'] = tensors.fflow #t c h w
     res['bflow'] = tensors.bflow
+    res['nthreads_omp'] = swig_args[0].nThreadsUsed
+    res['ntiles'] = swig_args[0].nTilesUsed
+    for key,val in tiles.items():
+        res[key] = val[:,:res['ntiles']]
 
     return res
 
@@ -55,6 +60,7 @@ def runPyVnlbTimed(noisy,sigma,tensors=None,params=None):
     t,c,h,w  = noisy.shape
     assert c in [1,3,4],"must have the color channel be 1, 3, or 4"
     args,swig_args,tensors,swig_tensors = parse_args(noisy,sigma,tensors,params)
+    tiles = tile_stats_buffers(t,swig_args[0],swig_tensors)
 
     # -- exec using numpy --
     svnlb.runVnlbTimed(swig_args[0],swig_args[1],swig_tensors)
@@ -65,9 +71,35 @@ def runPyVnlbTimed(noisy,sigma,tensors=None,params=None):
     res['basic'] = tensors.basic
     res['fflow'] = tensors.fflow #t c h w
     res['bflow'] = tensors.bflow
+    res['nthreads_omp'] = swig_args[0].nThreadsUsed
+    res['ntiles'] = swig_args[0].nTilesUsed
+    for key,val in tiles.items():
+        res[key] = val[:,:res['ntiles']]
 
     return res
 
+def tile_stats_buffers(t,swig_params,swig_tensors):
+    """
+    Per-tile time [sec], processed & predicted groups of each step
+    """
+
+    # -- upper bound on the number of tiles --
+    nThreads = swig_params.nThreads
+    if nThreads <= 0: nThreads = svnlb.getOmpNumThreads()
+    nParts = swig_params.nParts if swig_params.nParts > 0 else 2*nThreads
+    ntiles_max = int(nParts * t)
+
+    # -- buffers --
+    tiles = edict()
+    tiles.tile_times = np.zeros((2,ntiles_max),dtype=np.float32)
+    tiles.tile_groups = np.zeros((2,ntiles_max),dtype=np.uint32)
+    tiles.tile_predicted = np.zeros((2,ntiles_max),dtype=np.uint32)
+    for key,val in tiles.items():
+        setattr(swig_tensors,key,svnlb.swig_ptr(val))
+    swig_tensors.ntiles_max = ntiles_max
+
+    return tiles
+
 
 # -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 #
@@ -109,7 +141,9 @@ def simPatchSearch(noisy,sigma,pidx,tensors=None,params=None,step=0):
     groupNoisy = tensors.groupNoisy
     groupBasic = tensors.groupBasic
     patchesNoisy = groups2patches(tensors.groupNoisy,c,psX,psT,nSimP)
-    patchesBasic = groups2patches(tensors.groupBasic,c,psX,psT,nSimP)
+    patchesBasic = None
+    if not(groupBasic is None):
+        patchesBasic = groups2patches(groupBasic,c,psX,psT,nSimP)
     indices = rearrange(tensors.indices[:,:nSimP],'nparts nsimp -> (nparts nsimp)')
 
     # -- pack results --
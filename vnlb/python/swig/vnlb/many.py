@@ -0,0 +1,52 @@
+
+# -- python imports --
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+# -- vnlb imports --
+import svnlb
+
+# -- local imports --
+from .interface import runPyVnlb
+from ..flow.interface import runPyFlow
+
+def runPyVnlbMany(bursts,sigmas,tensors=None,params=None,nworkers=None,
+                  compute_flow=False):
+    """
+
+    Denoise a list of bursts on a pool of "nworkers" threads.
+
+    The swig calls release the GIL, so the bursts (and the reading or
+    flows of other bursts) run at the same time. Each call gets its own
+    copy of "params" and "tensors", and unless "nThreads" is given the
+    OpenMP threads are split between the workers. With "compute_flow",
+    the TV-L1 flows of each burst are computed on its worker.
+
+    """
+
+    # -- inputs per burst --
+    nbursts = len(bursts)
+    if not(isinstance(sigmas,(list,tuple))): sigmas = [sigmas,]*nbursts
+    if tensors is None: tensors = [None,]*nbursts
+    if nworkers is None: nworkers = nbursts
+    nworkers = max(1,min(nworkers,nbursts))
+
+    # -- split the OpenMP threads --
+    params = {} if params is None else dict(params)
+    if not('nThreads' in params or 'nthreads' in params):
+        nthreads = max(1,svnlb.getOmpNumThreads()//nworkers)
+        params['nThreads'] = [nthreads,nthreads]
+
+    # -- exec --
+    args = [(burst,sigma,tensors_b,params,compute_flow)
+            for burst,sigma,tensors_b in zip(bursts,sigmas,tensors)]
+    with ThreadPoolExecutor(nworkers) as pool:
+        results = list(pool.map(exec_burst,*zip(*args)))
+
+    return results
+
+def exec_burst(noisy,sigma,tensors,params,compute_flow):
+    tensors = {} if tensors is None else dict(tensors)
+    if compute_flow and not('fflow' in tensors):
+        tensors['fflow'],tensors['bflow'] = runPyFlow(noisy,sigma)
+    return runPyVnlb(noisy,sigma,tensors,copy.deepcopy(params))
@@ -22,9 +22,9 @@ def mask_parser(mask,vnlb_params,info=None):
     params.origin_h = optional(info,'origin_h',0)
     params.origin_w = optional(info,'origin_w',0)
 
-    params.ending_t = optional(info,'origin_t',t)
-    params.ending_h = optional(info,'origin_h',h)
-    params.ending_w = optional(info,'origin_w',w)
+    params.ending_t = optional(info,'ending_t',t)
+    params.ending_h = optional(info,'ending_h',h)
+    params.ending_w = optional(info,'ending_w',w)
 
     params.step_t = optional(info,'step_t',1)
     params.step_h = optional(vnlb_params,'procStep',1)
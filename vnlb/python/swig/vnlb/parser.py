@@ -76,6 +76,10 @@ def get_param_translations():
     names['testing'] = []
     names['nThreads'] = ['nthreads']
     names['nParts'] = ['nparts']
+    names['nPartsTime'] = ['nparts_t','nParts_t']
+    names['tileMemory'] = ['tile_memory']
+    names['ompSchedule'] = ['schedule','omp_schedule']
+    names['ompChunk'] = ['chunk','omp_chunk']
 
     names['use_imread'] = []
     names['set_sizePatch'] = []
@@ -116,6 +120,10 @@ def get_param_type():
     types['var_mode'] = np.int32
     types['nThreads'] = np.int32
     types['nParts'] = np.uint32
+    types['nPartsTime'] = np.int32
+    types['tileMemory'] = np.float32
+    types['ompSchedule'] = np.int32
+    types['ompChunk'] = np.int32
 
     types['use_imread'] = np.bool_
     types['set_sizePatch'] = np.bool_
@@ -155,6 +163,10 @@ def get_defaults():
     defaults.testing = [False,False]
     defaults.nThreads = [0,0]
     defaults.nParts = [0,0]
+    defaults.nPartsTime = [0,0]
+    defaults.tileMemory = [0.,0.]
+    defaults.ompSchedule = [svnlb.SCHED_DYNAMIC,svnlb.SCHED_DYNAMIC]
+    defaults.ompChunk = [0,0]
 
     # -- must be set using "handle_set_bools" --
     defaults.use_imread = False
@@ -199,6 +211,22 @@ def handle_set_bools(pydict):
     pydict['set_nParts'] = check_any_exists("nParts")
 
 
+def handle_schedule(pydict):
+    """
+    The OpenMP schedule can be given by name
+    """
+    scheds = {"static":svnlb.SCHED_STATIC,
+              "dynamic":svnlb.SCHED_DYNAMIC,
+              "guided":svnlb.SCHED_GUIDED,
+              "balanced":svnlb.SCHED_BALANCED}
+    translate = get_param_translations()
+    for field in translate['ompSchedule'] + ['ompSchedule']:
+        if not(field in pydict): continue
+        value = pydict[field]
+        if isinstance(value,str): value = [value,value]
+        value = [scheds[v] if isinstance(v,str) else v for v in value]
+        pydict[field] = value
+
 def get_param_fields():
     names = get_param_translations()
     return list(names.keys())
@@ -280,11 +308,8 @@ def reindex_params_to_py(params,pyargs,overwrite=False,use_pyfield=False):
 #
 
 def np_zero_tensors(t,c,h,w):
+    # -- only the outputs; absent inputs are null pointers in c++ --
     tensors = edict()
-    tensors.fflow = np.zeros((t,2,h,w),dtype=np.float32)
-    tensors.bflow = np.zeros((t,2,h,w),dtype=np.float32)
-    tensors.oracle = np.zeros((t,c,h,w),dtype=np.float32)
-    tensors.clean = np.zeros((t,c,h,w),dtype=np.float32)
     tensors.basic = np.zeros((t,c,h,w),dtype=np.float32)
     tensors.denoised = np.zeros((t,c,h,w),dtype=np.float32)
     return tensors
@@ -292,10 +317,10 @@ def np_zero_tensors(t,c,h,w):
 def set_tensors(args,pyargs,tensors):
 
     # -- set tensors --
-    args.fflow = optional(pyargs,'fflow',tensors.fflow)
-    args.bflow = optional(pyargs,'bflow',tensors.bflow)
-    args.oracle = optional(pyargs,'oracle',tensors.oracle)
-    args.clean = optional(pyargs,'clean',tensors.clean)
+    args.fflow = optional(pyargs,'fflow',None)
+    args.bflow = optional(pyargs,'bflow',None)
+    args.oracle = optional(pyargs,'oracle',None)
+    args.clean = optional(pyargs,'clean',None)
     args.basic = optional(pyargs,'basic',tensors.basic)
     args.denoised = optional(pyargs,'denoised',tensors.denoised)
 
@@ -362,6 +387,7 @@ def parse_params(shape,sigma,pyargs=None):
     if not('sigma' in pyargs):
         pyargs.sigma = sigma if hasattr(sigma,'__getitem__') else [sigma,sigma]
     handle_set_bools(pyargs) # set bools before copying over
+    handle_schedule(pyargs)
     params_1 = reindex_and_fill_dict(pyargs,0)
     params_2 = reindex_and_fill_dict(pyargs,1)
 
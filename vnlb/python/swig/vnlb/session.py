@@ -0,0 +1,100 @@
+
+# -- python imports --
+import numpy as np
+from easydict import EasyDict as edict
+
+# -- vnlb imports --
+import svnlb
+from svnlb.utils import assign_swig_args
+
+# -- local imports --
+from .parser import parse_params,np_zero_tensors
+from .interface import tile_stats_buffers
+
+class VnlbSession():
+    """
+
+    Denoise many videos of the same shape with the same params.
+
+    The params are parsed once and the session owns the noisy, flow
+    and output buffers (and their swig pointers), so each "denoise"
+    only copies the inputs and runs the C++ denoiser.
+
+    The returned "denoised" and "basic" are views of the session's
+    buffers and are overwritten by the next call; copy them to keep them.
+
+    """
+
+    def __init__(self,shape,sigma,params=None):
+
+        # -- params --
+        t,c,h,w = shape
+        assert c in [1,3,4],"must have the color channel be 1, 3, or 4"
+        self.shape = tuple(shape)
+        pyargs = {} if params is None else dict(params)
+        self.params,self.swig_params = parse_params(shape,sigma,pyargs)
+
+        # -- persistent buffers --
+        self.tensors = np_zero_tensors(t,c,h,w)
+        self.tensors.fflow = np.zeros((t,2,h,w),dtype=np.float32)
+        self.tensors.bflow = np.zeros((t,2,h,w),dtype=np.float32)
+        self.tensors.noisy = np.zeros((t,c,h,w),dtype=np.float32)
+        self.tensors.w,self.tensors.h = w,h
+        self.tensors.c,self.tensors.t = c,t
+        self.tensors.use_flow = False
+        self.tensors.use_clean = False
+        self.tensors.use_oracle = False
+
+        # -- swig pointers --
+        self.swig_tensors = svnlb.VnlbTensors()
+        assign_swig_args(self.tensors,self.swig_tensors)
+        self.tiles = tile_stats_buffers(t,self.swig_params[0],self.swig_tensors)
+
+    def denoise(self,noisy,flows=None):
+        """
+
+        Denoise "noisy" (t,c,h,w) with optional flows,
+        a dict of "fflow" and "bflow" (t-1 or t,2,h,w)
+
+        """
+
+        # -- copy the inputs --
+        assert noisy.shape == self.shape,"the shape must match the session."
+        np.copyto(self.tensors.noisy,noisy,casting='unsafe')
+        self.swig_tensors.use_flow = self.copy_flows(flows)
+        self.tensors.basic.fill(0)
+
+        # -- exec --
+        svnlb.runVnlb(self.swig_params[0],self.swig_params[1],self.swig_tensors)
+
+        # -- format & create results --
+        res = {}
+        res['denoised'] = self.tensors.denoised
+        res['basic'] = self.tensors.basic
+        res['nthreads_omp'] = self.swig_params[0].nThreadsUsed
+        res['ntiles'] = self.swig_params[0].nTilesUsed
+        for key,val in self.tiles.items():
+            res[key] = val[:,:res['ntiles']]
+
+        return res
+
+    def copy_flows(self,flows):
+        """
+        Copy the flows into the session's (t,2,h,w) buffers as in "expand_flows"
+        """
+        if flows is None: return False
+        fflow,bflow = flows['fflow'],flows['bflow']
+        t = self.shape[0]
+        if fflow.shape[0] == t-1:
+            np.copyto(self.tensors.fflow[:t-1],fflow,casting='unsafe')
+            self.tensors.fflow[t-1] = self.tensors.fflow[t-2]
+            np.copyto(self.tensors.bflow[1:],bflow,casting='unsafe')
+            self.tensors.bflow[0] = self.tensors.bflow[1]
+        elif fflow.shape[0] == t:
+            np.copyto(self.tensors.fflow,fflow,casting='unsafe')
+            np.copyto(self.tensors.bflow,bflow,casting='unsafe')
+        else:
+            msg = "The input flows are the wrong shape.\n"
+            msg += "(nframes,two,height,width)"
+            raise ValueError(msg)
+        return True
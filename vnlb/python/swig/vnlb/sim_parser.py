@@ -22,28 +22,24 @@ from svnlb.utils.utils import check_flows,check_none,assign_swig_args,check_and_
 # from ..utils import check_flows,check_none,assign_swig_args,check_and_expand_flows
 
 
-def np_zero_tensors(t,c,h,w,groupShape,pNum,nParts):
+def np_zero_tensors(t,c,h,w,groupShape,pNum,nParts,step1):
+    # -- only what the search reads or writes; the rest are null pointers --
     tensors = edict()
-    tensors.fflow = np.zeros((t,2,h,w),dtype=np.float32)
-    tensors.bflow = np.zeros((t,2,h,w),dtype=np.float32)
-    tensors.oracle = np.zeros((t,c,h,w),dtype=np.float32)
-    tensors.clean = np.zeros((t,c,h,w),dtype=np.float32)
-    tensors.basic = np.zeros((t,c,h,w),dtype=np.float32)
-    tensors.denoised = np.zeros((t,c,h,w),dtype=np.float32)
+    tensors.basic = None if step1 else np.zeros((t,c,h,w),dtype=np.float32)
     tensors.groupNoisy = np.zeros(groupShape,dtype=np.float32)
-    tensors.groupBasic = np.zeros(groupShape,dtype=np.float32)
+    tensors.groupBasic = None if step1 else np.zeros(groupShape,dtype=np.float32)
     tensors.indices = np.zeros((nParts,pNum),dtype=np.uint32)
     return tensors
 
 def set_tensors(args,pyargs,tensors):
 
     # -- set tensors --
-    args.fflow = optional(pyargs,'fflow',tensors.fflow)
-    args.bflow = optional(pyargs,'bflow',tensors.bflow)
-    args.oracle = optional(pyargs,'oracle',tensors.oracle)
-    args.clean = optional(pyargs,'clean',tensors.clean)
+    args.fflow = optional(pyargs,'fflow',None)
+    args.bflow = optional(pyargs,'bflow',None)
+    args.oracle = optional(pyargs,'oracle',None)
+    args.clean = optional(pyargs,'clean',None)
     args.basic = optional(pyargs,'basic',tensors.basic)
-    args.denoised = optional(pyargs,'denoised',tensors.denoised)
+    args.denoised = optional(pyargs,'denoised',None)
     args.groupNoisy = optional(pyargs,'groupNoisy',tensors.groupNoisy)
     args.groupBasic = optional(pyargs,'groupBasic',tensors.groupBasic)
     args.indices = optional(pyargs,'indices',tensors.indices)
@@ -99,7 +95,8 @@ def sim_parser(noisy,sigma,nParts,py_tensors,params):
     tensors.c = c
     tensors.t = t
     tensors.noisy = noisy
-    ztensors = np_zero_tensors(t,c,h,w,groupShape,pNum,nParts)
+    step1 = params.isFirstStep
+    ztensors = np_zero_tensors(t,c,h,w,groupShape,pNum,nParts,step1)
     set_tensors(tensors,py_tensors,ztensors)
 
     # -- copy to swig --
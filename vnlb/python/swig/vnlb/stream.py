@@ -0,0 +1,146 @@
+
+# -- python imports --
+import numpy as np
+from collections import deque
+
+# -- local imports --
+from .interface import runPyVnlb,setVnlbParams
+from ..flow.interface import runPyFlow
+
+class VnlbStream():
+    """
+
+    Denoise a video of any length one frame (or chunk of frames) at a time.
+
+    Only a ring buffer of "2 x context + chunk" frames is kept, with
+    "context = sizeSearchTimeFwd + sizeSearchTimeBwd + sizePatchTime - 1",
+    and the flows of each consecutive pair are computed as the frames arrive.
+    A frame is denoised (with both steps) once "context" later frames are
+    pushed; "flush" denoises the remaining frames at the end of the stream.
+
+    The context holds every reference whose group can reach the frame,
+    with that reference's whole search window. Each window is still
+    denoised on its own, so frames differ slightly from a denoiser run
+    on the whole clip (the paste trick and the 2nd step's basic estimate
+    depend on the window).
+
+    """
+
+    def __init__(self,sigma,params=None,flow_params=None,chunk=1,use_flow=True):
+        self.sigma = sigma
+        self.params = {} if params is None else dict(params)
+        self.flow_params = flow_params
+        self.chunk = max(1,chunk)
+        self.use_flow = use_flow
+        self.nframes_in = 0
+        self.nframes_out = 0
+        self.frames = None
+
+    def init_buffers(self,shape):
+        """
+        Allocate the ring buffer using the (default) params of the frame shape
+        """
+
+        # -- temporal neighbourhood of a frame, max over both steps --
+        # refs in [t - sWt_f - sPt + 1, t + sWt_b] have patches in frame t
+        # and search from "sWt_b" frames before to "sWt_f + sPt - 1" after
+        c,h,w = shape
+        params = setVnlbParams((2,c,h,w),self.sigma,None,dict(self.params))
+        sPt = params['sizePatchTime']
+        sWt_f = params['sizeSearchTimeFwd']
+        sWt_b = params['sizeSearchTimeBwd']
+        context = int(max([sWt_f[i] + sWt_b[i] + sPt[i] - 1 for i in range(2)]))
+        self.past = context
+        self.future = context
+        self.nframes = self.past + self.chunk + self.future
+
+        # -- ring buffers of frames and flows (t -> t+1, t+1 -> t) --
+        self.frames = deque(maxlen=self.nframes)
+        self.fflows = deque(maxlen=self.nframes-1)
+        self.bflows = deque(maxlen=self.nframes-1)
+
+    @property
+    def latency(self):
+        """
+        Number of frames pushed before a frame is returned
+        """
+        if self.frames is None: return None
+        return self.future + self.chunk - 1
+
+    def push(self,frames):
+        """
+
+        Add frames (c,h,w) or (t,c,h,w) to the stream;
+        returns the frames denoised so far, (t',c,h,w)
+
+        """
+
+        # -- a single frame --
+        frames = np.asarray(frames,dtype=np.float32)
+        if frames.ndim == 3: frames = frames[None,:]
+        if self.frames is None: self.init_buffers(frames.shape[1:])
+
+        # -- add frames; denoise each full chunk --
+        denoised = []
+        for frame in frames:
+            self.add_frame(frame)
+            nready = self.nframes_in - self.future - self.nframes_out
+            if nready >= self.chunk:
+                denoised.append(self.denoise_window(self.chunk))
+        return self.format_output(denoised,frames.shape[1:])
+
+    def flush(self):
+        """
+
+        Denoise the frames still in the ring buffer;
+        returns (t',c,h,w)
+
+        """
+        if self.frames is None: return None
+        shape = self.frames[0].shape
+        denoised = []
+        nleft = self.nframes_in - self.nframes_out
+        if nleft > 0: denoised.append(self.denoise_window(nleft))
+        return self.format_output(denoised,shape)
+
+    def add_frame(self,frame):
+
+        # -- flows from the previous frame --
+        if self.use_flow and len(self.frames) > 0:
+            pair = np.stack([self.frames[-1],frame])
+            fflow,bflow = runPyFlow(pair,self.sigma,self.flow_params)
+            self.fflows.append(fflow[0])
+            self.bflows.append(bflow[0])
+
+        # -- add to ring --
+        self.frames.append(frame)
+        self.nframes_in += 1
+
+    def denoise_window(self,nframes):
+        """
+        Denoise the ring buffer and return the next "nframes" output frames
+        """
+
+        # -- window and its flows --
+        noisy = np.stack(self.frames)
+        tensors = {}
+        if self.use_flow and len(self.frames) > 1:
+            fflows,bflows = list(self.fflows),list(self.bflows)
+            nflows = len(self.frames)-1
+            tensors['fflow'] = np.stack(fflows[-nflows:])
+            tensors['bflow'] = np.stack(bflows[-nflows:])
+
+        # -- denoise --
+        res = runPyVnlb(noisy,self.sigma,tensors,dict(self.params))
+
+        # -- frames to output --
+        start = self.nframes_out - (self.nframes_in - len(self.frames))
+        denoised = res['denoised'][start:start+nframes].copy()
+        self.nframes_out += nframes
+
+        return denoised
+
+    def format_output(self,denoised,shape):
+        if len(denoised) == 0:
+            return np.zeros((0,)+tuple(shape),dtype=np.float32)
+        return np.concatenate(denoised)
@@ -40,17 +40,20 @@ def check_and_expand_flows(pyargs,t):
         msg += "(nframes,two,height,width)"
         raise ValueError(msg)
 
-def check_omp_num_threads(nthreads=4):
+def check_omp_num_threads(nthreads=4,verbose=False):
+    """
+    Use "nthreads" OpenMP threads; returns the number of threads in use.
+    """
     omp_nthreads = omp_num_threads()
     check_eq = omp_nthreads == nthreads
-    # check_geq = omp_nthreads >= nthreads
-    # check_bool = check_geq if geq else check_eq
     if not(check_eq):
-        msg = f"Please run `export OMP_NUM_THREADS={nthreads}` "
-        msg += "before running this file.\n"
-        msg += f"Currently set to [{omp_nthreads}] threads"
-        print(msg)
-        sys.exit(1)
+        if verbose:
+            msg = f"Setting OpenMP to [{nthreads}] threads; "
+            msg += f"OMP_NUM_THREADS is [{omp_nthreads}]"
+            print(msg)
+        os.environ['OMP_NUM_THREADS'] = str(nthreads)
+        svnlb.setOmpNumThreads(nthreads)
+    return svnlb.getOmpNumThreads()
 
 def omp_num_threads():
     omp_nthreads = os.getenv('OMP_NUM_THREADS')
@@ -96,7 +99,7 @@ def compute_psnrs(img1,img2,imax=255.):
     img2 = img2/imax
     delta = (img1 - img2)**2
     mse = delta.reshape(b,-1).mean(axis=1) + eps
-    log_mse = np.ma.log10(1./mse).filled(-np.infty)
+    log_mse = np.ma.log10(1./mse).filled(-np.inf)
     psnr = 10 * log_mse
     return psnr
 